@@ -0,0 +1,488 @@
+"""
+Benchmark de bout en bout des deux bots contre des serveurs Mistral AI / Hashnode locaux
+(benchmarks/fake_services.py) : aucune requête ne sort de la machine.
+
+Mesures :
+  - temps par phase d'une exécution complète de `main()` (validation, test d'authentification,
+    génération, publication), en streaming et sans streaming ;
+  - débit en articles/min du mode batch selon la concurrence, avec et sans réponses 429 ;
+  - queue de latence des complétions (une réponse lente sur N), sans puis avec requêtes doublées ;
+  - coût du post-traitement (nettoyage + placement des embeds) par Ko d'article ;
+  - durée du calcul du classement hebdomadaire (hardstyle/charts.py) sur des millions de lignes de signaux ;
+  - pic de mémoire résidente (RSS) du processus.
+
+Les résultats sont écrits en JSON (par défaut benchmarks/results/e2e-<date>-<commit>.json)
+pour comparer les exécutions d'un commit à l'autre :
+
+    python benchmarks/bench_end_to_end.py [--latency 0.05] [--concurrency 1,2,4,8]
+    python benchmarks/bench_end_to_end.py --compare benchmarks/results/e2e-<précédent>.json
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Configuration lue à l'import par les bots et hardstyle.* : à fixer avant de les importer
+BENCH_CACHE_DIR = tempfile.mkdtemp(prefix="hardstyle-bench-")
+os.environ.update({
+    "MISTRAL_API_KEY": "bench-mistral-key",
+    "HASHNODE_API_KEY": "bench-hashnode-key",
+    "GITHUB_REPOSITORY": "bench/hardstyle-ranking-blog",
+    "HARDSTYLE_CACHE_DIR": BENCH_CACHE_DIR,
+    "HTTP_TRANSPORT": "live",
+    "HTTP_BACKOFF_BASE": "0.05",
+    "HTTP_BACKOFF_MAX": "1",
+    # Les articles factices se ressemblent tous : l'anti-doublons les rejetterait
+    "DEDUP_CHECK": "false",
+})
+
+import daily_hardstyle_bot as daily  # noqa: E402
+import weekly_hardstyle_ranking_bot as weekly  # noqa: E402
+from fake_services import FakeServices, build_article  # noqa: E402
+from hardstyle.charts import SIGNAL_COLUMNS, SignalTable, rank_week  # noqa: E402
+from hardstyle.fanout import publish_variants, split_chunks  # noqa: E402
+from hardstyle.hedging import HedgedExecutor, LatencyStore  # noqa: E402
+from hardstyle.http_client import HttpClient, get_client  # noqa: E402
+from hardstyle.outbox import Outbox  # noqa: E402
+from hardstyle.postprocess import IncrementalArticleProcessor, XCEED_AFTER_MENTION  # noqa: E402
+from hardstyle.streaming import chat_completion  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BOTS = {
+    "daily": (daily, "generate_daily_hardstyle_article", "generate_daily_hardstyle_articles"),
+    "weekly": (weekly, "generate_weekly_ranking_article", "generate_weekly_ranking_articles"),
+}
+POSTPROCESS_SIZES_KB = (1, 10, 100)
+STREAM_CHUNK_SIZE = 24
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Ko sous Linux, octets sous macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextlib.contextmanager
+def quiet(verbose):
+    """Masque la sortie très bavarde des bots (sauf --verbose)."""
+    if verbose:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def timed_phases(module, phases):
+    """Remplace temporairement les fonctions de `module` par des versions chronométrées."""
+    originals = {}
+
+    def wrap(phase, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - started
+        return timed
+
+    timings = {}
+    for phase, name in phases.items():
+        originals[name] = getattr(module, name)
+        setattr(module, name, wrap(phase, originals[name]))
+    try:
+        yield timings
+    finally:
+        for name, function in originals.items():
+            setattr(module, name, function)
+
+
+def point_bot_at(module, services):
+    module.MISTRAL_API_BASE_URL = services.mistral_url
+    module.HASHNODE_API_URL = services.hashnode_url
+    # Le test d'authentification est mesuré à chaque exécution (pas de cache)
+    module.MISTRAL_AUTH_PROBE = "always"
+
+
+def bench_single_run(bot, streaming, verbose):
+    """Exécute `main()` du bot une fois et retourne le temps de chaque phase (en secondes)."""
+    module, generate_name, _ = BOTS[bot]
+    module.MISTRAL_STREAMING = streaming
+    phases = {
+        "validate": "validate_environment",
+        "auth_probe": "test_mistral_auth",
+        "generate": generate_name,
+        "publish": "publish_article",
+    }
+    argv = sys.argv
+    sys.argv = [module.__file__]
+    started = time.perf_counter()
+    try:
+        with timed_phases(module, phases) as timings, quiet(verbose):
+            module.main()
+    except SystemExit as e:
+        raise RuntimeError(f"{bot} bot exited with status {e.code} during the benchmark")
+    finally:
+        sys.argv = argv
+    total = time.perf_counter() - started
+    result = {phase: round(timings.get(phase, 0.0), 4) for phase in phases}
+    result["other"] = round(total - sum(timings.values()), 4)
+    result["total"] = round(total, 4)
+    return result
+
+
+def bench_throughput(bot, concurrency, articles, verbose):
+    """Génère `articles` articles via le mode batch du bot ; retourne le débit en articles/min."""
+    module, _, batch_name = BOTS[bot]
+    if bot == "daily":
+        items = [module.HARDSTYLE_TOPICS[i % len(module.HARDSTYLE_TOPICS)] for i in range(articles)]
+    else:
+        with quiet(verbose):
+            items = [module.select_artists_for_prompt() for _ in range(articles)]
+    retries_before = sum(host["retries"] for host in get_client().stats().values())
+    started = time.perf_counter()
+    with quiet(verbose):
+        results = asyncio.run(getattr(module, batch_name)(items, concurrency=concurrency))
+    elapsed = time.perf_counter() - started
+    succeeded = sum(1 for result in results if not isinstance(result, BaseException))
+    return {
+        "concurrency": concurrency,
+        "articles": articles,
+        "succeeded": succeeded,
+        "seconds": round(elapsed, 3),
+        "articles_per_min": round(succeeded / elapsed * 60, 1),
+        "retries": sum(host["retries"] for host in get_client().stats().values()) - retries_before,
+    }
+
+
+def bench_publish(services, posts, verbose):
+    """Publie `posts` articles un par un puis en lots GraphQL ; retourne durée et requêtes de chaque mode."""
+    articles = [build_article(index, 300) for index in range(posts)]
+    results = {}
+    for mode in ("sequential", "batched"):
+        requests_before = services.counters["publish_requests"]
+        started = time.perf_counter()
+        with quiet(verbose):
+            if mode == "sequential":
+                for article in articles:
+                    daily.publish_article(article, exit_on_error=False)
+            else:
+                daily.publish_articles(articles)
+        elapsed = time.perf_counter() - started
+        results[mode] = {"posts": posts, "seconds": round(elapsed, 3),
+                         "requests": services.counters["publish_requests"] - requests_before}
+    return results
+
+
+def bench_tail_latency(services, calls, slow_every, slow_latency, verbose):
+    """
+    `calls` complétions non streamées, une lente sur `slow_every`, sans puis avec requêtes doublées.
+    Un premier passage identique (non mesuré) remplit l'histogramme des latences.
+    """
+    payload = {"model": daily.MISTRAL_MODEL_NAME, "messages": [{"role": "user", "content": "bench"}],
+               "max_tokens": 400}
+    results = {}
+    services.configure(slow_every=slow_every, slow_latency=slow_latency, rate_limit_every=0)
+    try:
+        for mode in ("single", "hedged"):
+            executor = HedgedExecutor(store=LatencyStore(os.path.join(BENCH_CACHE_DIR, f"bench_latency_{mode}.sqlite3")), enabled=mode == "hedged",
+                                      min_delay=0)
+            latencies = []
+            for index in range(2 * calls):
+                if index == calls:
+                    requests_before = services.counters["mistral"]
+                started = time.perf_counter()
+                with quiet(verbose):
+                    executor.call("bench", lambda cancel, claim: chat_completion(
+                        services.mistral_url, daily.mistral_headers(), payload))
+                if index >= calls:
+                    latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            results[mode] = {
+                "calls": calls,
+                "p50": round(latencies[len(latencies) // 2], 4),
+                "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 4),
+                "max": round(latencies[-1], 4),
+                "seconds": round(sum(latencies), 3),
+                "requests": services.counters["mistral"] - requests_before,
+            }
+    finally:
+        services.configure(slow_every=0)
+    return results
+
+
+def bench_rate_limit(services, calls, quota_rps, concurrency, verbose):
+    """
+    `calls` complétions envoyées par `concurrency` workers contre un quota de `quota_rps` requêtes/s,
+    sans puis avec le limiteur partagé : durée, 429 reçus et appels en échec.
+    """
+    payload = {"model": daily.MISTRAL_MODEL_NAME, "messages": [{"role": "user", "content": "bench"}],
+               "max_tokens": 400}
+    results = {}
+    services.configure(quota_rps=quota_rps, rate_limit_every=0)
+    try:
+        for mode in ("unlimited", "limited"):
+            client = HttpClient(rate_limit=mode == "limited")
+            time.sleep(1.5)     # quota de nouveau plein
+            rejected_before = services.counters["rate_limited"]
+            started = time.perf_counter()
+
+            def call(_):
+                try:
+                    chat_completion(services.mistral_url, daily.mistral_headers(), payload, client=client)
+                    return True
+                except Exception:
+                    return False
+
+            with quiet(verbose), concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+                succeeded = sum(pool.map(call, range(calls)))
+            elapsed = time.perf_counter() - started
+            results[mode] = {"calls": calls, "quota_rps": quota_rps, "seconds": round(elapsed, 3),
+                             "failed": calls - succeeded,
+                             "rate_limited": services.counters["rate_limited"] - rejected_before}
+            client.close()
+    finally:
+        services.configure(quota_rps=0)
+    return results
+
+
+def bench_fanout(services, languages, verbose):
+    """
+    Traduction d'un article de 1200 mots en `languages` langues puis publication de chaque variante,
+    une traduction à la fois puis toutes les sections de toutes les langues en parallèle.
+    """
+    article = build_article(0, 1200)
+    targets = {f"l{index}": f"publication-{index}" for index in range(languages)}
+    sections = sum(translate for translate, _ in split_chunks(article))
+    results = {}
+    # Réponses courtes : une section traduite ne doit pas atteindre max_tokens
+    article_words = services.config["article_words"]
+    services.configure(article_words=150)
+    outbox = Outbox()
+    try:
+        for mode, concurrency in (("sequential", 1), ("parallel", languages * sections)):
+            requests_before = services.counters["mistral"]
+            started = time.perf_counter()
+            with quiet(verbose):
+                variants = publish_variants(outbox, f"bench-{mode}", article, daily.mistral_completion,
+                                            daily.publish_variant, targets=targets, concurrency=concurrency)
+            elapsed = time.perf_counter() - started
+            results[mode] = {"languages": languages, "sections": sections, "seconds": round(elapsed, 3),
+                             "failed": sum(isinstance(result, Exception) for result in variants.values()),
+                             "translations": services.counters["mistral"] - requests_before}
+    finally:
+        services.configure(article_words=article_words)
+        outbox.close()
+    return results
+
+
+def bench_postprocess(repeat):
+    """Coût du post-traitement incrémental (flux découpé comme en streaming, mentions du roster comprises), en µs par Ko."""
+    results = []
+    linker = weekly.get_entity_linker()
+    for size_kb in POSTPROCESS_SIZES_KB:
+        article = build_article(0, size_kb * 1024 // 6)[:size_kb * 1024]
+        chunks = [article[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(article), STREAM_CHUNK_SIZE)]
+        best = None
+        for _ in range(repeat):
+            processor = IncrementalArticleProcessor(weekly.XCEED_SPOTIFY_EMBED, weekly.PLAYLIST_SPOTIFY_EMBED,
+                                                    "**Playlist:**", xceed_strategy=XCEED_AFTER_MENTION,
+                                                    linker=linker)
+            started = time.perf_counter()
+            with quiet(False):
+                for chunk in chunks:
+                    processor.feed(chunk)
+                processor.finish()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({"size_kb": size_kb, "ms": round(best * 1e3, 3),
+                        "us_per_kb": round(best * 1e6 / size_kb, 1)})
+    return results
+
+
+def bench_ranking(rows, artists, weeks, repeat):
+    """Durée du classement hebdomadaire sur une table synthétique de `rows` lignes de signaux (meilleure de `repeat`)."""
+    rng = np.random.default_rng(2025)
+    values = np.empty((rows, len(SIGNAL_COLUMNS)))
+    values[:, 0] = rng.lognormal(9, 1.5, rows).round()
+    values[:, 1] = np.where(rng.random(rows) < 0.05, rng.integers(1, 101, rows), 0)
+    values[:, 2] = rng.poisson(5, rows)
+    values[:, 3] = rng.poisson(0.2, rows)
+    table = SignalTable([f"Artist {artist}" for artist in range(artists)], rng.integers(0, artists, rows),
+                        rng.integers(0, weeks, rows), values)
+    eligible = np.ones(artists, dtype=bool)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        ranking = rank_week(table, eligible=eligible, pinned=("Artist 0",))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {"rows": rows, "artists": artists, "weeks": weeks, "entries": len(ranking), "ms": round(best * 1e3, 2),
+            "ms_per_million_rows": round(best * 1e9 / rows, 2)}
+
+
+def compare(current, previous_path):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparison with {previous_path} (commit {previous['meta']['commit']}):")
+    for name, run in current["runs"].items():
+        before = previous.get("runs", {}).get(name)
+        if before:
+            print(f"  {name:<18} total {before['total']:.3f}s -> {run['total']:.3f}s "
+                  f"({(run['total'] - before['total']) / before['total'] * 100:+.1f}%)")
+    for scenario, rows in current["throughput"].items():
+        before = {row["concurrency"]: row for row in previous.get("throughput", {}).get(scenario, [])}
+        for row in rows:
+            old = before.get(row["concurrency"])
+            if old:
+                print(f"  {scenario} c={row['concurrency']:<3} {old['articles_per_min']:.1f} -> "
+                      f"{row['articles_per_min']:.1f} articles/min")
+    print(f"  peak RSS {previous.get('peak_rss_mb')} MB -> {current.get('peak_rss_mb')} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of both bots against local fake services.")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Mistral latency before the first byte (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.002, help="delay between SSE events (s)")
+    parser.add_argument("--article-words", type=int, default=1200)
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma-separated batch concurrency levels")
+    parser.add_argument("--articles", type=int, default=8, help="articles generated per throughput measurement")
+    parser.add_argument("--rate-limit-every", type=int, default=4,
+                        help="every Nth Mistral request gets a 429 in the rate-limited scenario")
+    parser.add_argument("--publish-posts", type=int, default=20, help="posts published by the publishing benchmark")
+    parser.add_argument("--tail-calls", type=int, default=50, help="completions measured by the tail latency benchmark")
+    parser.add_argument("--slow-every", type=int, default=25,
+                        help="every Nth Mistral request is slow in the tail latency benchmark")
+    parser.add_argument("--slow-latency", type=float, default=1.0, help="latency of the slow responses (s)")
+    parser.add_argument("--quota-calls", type=int, default=40, help="completions sent by the rate limit benchmark")
+    parser.add_argument("--quota-rps", type=float, default=10, help="fake Mistral request quota (requests/s)")
+    parser.add_argument("--fanout-languages", type=int, default=4, help="languages of the translation fan-out benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions of the post-processing measurement")
+    parser.add_argument("--ranking-rows", type=int, default=2_000_000,
+                        help="signal rows of the weekly ranking benchmark")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/e2e-<date>-<commit>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="previous results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show the bots' own output")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "verbose")},
+        },
+        "runs": {},
+        "throughput": {},
+    }
+
+    with FakeServices(latency=args.latency, chunk_delay=args.chunk_delay,
+                      article_words=args.article_words) as services:
+        for module, _, _ in BOTS.values():
+            point_bot_at(module, services)
+
+        print(f"Fake services on {services.base_url} (cache: {BENCH_CACHE_DIR})\n")
+        print(f"{'run':<18} | {'validate':>8} | {'auth':>7} | {'generate':>8} | {'publish':>7} | {'total':>7}")
+        print("-" * 72)
+        for bot in BOTS:
+            for streaming in (True, False):
+                name = f"{bot}-{'streaming' if streaming else 'blocking'}"
+                run = bench_single_run(bot, streaming, args.verbose)
+                report["runs"][name] = run
+                print(f"{name:<18} | {run['validate']:7.3f}s | {run['auth_probe']:6.3f}s | "
+                      f"{run['generate']:7.3f}s | {run['publish']:6.3f}s | {run['total']:6.3f}s")
+
+        for module, _, _ in BOTS.values():
+            module.MISTRAL_STREAMING = True
+        for rate_limited in (False, True):
+            services.configure(rate_limit_every=args.rate_limit_every if rate_limited else 0)
+            for bot in BOTS:
+                scenario = f"{bot}{'-429' if rate_limited else ''}"
+                rows = report["throughput"][scenario] = []
+                print(f"\nThroughput {scenario} ({args.articles} articles):")
+                for concurrency in levels:
+                    row = bench_throughput(bot, concurrency, args.articles, args.verbose)
+                    rows.append(row)
+                    print(f"  concurrency {concurrency:>2}: {row['articles_per_min']:8.1f} articles/min "
+                          f"({row['succeeded']}/{row['articles']} ok, {row['seconds']:.2f}s, "
+                          f"{row['retries']} retries)")
+
+        report["publish"] = bench_publish(services, args.publish_posts, args.verbose)
+        print(f"\nPublishing {args.publish_posts} posts:")
+        for mode, row in report["publish"].items():
+            print(f"  {mode:<10}: {row['seconds']:6.3f}s ({row['requests']} request(s))")
+        report["tail_latency"] = bench_tail_latency(services, args.tail_calls, args.slow_every, args.slow_latency,
+                                                    args.verbose)
+        print(f"\nTail latency ({args.tail_calls} completions, 1 in {args.slow_every} takes {args.slow_latency:g}s):")
+        for mode, row in report["tail_latency"].items():
+            print(f"  {mode:<10}: p50 {row['p50']:.3f}s, p99 {row['p99']:.3f}s, max {row['max']:.3f}s, "
+                  f"total {row['seconds']:.2f}s ({row['requests']} request(s))")
+        report["rate_limit"] = bench_rate_limit(services, args.quota_calls, args.quota_rps, 8, args.verbose)
+        print(f"\nRate limit ({args.quota_calls} completions from 8 workers, quota {args.quota_rps:g} req/s):")
+        for mode, row in report["rate_limit"].items():
+            print(f"  {mode:<10}: {row['seconds']:6.3f}s, {row['rate_limited']} 429(s), {row['failed']} failed call(s)")
+        report["fanout"] = bench_fanout(services, args.fanout_languages, args.verbose)
+        print(f"\nTranslation fan-out ({args.fanout_languages} languages, "
+              f"{report['fanout']['parallel']['sections']} section(s) each):")
+        for mode, row in report["fanout"].items():
+            print(f"  {mode:<10}: {row['seconds']:6.3f}s ({row['translations']} translation(s), "
+                  f"{row['failed']} failed variant(s))")
+        report["fake_services"] = dict(services.counters)
+
+    report["postprocess"] = bench_postprocess(args.repeat)
+    print("\nPost-processing (incremental, streamed in "
+          f"{STREAM_CHUNK_SIZE}-char chunks):")
+    for row in report["postprocess"]:
+        print(f"  {row['size_kb']:>4} KB: {row['ms']:8.3f} ms ({row['us_per_kb']:.1f} µs/KB)")
+
+    report["ranking"] = bench_ranking(args.ranking_rows, 20_000, 52, args.repeat)
+    print(f"\nWeekly ranking ({report['ranking']['rows']} signal rows, {report['ranking']['artists']} artists): "
+          f"{report['ranking']['ms']:.1f} ms ({report['ranking']['ms_per_million_rows']:.1f} ms per million rows)")
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    print(f"\nPeak RSS: {report['peak_rss_mb']} MB")
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"e2e-{time.strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
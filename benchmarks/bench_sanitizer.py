@@ -0,0 +1,76 @@
+"""
+Micro-benchmark du nettoyage des articles : ancienne chaîne replace/re.sub contre le
+nettoyeur compilé en une passe (hardstyle.sanitizer), sur des articles de 1 Ko à 1 Mo.
+
+    python benchmarks/bench_sanitizer.py [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hardstyle.sanitizer import sanitize  # noqa: E402
+
+SIZES = (1024, 10 * 1024, 100 * 1024, 1024 * 1024)
+
+PARAGRAPH = (
+    "XCEED keeps pushing the raw Hardstyle sound forward with festival-ready kicks and melodies "
+    "that resonate with every Hardstyle fan on the main stage.\n\n"
+)
+NOISE = (
+    "*Note: the Spotify links above are examples.*\n\n",
+    "Note: check the SUMMER HARDSTYLE 2025🔥 playlist.\n\n",
+    "By Nathan Remacle.\n\n",
+)
+
+
+def legacy_sanitize(content):
+    """Chaîne historique, appliquée deux fois par article (génération puis publication)."""
+    for _ in range(2):
+        content = content.replace("Par Nathan Remacle.", "").strip()
+        content = content.replace("By Nathan Remacle.", "").strip()
+        content = re.sub(r'\*Note\s*:\s*(.*?)\s*\*', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
+        content = re.sub(r'Note\s*:\s*(.*?)\s*', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
+    return content
+
+
+def build_article(size, noise_every=20):
+    parts = ["# Hardstyle Benchmark Article\n\n"]
+    length = len(parts[0])
+    index = 0
+    while length < size:
+        chunk = NOISE[index // noise_every % len(NOISE)] if index % noise_every == noise_every - 1 else PARAGRAPH
+        parts.append(chunk)
+        length += len(chunk)
+        index += 1
+    return "".join(parts)[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} | {'legacy (2 passes)':>18} | {'compiled (1 pass)':>18} | {'speed-up':>8}")
+    print("-" * 62)
+    for size in SIZES:
+        article = build_article(size)
+        number = max(1, 200_000 // size)
+        legacy = min(timeit.repeat(lambda: legacy_sanitize(article), number=number, repeat=args.repeat)) / number
+        compiled = min(timeit.repeat(lambda: sanitize(article), number=number, repeat=args.repeat)) / number
+        label = f"{size // 1024} KB" if size < 1024 * 1024 else "1 MB"
+        print(f"{label:>8} | {legacy * 1e3:15.3f} ms | {compiled * 1e3:15.3f} ms | {legacy / compiled:7.1f}x")
+
+    # Cas pathologique : des "*Note:" jamais refermés font balayer l'ancien motif jusqu'à la fin du texte
+    article = ("*Note: " + PARAGRAPH) * 2000
+    legacy = min(timeit.repeat(lambda: legacy_sanitize(article), number=1, repeat=args.repeat))
+    compiled = min(timeit.repeat(lambda: sanitize(article), number=1, repeat=args.repeat))
+    print(f"\nUnclosed '*Note:' x2000 ({len(article) // 1024} KB): legacy {legacy * 1e3:.1f} ms, "
+          f"compiled {compiled * 1e3:.1f} ms ({legacy / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Serveurs locaux imitant l'API Mistral AI (chat/completions, streaming SSE compris) la
+mutation GraphQL `publishPost` et la liste paginée des posts d'une publication Hashnode, pour mesurer les bots sans réseau ni quota.
+
+La latence (et sa queue), le débit du flux, la proportion de réponses 429 et un quota de requêtes
+annoncé en en-têtes `x-ratelimit-*` se règlent à chaud via
+`FakeServices.configure(...)`. Chaque article généré est unique (compteur dans le titre) :
+l'outbox ne le confond donc pas avec un article déjà publié.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARAGRAPH = (
+    "Hardstyle keeps evolving with raw kicks, euphoric melodies and festival energy that "
+    "brings the whole crowd together under the main stage lights."
+)
+XCEED_LINE = (
+    "XCEED stands out this week with a powerful set that blends raw energy and melodic "
+    "storytelling, a must-hear for every Hardstyle fan."
+)
+
+DEFAULT_CONFIG = {
+    "latency": 0.05,            # délai avant la première réponse (s)
+    "chunk_delay": 0.002,       # délai entre deux événements SSE (s)
+    "chunk_size": 24,           # caractères par événement SSE
+    "article_words": 1200,      # taille approximative des articles générés
+    "rate_limit_every": 0,      # une requête Mistral sur N reçoit un 429 (0 : jamais)
+    "retry_after": 0.05,        # valeur de l'en-tête Retry-After des 429 (s)
+    "slow_every": 0,            # une requête Mistral sur N répond avec `slow_latency` (0 : jamais)
+    "slow_latency": 1.0,        # délai des réponses lentes (s) : queue de latence
+    "publish_latency": 0.03,    # délai de la mutation publishPost (s)
+    "quota_rps": 0,             # quota Mistral (requêtes/s, rafale d'une seconde) annoncé en en-têtes ; au-delà : 429
+}
+
+
+def build_outline(number, entries=10):
+    """Plan JSON d'un classement (réponse aux requêtes `response_format: json_object`)."""
+    artists = [f"Headliner {index}" for index in range(1, entries + 1)]
+    artists[2], artists[5] = "XCEED", "113xA"
+    ranking = [{"rank": rank, "artist": artist, "angle": f"{artist} had a strong week on the main stages."}
+               for rank, artist in enumerate(artists, start=1)]
+    return json.dumps({"title": f"This Week's Hardstyle Top {entries} #{number}", "ranking": ranking})
+
+
+def build_article(number, words):
+    """Article Markdown synthétique d'environ `words` mots (titre H1, mention XCEED, note parasite)."""
+    lines = [f"# Hardstyle Benchmark Article #{number}", ""]
+    paragraph_words = len(PARAGRAPH.split())
+    for index in range(max(1, words // paragraph_words)):
+        lines.append(XCEED_LINE if index == 2 else PARAGRAPH)
+        if index == 5:
+            lines.append("*Note: the Spotify links above are examples.*")
+        lines.append("")
+    lines.append("By Nathan Remacle.")
+    return "\n".join(lines)
+
+
+class FakeServices:
+    def __init__(self, host="127.0.0.1", port=0, **config):
+        self.config = dict(DEFAULT_CONFIG)
+        self.configure(**config)
+        self.counters = {"mistral": 0, "rate_limited": 0, "streams": 0, "publish": 0, "publish_requests": 0,
+                         "query_requests": 0}
+        # Posts de la publication servis par la requête `publication { posts }`, du plus récent au plus ancien
+        self.posts = []
+        self._lock = threading.Lock()
+        self._quota = None          # [jetons restants, instant du dernier calcul] du quota Mistral
+        self._server = _Server((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.services = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def mistral_url(self):
+        return self.base_url + "/v1/chat/completions"
+
+    @property
+    def hashnode_url(self):
+        return self.base_url + "/graphql"
+
+    def configure(self, **config):
+        unknown = set(config) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown fake service option(s): {', '.join(sorted(unknown))}")
+        self.config.update(config)
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+            return self.counters[name]
+
+    def take_quota(self):
+        """
+        Consomme une requête du quota Mistral : retourne (accepté, en-têtes x-ratelimit-*), ou (True, {})
+        sans quota. Seau de `quota_rps` jetons rempli à `quota_rps` jetons par seconde.
+        """
+        rate = self.config["quota_rps"]
+        if not rate:
+            return True, {}
+        with self._lock:
+            now = time.monotonic()
+            if self._quota is None:
+                self._quota = [rate, now]
+            tokens = min(rate, self._quota[0] + (now - self._quota[1]) * rate)
+            accepted = tokens >= 1
+            if accepted:
+                tokens -= 1
+            self._quota = [tokens, now]
+        headers = {"x-ratelimit-limit-requests": f"{rate:g}", "x-ratelimit-remaining-requests": str(int(tokens)),
+                   "x-ratelimit-reset-requests": f"{(rate - tokens) / rate:.3f}s"}
+        if not accepted:
+            headers["Retry-After"] = f"{(1 - tokens) / rate:.3f}"
+        return accepted, headers
+
+    def add_posts(self, count, words=300):
+        """Ajoute `count` posts en tête de la publication factice (les plus récents en premier)."""
+        with self._lock:
+            for _ in range(count):
+                number = len(self.posts) + 1
+                stamp = f"2025-01-01T00:00:00.{number:06d}Z"
+                self.posts.insert(0, {
+                    "id": f"post-{number}", "slug": f"bench-post-{number}", "title": f"Bench post #{number}",
+                    "url": f"https://hardstyle.example/bench-post-{number}", "publishedAt": stamp,
+                    "updatedAt": stamp, "tags": [{"name": "Hardstyle", "slug": "hardstyle"}],
+                    "content": {"markdown": build_article(number, words)},
+                })
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Client parti avant la fin de la réponse (ex. copie d'une requête doublée annulée) : rien à signaler
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        services = self.server.services
+        config = services.config
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.startswith("/graphql"):
+            time.sleep(config["publish_latency"])
+            if "publication(" in body.get("query", ""):
+                self._send_publication_posts(body)
+                return
+            services.count("publish_requests")
+            variables = body.get("variables") or {}
+            # Mutation simple ($input) ou lot de mutations aliasées ($input0 -> p0, $input1 -> p1...)
+            aliases = {"publishPost": "input"} if "input" in variables else {
+                f"p{name[len('input'):]}": name for name in variables if name.startswith("input")}
+            data = {}
+            for alias in aliases:
+                number = services.count("publish")
+                data[alias] = {"post": {"id": str(number), "title": "bench", "slug": f"bench-{number}",
+                                        "url": f"https://hardstyle.example/bench-{number}"}}
+            self._send_json(200, {"data": data})
+            return
+
+        number = services.count("mistral")
+        slow = config["slow_every"] and number % config["slow_every"] == 0
+        time.sleep(config["slow_latency"] if slow else config["latency"])
+        if config["rate_limit_every"] and number % config["rate_limit_every"] == 0:
+            services.count("rate_limited")
+            self._send_json(429, {"message": "Requests rate limit exceeded"},
+                            {"Retry-After": f"{config['retry_after']:g}"})
+            return
+        accepted, quota_headers = services.take_quota()
+        if not accepted:
+            services.count("rate_limited")
+            self._send_json(429, {"message": "Requests rate limit exceeded"}, quota_headers)
+            return
+
+        finish_reason = "stop"
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            article = build_outline(number)
+        else:
+            # Comme le vrai modèle, la réponse ne dépasse pas max_tokens (~0,75 mot par token)
+            words = config["article_words"]
+            if body.get("max_tokens") and words > int(body["max_tokens"] * 0.75):
+                words, finish_reason = int(body["max_tokens"] * 0.75), "length"
+            article = build_article(number, words)
+        usage = {"prompt_tokens": 300, "completion_tokens": len(article) // 4,
+                 "total_tokens": 300 + len(article) // 4}
+        if not body.get("stream"):
+            self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": article},
+                                               "finish_reason": finish_reason}], "usage": usage}, quota_headers)
+            return
+
+        services.count("streams")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in quota_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        size = config["chunk_size"]
+        for start in range(0, len(article), size):
+            if config["chunk_delay"]:
+                time.sleep(config["chunk_delay"])
+            self._send_event({"choices": [{"delta": {"content": article[start:start + size]},
+                                           "finish_reason": None}]})
+        self._send_event({"choices": [{"delta": {}, "finish_reason": finish_reason}], "usage": usage})
+        self._send_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_publication_posts(self, body):
+        """Page de posts (pagination par curseur = position dans la liste) avec les champs demandés."""
+        services = self.server.services
+        services.count("query_requests")
+        variables = body.get("variables") or {}
+        start = int(variables.get("after") or 0)
+        with services._lock:
+            page = services.posts[start:start + int(variables["first"])]
+            has_next = start + len(page) < len(services.posts)
+        if "content" not in body["query"]:
+            page = [{key: post[key] for key in ("id", "publishedAt", "updatedAt")} for post in page]
+        connection = {"edges": [{"node": post} for post in page],
+                      "pageInfo": {"hasNextPage": has_next, "endCursor": str(start + len(page))}}
+        self._send_json(200, {"data": {"publication": {"posts": connection}}})
+
+    def _send_json(self, status, data, headers=None):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_event(self, data):
+        self._send_chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
@@ -1,3 +1,6 @@
+import argparse
+import asyncio
+import functools
 import os
 import sys
 import requests
@@ -5,28 +8,72 @@ from datetime import datetime
 import json
 import random
 
-# --- Récupération et vérification des clés d'API ---
+from hardstyle.auth_probe import ensure_auth
+from hardstyle.batch import BATCH_CONCURRENCY, BATCH_TASK_TIMEOUT, run_batch, save_drafts
+from hardstyle.continuation import repair_length
+from hardstyle.dedup import generate_distinct, open_duplicate_index, reject_duplicates
+from hardstyle.document import split_title
+from hardstyle.entities import ENTITY_LINKING, EntityLinker
+from hardstyle.fanout import FANOUT_TARGETS, publish_pending_variants, publish_variants
+from hardstyle.hashnode import HashnodeError, PUBLISH_POST_MUTATION, publish_posts
+from hardstyle.hedging import completion_name, hedged_chat_completion, hedged_post, hedged_stream_chat_completion
+from hardstyle.http_client import get_client, print_connection_stats
+from hardstyle.ledger import record_call, warn_regressions
+from hardstyle.mirror import find_post_by_title, internal_links
+from hardstyle.outbox import Outbox, publish_entries, publish_entry, publish_pending
+from hardstyle.postprocess import IncrementalArticleProcessor, RawArticleCollector, XCEED_AFTER_INTRO
+from hardstyle.roster import HARDSTYLE_ROSTER_FILE, Roster
+from hardstyle.routing import MISTRAL_MODEL, MISTRAL_MODELS, get_model_router
+from hardstyle.sanitizer import format_report, sanitize
+from hardstyle.telemetry import annotate, debug_payload, get_tracer, print_trace_summary, traced
+
+# --- Récupération des clés d'API (vérifiées par validate_environment) ---
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 HASHNODE_API_KEY = os.getenv("HASHNODE_API_KEY")
 
-if not MISTRAL_API_KEY:
-    print("❌ ERREUR : MISTRAL_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée et que vous avez créé une clé API Mistral AI.")
-    sys.exit(1)
+# --- Modèle Mistral AI et URL de l'API ---
+# Le modèle de chaque génération est choisi par le routeur (MISTRAL_MODELS, SLO du job "daily") ;
+# MISTRAL_MODEL l'impose. Ce modèle-ci sert au test d'authentification.
+MISTRAL_MODEL_NAME = MISTRAL_MODEL or MISTRAL_MODELS[0]
+MISTRAL_API_BASE_URL = "https://api.mistral.ai/v1/chat/completions"
 
-if not HASHNODE_API_KEY:
-    print("❌ ERREUR : HASHNODE_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée.")
-    sys.exit(1)
+# --- Test d'authentification Mistral AI ---
+# "cached" : un test réussi est mémorisé sur disque (MISTRAL_AUTH_CACHE_TTL secondes) par empreinte de clé + modèle ;
+# "always" : test à chaque exécution ; "off" : la génération sert de vérification.
+MISTRAL_AUTH_PROBE = os.getenv("MISTRAL_AUTH_PROBE", "cached").lower()
 
-# --- Définit le modèle Mistral AI à utiliser et l'URL de l'API ---
-MISTRAL_MODEL_NAME = "mistral-tiny" # Vous pouvez essayer "mistral-medium" ou "mistral-large" pour plus de détails
-MISTRAL_API_BASE_URL = "https://api.mistral.ai/v1/chat/completions"
+# --- Graine aléatoire optionnelle (sujets/artistes reproductibles, ex. rejeu de cassettes en CI) ---
+HARDSTYLE_RANDOM_SEED = os.getenv("HARDSTYLE_RANDOM_SEED")
+
+# --- Mentions des artistes du roster : liens internes, embeds Spotify et tags (ENTITY_LINKING) ---
+PINNED_ARTISTS = ("XCEED",)
+_entity_linker = None
+
+# --- Streaming des réponses Mistral AI ---
+# Le streaming évite de bloquer sur le timeout global de 180 s : seul un flux inactif
+# pendant MISTRAL_STREAM_STALL_TIMEOUT secondes est coupé.
+MISTRAL_STREAMING = os.getenv("MISTRAL_STREAMING", "true").lower() not in ("0", "false", "no")
+MISTRAL_STREAM_STALL_TIMEOUT = int(os.getenv("MISTRAL_STREAM_STALL_TIMEOUT", "30"))
+MISTRAL_STREAM_MAX_DURATION = int(os.getenv("MISTRAL_STREAM_MAX_DURATION", "600"))
+
+# Longueur demandée dans le prompt : en dessous (à LENGTH_REPAIR_TOLERANCE près), l'article est complété
+DAILY_TARGET_WORDS = 1200
 
 # --- Configuration Hashnode ---
+# Identifiant du bot dans l'outbox locale des articles à publier
+BOT_NAME = "daily"
 HASHNODE_API_URL = "https://gql.hashnode.com/"
 
 # IMPORTANT: REMPLACEZ CETTE VALEUR PAR L'ID DE VOTRE NOUVELLE PUBLICATION HASHNODE POUR LE BLOG MUSICAL !
 HARDSTYLE_PUBLICATION_ID = "6859c2f970cff8e4319738f3" # <-- **COLLEZ L'ID ICI**
 
+# Tags de l'article quotidien, complétés par les artistes mentionnés (au plus HASHNODE_MAX_TAGS)
+HASHNODE_BASE_TAGS = [
+    {"name": "Hardstyle", "slug": "hardstyle"},
+    {"name": "Music", "slug": "music"},
+    {"name": "Electronic Music", "slug": "electronic-music"}
+]
+
 # --- Variables pour l'URL de base du dépôt GitHub ---
 GITHUB_REPOSITORY = os.getenv('GITHUB_REPOSITORY')
 GITHUB_REF = os.getenv('GITHUB_REF')
@@ -37,7 +84,6 @@ if GITHUB_REPOSITORY:
 else:
     GITHUB_USERNAME = "votre_utilisateur" # Fallback si pas en environnement GH Actions
     GITHUB_REPO_NAME = "votre_repo"
-    print("⚠️ Variables GITHUB_REPOSITORY non trouvées. Utilisation de valeurs par défaut. Assurez-vous que le script s'exécute dans un environnement GitHub Actions.")
 
 if GITHUB_REF and GITHUB_REF.startswith('refs/heads/'):
     GITHUB_BRANCH = GITHUB_REF.split('/')[-1]
@@ -85,12 +131,15 @@ def test_mistral_auth():
 
     print(f"🔎 Test d'authentification Mistral AI avec modèle '{MISTRAL_MODEL_NAME}' à l'URL: {MISTRAL_API_BASE_URL}")
     try:
-        resp = requests.post(MISTRAL_API_BASE_URL, headers=headers, json=payload, timeout=30)
+        resp = get_client().post(MISTRAL_API_BASE_URL, headers=headers, json=payload, timeout=30, idempotent=True)
         print(f"Auth test Mistral status: {resp.status_code}")
         if resp.status_code == 200:
             print("✅ Authentification Mistral AI réussie et modèle accessible.")
             try:
                 response_data = resp.json()
+                # Le test d'authentification est une complétion facturée comme les autres
+                record_call("auth_probe", payload, response_data.get("usage"), resp.elapsed.total_seconds(),
+                            job=BOT_NAME)
                 if "choices" in response_data and response_data["choices"]:
                     print("✅ Réponse du modèle au format attendu (contient 'choices').")
                 else:
@@ -107,24 +156,40 @@ def test_mistral_auth():
         print(f"❌ ERREUR réseau ou connexion lors du test d'authentification Mistral AI : {e}")
         sys.exit(1)
 
-test_mistral_auth()
+def validate_environment():
+    """Vérifie les variables d'environnement requises ; appelée par le point d'entrée, pas à l'import."""
+    if not MISTRAL_API_KEY:
+        print("❌ ERREUR : MISTRAL_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée et que vous avez créé une clé API Mistral AI.")
+        sys.exit(1)
 
-# --- Génération de l'article Hardstyle Quotidien via Mistral AI API ---
-def generate_daily_hardstyle_article():
-    # Mots-clés pour des articles Hardstyle variés
-    hardstyle_topics = [
-        "the evolution of Hardstyle", "Hardstyle subgenres (Raw, Euphoric, Xtra Raw)",
-        "Hardstyle's impact on the electronic music scene", "essential Hardstyle festivals",
-        "Hardstyle production techniques", "the history of an iconic Hardstyle label",
-        "the culture of Hardstyle raves", "legendary Hardstyle DJ sets",
-        "the future of Hardstyle", "sound innovation in Hardstyle",
-        "the energy and emotion of Hardstyle", "iconic Hardstyle melodies"
-    ]
-    chosen_topic = random.choice(hardstyle_topics)
+    if not HASHNODE_API_KEY:
+        print("❌ ERREUR : HASHNODE_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée.")
+        sys.exit(1)
+
+    if not GITHUB_REPOSITORY:
+        print("⚠️ Variables GITHUB_REPOSITORY non trouvées. Utilisation de valeurs par défaut. Assurez-vous que le script s'exécute dans un environnement GitHub Actions.")
 
+def ensure_mistral_auth():
+    """Lance le test d'authentification Mistral AI à la demande, selon MISTRAL_AUTH_PROBE."""
+    ensure_auth(test_mistral_auth, MISTRAL_API_KEY, MISTRAL_MODEL_NAME, mode=MISTRAL_AUTH_PROBE)
+
+# --- Génération de l'article Hardstyle Quotidien via Mistral AI API ---
+# Mots-clés pour des articles Hardstyle variés
+HARDSTYLE_TOPICS = [
+    "the evolution of Hardstyle", "Hardstyle subgenres (Raw, Euphoric, Xtra Raw)",
+    "Hardstyle's impact on the electronic music scene", "essential Hardstyle festivals",
+    "Hardstyle production techniques", "the history of an iconic Hardstyle label",
+    "the culture of Hardstyle raves", "legendary Hardstyle DJ sets",
+    "the future of Hardstyle", "sound innovation in Hardstyle",
+    "the energy and emotion of Hardstyle", "iconic Hardstyle melodies"
+]
+
+@traced("prompt_build")
+def build_daily_prompt(chosen_topic):
+    """Construit le prompt de l'article quotidien sur `chosen_topic`."""
     # CHANGED: Prompt en anglais, suppression de la signature, ajout de l'instruction pour la note
     article_prompt = (
-        f"Write a professional, detailed, and captivating blog post of at least 1200 words in English on {chosen_topic} presenting a 'Top 10' or 'Top 15' or any Top Hardstyle artists of the day."
+        f"Write a professional, detailed, and captivating blog post of at least {DAILY_TARGET_WORDS} words in English on {chosen_topic} presenting a 'Top 10' or 'Top 15' or any Top Hardstyle artists of the day."
         "The article must resonate with electronic music and Hardstyle fans. "
         "Naturally integrate mentions of the artist **XCEED** and the **Spotify playlist 'SUMMER HARDSTYLE 2025🔥'**. "
         "Do NOT mention or include any notes about Spotify links being examples or placeholder. "
@@ -135,13 +200,79 @@ def generate_daily_hardstyle_article():
         "Optimize the content for SEO by naturally including relevant keywords (Hardstyle, electronic music, DJ, festivals, XCEED, Spotify). "
         "Adopt a passionate and engaging tone, avoiding overly 'AI-like' formulations."
     )
-    
-    headers = {
+    annotate(chars=len(article_prompt))
+    return article_prompt
+
+def mistral_headers():
+    return {
         "Authorization": f"Bearer {MISTRAL_API_KEY}",
         "Content-Type": "application/json"
     }
+
+def mistral_completion(prompt, max_tokens, model=MISTRAL_MODEL_NAME):
+    """Appel Mistral AI non streamé (continuation d'un article) ; retourne (texte, finish_reason)."""
     payload = {
-        "model": MISTRAL_MODEL_NAME,
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.7,
+        "max_tokens": max_tokens
+    }
+    return hedged_chat_completion(MISTRAL_API_BASE_URL, mistral_headers(), payload)
+
+def get_entity_linker():
+    """Repérage des artistes du roster dans les articles (None si ENTITY_LINKING est désactivé)."""
+    global _entity_linker
+    if _entity_linker is None and ENTITY_LINKING:
+        roster = Roster.load(HARDSTYLE_ROSTER_FILE)
+        _entity_linker = EntityLinker(roster.names, spotify_ids=roster.spotify_ids, links=internal_links(),
+                                      pinned=PINNED_ARTISTS)
+    return _entity_linker
+
+def postprocess_options():
+    """Paramètres du post-traitement (IncrementalArticleProcessor / postprocess_article) de l'article quotidien."""
+    return {
+        "xceed_embed": XCEED_SPOTIFY_EMBED,
+        "playlist_embed": PLAYLIST_SPOTIFY_EMBED,
+        "playlist_intro": "**Dive into the best of Hardstyle:**",
+        "xceed_strategy": XCEED_AFTER_INTRO,
+        "linker": get_entity_linker()
+    }
+
+@traced("generate")
+def generate_daily_hardstyle_article(topic=None, cancel_event=None, exit_on_error=True, postprocess=True):
+    """
+    Génère un article quotidien sur `topic` (tiré au hasard si absent).
+
+    En mode batch, `cancel_event` permet d'interrompre le streaming et `exit_on_error=False`
+    remonte les erreurs à l'appelant au lieu de quitter le processus. Avec `postprocess=False`,
+    le texte brut est retourné (post-traitement différé avec `postprocess_options()`).
+    """
+    chosen_topic = topic or random.choice(HARDSTYLE_TOPICS)
+
+    article_prompt = build_daily_prompt(chosen_topic)
+
+    def attempt(model, report):
+        return generate_with_model(model, report, chosen_topic, article_prompt, cancel_event, postprocess)
+
+    try:
+        # Modèle le moins cher qui respecte le SLO du quotidien ; repli sur le suivant si l'endpoint échoue
+        return get_model_router().run(BOT_NAME, attempt, DAILY_TARGET_WORDS, cancel_event=cancel_event)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ HTTP ERROR generating article with Mistral AI : {e}")
+        if not exit_on_error:
+            raise
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ DATA ERROR in Mistral AI response : {e}")
+        if not exit_on_error:
+            raise
+        sys.exit(1)
+
+def generate_with_model(model, report, chosen_topic, article_prompt, cancel_event=None, postprocess=True):
+    """Une tentative de génération avec `model` ; le texte brut (avant réparation) est signalé à `report`."""
+    headers = mistral_headers()
+    payload = {
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -152,112 +283,116 @@ def generate_daily_hardstyle_article():
         "max_tokens": 2000 # Ajusté pour correspondre à 1200 mots
     }
 
-    print(f"\n🚀 Attempting to generate daily Hardstyle article on '{chosen_topic}' with model '{MISTRAL_MODEL_NAME}'...")
-    try:
-        response = requests.post(
+    # Nouveau processeur à chaque tentative : un flux coupé ne laisse pas de fragments derrière lui
+    processor = IncrementalArticleProcessor(**postprocess_options()) if postprocess else RawArticleCollector()
+    complete = functools.partial(mistral_completion, model=model)
+
+    print(f"\n🚀 Attempting to generate daily Hardstyle article on '{chosen_topic}' with model '{model}'...")
+    if MISTRAL_STREAMING:
+        # Les tokens sont nettoyés et les embeds placés au fil des lignes reçues
+        # Flux doublé si le premier token tarde au-delà du p95 appris (HEDGE_PERCENTILE)
+        text, stats = hedged_stream_chat_completion(
             MISTRAL_API_BASE_URL,
-            headers=headers,
-            json=payload,
-            timeout=180
+            headers,
+            payload,
+            on_delta=processor.feed,
+            stall_timeout=MISTRAL_STREAM_STALL_TIMEOUT,
+            max_duration=MISTRAL_STREAM_MAX_DURATION,
+            cancel_event=cancel_event
         )
-        response.raise_for_status()
-
-        print("Status code Mistral:", response.status_code)
+        print("Status code Mistral:", stats["status_code"])
+        if not stats["chunks"]:
+            raise ValueError("Mistral AI stream ended without any content.")
+        print(f"DEBUG: Mistral stream completed (TTFT: {stats['ttft']:.2f}s, total: {stats['total']:.2f}s, "
+              f"chunks: {stats['chunks']}, finish_reason: {stats['finish_reason']}).")
+        annotate(streaming=True, status_code=stats["status_code"], ttfb=round(stats["ttft"], 3),
+                 chunks=stats["chunks"], finish_reason=stats["finish_reason"], bytes=len(text))
+        report.report(text, stats["finish_reason"])
+        # Article coupé par max_tokens ou trop court : on complète sa fin au lieu de tout régénérer
+        repair_length(text, stats["finish_reason"], complete,
+                      min_words=DAILY_TARGET_WORDS, on_text=processor.feed)
+        return processor.finish()
+
+    response = hedged_post(
+        MISTRAL_API_BASE_URL,
+        completion_name(payload),
+        cancel_event=cancel_event,
+        headers=headers,
+        json=payload,
+        timeout=180
+    )
+    response.raise_for_status()
+
+    print("Status code Mistral:", response.status_code)
+
+    data = response.json()
+
+    if 'choices' in data and data['choices'] and 'message' in data['choices'][0] and 'content' in data['choices'][0]['message']:
+        print("DEBUG: Response processed as Chat Completions API from Mistral AI.")
+        record_call("completion", payload, data.get("usage"), response.elapsed.total_seconds(),
+                    data['choices'][0]['message']['content'], data['choices'][0].get('finish_reason'))
+        annotate(streaming=False, status_code=response.status_code,
+                 ttfb=round(response.elapsed.total_seconds(), 3),
+                 finish_reason=data['choices'][0].get('finish_reason'),
+                 bytes=len(data['choices'][0]['message']['content']))
+        report.report(data['choices'][0]['message']['content'], data['choices'][0].get('finish_reason'))
+        # Même post-traitement que le mode streaming, appliqué à la réponse complète
+        processor.feed(data['choices'][0]['message']['content'])
+        repair_length(data['choices'][0]['message']['content'], data['choices'][0].get('finish_reason'),
+                      complete, min_words=DAILY_TARGET_WORDS, on_text=processor.feed)
+        return processor.finish()
+    else:
+        raise ValueError(f"Mistral AI response does not contain the expected chat completions format. Full response: {data}")
 
-        data = response.json()
-        
-        if 'choices' in data and data['choices'] and 'message' in data['choices'][0] and 'content' in data['choices'][0]['message']:
-            article_content = data['choices'][0]['message']['content'].strip()
-            print("DEBUG: Response processed as Chat Completions API from Mistral AI.")
-            
-            # Post-traitement pour retirer la signature et la note si l'IA les ajoute par erreur
-            article_content = article_content.replace("Par Nathan Remacle.", "").strip()
-            article_content = article_content.replace("By Nathan Remacle.", "").strip()
-            # Regex pour enlever la note sur les embeds, plus robuste
-            article_content = re.sub(r'\*Note\s*:\s*(.*?)\s*\*', '', article_content, flags=re.IGNORECASE | re.DOTALL).strip()
-            article_content = re.sub(r'Note\s*:\s*(.*?)\s*', '', article_content, flags=re.IGNORECASE | re.DOTALL).strip()
-
-
-            # Insérer les embeds Spotify. L'IA devrait déjà les mentionner,
-            # mais nous les ajoutons ici pour garantir leur présence et leur bon format.
-            # On insère XCEED après le premier paragraphe ou introduction du titre.
-            # On insère la playlist à la fin, avant la signature.
-            
-            # Placeholder pour insérer XCEED après l'intro ou le premier paragraphe
-            # On compte le nombre de lignes pour trouver un bon endroit
-            lines = article_content.split('\n')
-            insert_point_xceed = min(len(lines), 3) # Après le 3ème paragraphe max
-
-            # Insérer XCEED si le contenu est assez long
-            if len(lines) > 5: # Si l'article a au moins quelques paragraphes
-                # Vérifier si l'embed XCEED n'est pas déjà présent pour éviter les doublons
-                if XCEED_SPOTIFY_EMBED not in article_content:
-                    lines.insert(insert_point_xceed, "\n" + XCEED_SPOTIFY_EMBED + "\n")
-                    article_content = "\n".join(lines)
-                    print("DEBUG: Spotify embed for XCEED inserted.")
-
-            # Insérer la playlist à la fin du contenu
-            # Vérifier si l'embed de la playlist n'est pas déjà présent
-            if PLAYLIST_SPOTIFY_EMBED not in article_content:
-                article_content += "\n\n**Dive into the best of Hardstyle:**\n" + PLAYLIST_SPOTIFY_EMBED + "\n"
-                print("DEBUG: Spotify playlist embed inserted.")
-
-            return article_content
-        else:
-            raise ValueError(f"Mistral AI response does not contain the expected chat completions format. Full response: {data}")
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ HTTP ERROR generating article with Mistral AI : {e}")
-        sys.exit(1)
-    except ValueError as e:
-        print(f"❌ DATA ERROR in Mistral AI response : {e}")
-        sys.exit(1)
+# --- Génération en batch (asyncio) ---
+async def generate_daily_hardstyle_articles(topics, concurrency=BATCH_CONCURRENCY, task_timeout=BATCH_TASK_TIMEOUT):
+    """
+    Génère un article par sujet de `topics`, au plus `concurrency` en parallèle.
+    Retourne une liste alignée sur `topics` : article Markdown ou exception de la tâche.
+    """
+    def job(topic, cancel_event):
+        return generate_daily_hardstyle_article(topic, cancel_event=cancel_event, exit_on_error=False)
+    return await run_batch(job, topics, concurrency=concurrency, task_timeout=task_timeout)
 
 # --- Publication de l'article sur Hashnode ---
-def publish_article(content):
-    publication_id = HARDSTYLE_PUBLICATION_ID
+def hashnode_headers():
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {HASHNODE_API_KEY}"
+    }
+
+def build_post_input(content, published_at=None, publication_id=None):
+    """
+    Prépare la publication d'un article : titre H1 extrait, nettoyage final, tags et image de couverture.
+    `published_at` (ISO 8601) antidate le post ; `publication_id` remplace HARDSTYLE_PUBLICATION_ID
+    (variantes traduites). Retourne (titre, contenu publié, PublishPostInput).
+    """
+    publication_id = publication_id or HARDSTYLE_PUBLICATION_ID
     
-    first_line_match = content.split('\n')[0].strip()
-    extracted_title = ""
-    if first_line_match.startswith('# '):
-        extracted_title = first_line_match[2:].strip()
-        content = content[len(first_line_match):].strip()
-    else:
+    # Titre H1 de la première ligne, sans redécouper tout l'article
+    extracted_title, content = split_title(content)
+    if not extracted_title:
         # Fallback pour le titre, également en anglais
         extracted_title = "Hardstyle Article from " + datetime.now().strftime("%d %B %Y - %H:%M")
 
-    # Suppression finale de toute signature ou note résiduelle
-    content = content.replace("Par Nathan Remacle.", "").strip()
-    content = content.replace("By Nathan Remacle.", "").strip()
-    content = re.sub(r'\*Note\s*:\s*(.*?)\s*\*', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
-    content = re.sub(r'Note\s*:\s*(.*?)\s*', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
+    # Suppression finale de toute signature ou note résiduelle (filet de sécurité, une seule passe)
+    content, sanitize_report = sanitize(content)
+    if sanitize_report["removed"]:
+        print(f"DEBUG: Sanitizer removed before publishing: {format_report(sanitize_report)}.")
 
 
     selected_cover_url = get_daily_cover_image_url() # Utilisation de l'image spécifique daily.png
 
-    mutation = """
-    mutation PublishPost($input: PublishPostInput!) {
-      publishPost(input: $input) {
-        post {
-          id
-          title
-          slug
-          url
-        }
-      }
-    }
-    """
-    
+    # Tags : artistes mentionnés dans l'article (une seule passe sur le texte)
+    linker = get_entity_linker()
+    tags = linker.tags(content, HASHNODE_BASE_TAGS) if linker is not None else HASHNODE_BASE_TAGS
+
     variables = {
         "input": {
             "title": extracted_title,
             "contentMarkdown": content,
             "publicationId": publication_id,
-            "tags": [
-                {"name": "Hardstyle", "slug": "hardstyle"},
-                {"name": "Music", "slug": "music"},
-                {"name": "Electronic Music", "slug": "electronic-music"}
-            ],
+            "tags": tags,
         }
     }
     
@@ -270,27 +405,38 @@ def publish_article(content):
     else:
         print("DEBUG: No cover image added (no URL configured or list empty).")
 
+    if published_at:
+        variables["input"]["publishedAt"] = published_at
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {HASHNODE_API_KEY}"
-    }
+    return extracted_title, content, variables["input"]
+
+@traced("publish")
+def publish_article(content, exit_on_error=True, published_at=None, publication_id=None):
+    """
+    Publie l'article sur Hashnode et retourne l'URL du post (None si non renvoyée).
+    Avec `exit_on_error=False`, les erreurs sont relevées pour que l'outbox garde l'article.
+    """
+    extracted_title, content, post_input = build_post_input(content, published_at, publication_id)
+    variables = {"input": post_input}
+    headers = hashnode_headers()
 
     print(f"\n✍️ Attempting to publish article '{extracted_title}' to Hashnode...")
-    print(f"DEBUG: JSON Payload sent to Hashnode (without full content): {json.dumps(variables, indent=2)}")
+    debug_payload("Hashnode publishPost variables", variables)
     print(f"DEBUG: Start of Markdown content sent: {content[:200]}...")
 
     try:
-        resp = requests.post(HASHNODE_API_URL, json={"query": mutation, "variables": variables}, headers=headers)
+        # Timeouts par défaut du client partagé (connexion 10 s, lecture 60 s)
+        resp = get_client().post(HASHNODE_API_URL, json={"query": PUBLISH_POST_MUTATION, "variables": variables}, headers=headers)
         
         print("Publish status:", resp.status_code)
+        annotate(status_code=resp.status_code, bytes=len(content))
         print("Publish response:", resp.text)
         
         response_data = resp.json()
 
         if 'errors' in response_data and response_data['errors']:
             print(f"❌ GraphQL ERROR from Hashnode when publishing article : {response_data['errors']}")
-            sys.exit(1)
+            raise HashnodeError(response_data['errors'])
 
         post_url = None
         if 'data' in response_data and \
@@ -301,25 +447,143 @@ def publish_article(content):
             print(f"✅ Article published successfully : {extracted_title} at URL : {post_url}")
         else:
             print(f"✅ Article published successfully (URL not retrieved) : {extracted_title}")
+        return post_url
 
+    except HashnodeError:
+        if not exit_on_error:
+            raise
+        sys.exit(1)
     except requests.exceptions.RequestException as e:
         print(f"❌ HTTP ERROR publishing article to Hashnode : {e}")
         print(f"Hashnode response on error : {resp.text if 'resp' in locals() else 'No response.'}")
+        if not exit_on_error:
+            raise
         sys.exit(1)
     except Exception as e:
         print(f"❌ An unexpected error occurred during publication : {e}")
+        if not exit_on_error:
+            raise
         sys.exit(1)
 
+@traced("publish_batch")
+def publish_articles(contents):
+    """
+    Publie plusieurs articles en lots de mutations aliasées (une requête Hashnode pour plusieurs posts).
+    Retourne, pour chaque article, l'URL du post ou l'exception de son échec.
+    """
+    prepared = [build_post_input(content) for content in contents]
+    print(f"\n✍️ Attempting to publish {len(prepared)} articles to Hashnode in batched requests...")
+    results = publish_posts(HASHNODE_API_URL, hashnode_headers(), [post_input for _, _, post_input in prepared])
+    annotate(posts=len(prepared), failed=sum(isinstance(result, Exception) for result in results))
+    urls = []
+    for (extracted_title, _, _), result in zip(prepared, results):
+        if isinstance(result, Exception):
+            print(f"❌ Could not publish article '{extracted_title}' : {result}")
+            urls.append(result)
+        else:
+            print(f"✅ Article published successfully : {extracted_title} at URL : {result.get('url')}")
+            urls.append(result.get("url"))
+    return urls
+
+def find_published_post(content):
+    """URL du post de la publication qui porte déjà le titre de `content` (miroir Hashnode), sinon None."""
+    title, _ = split_title(content)
+    if not title:
+        return None
+    return find_post_by_title(HASHNODE_API_URL, hashnode_headers(), HARDSTYLE_PUBLICATION_ID, title,
+                              artists=Roster.load(HARDSTYLE_ROSTER_FILE).names)
+
+def publish_with_outbox(outbox, article):
+    """
+    Enregistre l'article dans l'outbox avant de le publier (il survit ainsi à un échec Hashnode) ;
+    un article déjà tenté est d'abord recherché sur la publication pour ne pas le publier deux fois.
+    """
+    digest = outbox.add(BOT_NAME, article)
+    return publish_entry(outbox, digest, lambda content: publish_article(content, exit_on_error=False),
+                         lookup=find_published_post)
+
+def publish_batch_with_outbox(outbox, articles):
+    """Enregistre les articles dans l'outbox puis les publie en lots GraphQL."""
+    digests = [outbox.add(BOT_NAME, article) for article in articles]
+    return publish_entries(outbox, digests, publish_articles, lookup=find_published_post)
+
+def publish_variant(content, publication_id):
+    return publish_article(content, exit_on_error=False, publication_id=publication_id)
+
+def publish_translations(outbox, article):
+    """Traduit l'article publié et publie ses variantes sur les publications de FANOUT_LANGUAGES (sans effet si vide)."""
+    if not FANOUT_TARGETS:
+        return {}
+    # Même texte que le post d'origine : titre H1 puis contenu nettoyé
+    title, content = split_title(article)
+    content, _ = sanitize(content)
+    source = f"# {title}\n\n{content}" if title else content
+    return publish_variants(outbox, BOT_NAME, source, mistral_completion, publish_variant)
+
+def publish_next_article(exit_on_error=True):
+    """
+    Une publication complète : un article resté dans l'outbox passe en priorité, sinon un nouvel
+    article est généré puis publié. Utilisée par main() et par le planificateur (exit_on_error=False).
+    """
+    outbox = Outbox()
+    # Variantes traduites dont la publication a échoué lors d'une exécution précédente
+    publish_pending_variants(outbox, BOT_NAME, publish_variant)
+    # Un article généré lors d'une exécution précédente mais jamais publié passe en priorité :
+    # il est republié depuis l'outbox sans nouvelle génération.
+    if not publish_pending(outbox, BOT_NAME, lambda content: publish_article(content, exit_on_error=False),
+                           publish_many=publish_articles, lookup=find_published_post):
+        # Un quasi-doublon d'un article déjà généré est régénéré (nouveau sujet tiré au hasard)
+        article = generate_distinct(lambda: generate_daily_hardstyle_article(exit_on_error=exit_on_error),
+                                    open_duplicate_index(outbox), BOT_NAME)
+        publish_with_outbox(outbox, article)
+        publish_translations(outbox, article)
+
 # --- Main Execution ---
-if __name__ == "__main__":
-    # Add re module import
-    import re
+def run_batch_mode(count, drafts_dir, publish):
+    """Génère `count` articles en parallèle, les sauvegarde en brouillons et les publie si demandé."""
+    # Sujets distincts tant que possible, puis tirage avec remise
+    topics = random.sample(HARDSTYLE_TOPICS, min(count, len(HARDSTYLE_TOPICS)))
+    topics += [random.choice(HARDSTYLE_TOPICS) for _ in range(count - len(topics))]
+    print(f"🚀 Batch mode: generating {count} daily article(s) (concurrency {BATCH_CONCURRENCY}).")
+    results = asyncio.run(generate_daily_hardstyle_articles(topics))
+    articles = save_drafts(results, drafts_dir, "daily")
+    if not articles:
+        print("❌ No article could be generated in batch mode.")
+        sys.exit(1)
+    if publish:
+        outbox = Outbox()
+        articles = reject_duplicates(articles, open_duplicate_index(outbox), BOT_NAME)
+        publish_batch_with_outbox(outbox, articles)
+        for article in articles:
+            publish_translations(outbox, article)
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily Hardstyle blog bot.")
+    parser.add_argument("--batch", type=int, default=0, metavar="N",
+                        help="generate N articles concurrently and save them as drafts")
+    parser.add_argument("--drafts-dir", default="drafts", help="directory for batch drafts (default: drafts)")
+    parser.add_argument("--publish", action="store_true", help="publish the batch drafts to Hashnode")
+    args = parser.parse_args()
+    get_tracer().bind(bot=BOT_NAME)
+    if HARDSTYLE_RANDOM_SEED:
+        random.seed(HARDSTYLE_RANDOM_SEED)
+
     print("Starting daily Hardstyle bot.")
+    validate_environment()
+    ensure_mistral_auth()
     try:
-        article = generate_daily_hardstyle_article()
-        publish_article(article)
+        if args.batch > 0:
+            run_batch_mode(args.batch, args.drafts_dir, args.publish)
+        else:
+            publish_next_article()
         print("\n🎉 Daily Hardstyle bot successfully completed!")
+        print_connection_stats()
+        print_trace_summary()
+        # Débit ou tokens par génération nettement moins bons que la base glissante du registre
+        warn_regressions(BOT_NAME)
     except Exception as e:
         print(f"\nFATAL ERROR: A critical error occurred : {e}")
         sys.exit(1)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Briques partagées par les bots HardstyleRanking (daily et weekly)."""
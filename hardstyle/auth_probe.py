@@ -0,0 +1,74 @@
+"""Cache disque du test d'authentification Mistral AI (évite un appel LLM à chaque exécution)."""
+import hashlib
+import json
+import os
+import time
+
+from hardstyle.storage import state_path
+from hardstyle.telemetry import span
+
+MISTRAL_AUTH_CACHE_TTL = int(os.getenv("MISTRAL_AUTH_CACHE_TTL", str(24 * 3600)))
+
+# Modes du test d'authentification : "cached" (défaut), "always" ou "off"
+PROBE_MODES = ("cached", "always", "off")
+
+
+def key_fingerprint(api_key):
+    """Empreinte courte de la clé API : la clé elle-même n'est jamais écrite sur disque."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_path():
+    return state_path("mistral_auth.json")
+
+
+def _cache_key(api_key, model):
+    return f"{key_fingerprint(api_key)}:{model}"
+
+
+def _load_cache():
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_probe_cached(api_key, model, ttl=MISTRAL_AUTH_CACHE_TTL):
+    """Vrai si un test réussi pour cette clé et ce modèle date de moins de `ttl` secondes."""
+    checked_at = _load_cache().get(_cache_key(api_key, model))
+    return checked_at is not None and time.time() - checked_at < ttl
+
+
+def record_probe_success(api_key, model):
+    cache = _load_cache()
+    cache[_cache_key(api_key, model)] = time.time()
+    tmp_path = _cache_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, _cache_path())
+
+
+def ensure_auth(probe, api_key, model, mode="cached"):
+    """
+    Lance `probe()` (le test d'authentification du bot) selon le mode choisi.
+
+    - "off" : aucun test, la première vraie requête servira de vérification ;
+    - "cached" : test seulement si aucun succès récent n'est en cache pour cette clé/modèle ;
+    - "always" : test systématique.
+    `probe()` doit interrompre l'exécution en cas d'échec ; un retour normal vaut succès.
+    """
+    if mode not in PROBE_MODES:
+        print(f"⚠️ Unknown Mistral auth probe mode '{mode}', falling back to 'cached'.")
+        mode = "cached"
+    if mode == "off":
+        print("DEBUG: Mistral AI auth probe disabled.")
+        return
+    with span("auth_probe", mode=mode, model=model) as probe_span:
+        if mode == "cached" and is_probe_cached(api_key, model):
+            probe_span.set(cached=True)
+            print(f"✅ Authentification Mistral AI déjà vérifiée récemment pour le modèle '{model}' (cache).")
+            return
+        probe_span.set(cached=False)
+        probe()
+        record_probe_success(api_key, model)
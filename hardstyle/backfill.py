@@ -0,0 +1,229 @@
+"""
+Rattrapage (backfill) d'un historique d'articles : un article par jour (bot quotidien) ou par
+semaine (classement hebdomadaire) sur une plage de dates.
+
+Les générations tournent en parallèle (nombre borné), le post-traitement des articles reçus dans
+un pool de processus pour ne pas bloquer les E/S réseau, et les publications une par une sous
+une limite de débit. Chaque étape est enregistrée dans `.cache/backfill.sqlite3` dès qu'elle
+aboutit : une reprise après un crash repart des éléments non terminés, et les articles générés
+mais pas encore publiés sont repris depuis l'outbox sans nouvelle génération.
+"""
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from hardstyle.batch import BATCH_CONCURRENCY, BATCH_TASK_TIMEOUT, BatchTaskTimeout
+from hardstyle.dedup import DuplicateArticleError, first_line_title
+from hardstyle.outbox import Outbox, publish_entry
+from hardstyle.postprocess import postprocess_article
+from hardstyle.storage import state_path
+
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", str(BATCH_CONCURRENCY)))
+# Délai minimal entre deux publications Hashnode (secondes)
+BACKFILL_PUBLISH_INTERVAL = float(os.getenv("BACKFILL_PUBLISH_INTERVAL", "20"))
+# Processus de post-traitement (0 : un par cœur)
+BACKFILL_POSTPROCESS_WORKERS = int(os.getenv("BACKFILL_POSTPROCESS_WORKERS", "0"))
+
+PENDING = "pending"
+GENERATED = "generated"
+PUBLISHED = "published"
+
+
+def backfill_days(start, end, weekly=False):
+    """Dates de `start` à `end` inclus : chaque jour, ou chaque lundi pour le classement hebdomadaire."""
+    if end < start:
+        raise ValueError(f"end date {end} is before start date {start}")
+    day = start
+    if weekly:
+        day += timedelta(days=(7 - day.weekday()) % 7)
+    step = timedelta(days=7 if weekly else 1)
+    days = []
+    while day <= end:
+        days.append(day)
+        day += step
+    return days
+
+
+class BackfillCheckpoint:
+    """État de chaque élément du backfill (bot, jour) : pending → generated → published."""
+
+    def __init__(self, path=None):
+        self.path = path or state_path("backfill.sqlite3")
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS items (
+                bot TEXT NOT NULL,
+                day TEXT NOT NULL,
+                state TEXT NOT NULL,
+                content_hash TEXT,
+                post_url TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (bot, day)
+            )"""
+        )
+        self.conn.commit()
+
+    def load(self, bot, days):
+        """Enregistre les jours inconnus (état `pending`) et retourne l'état de chacun, dans l'ordre."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO items (bot, day, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(bot, day.isoformat(), PENDING, now) for day in days],
+            )
+        rows = {row["day"]: row for row in self.conn.execute("SELECT * FROM items WHERE bot = ?", (bot,))}
+        return [rows[day.isoformat()] for day in days]
+
+    def _update(self, bot, day, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self.conn:
+            self.conn.execute(f"UPDATE items SET {assignments}, updated_at = ? WHERE bot = ? AND day = ?",
+                              (*fields.values(), time.time(), bot, day.isoformat()))
+
+    def mark_generated(self, bot, day, digest):
+        self._update(bot, day, state=GENERATED, content_hash=digest, last_error=None)
+
+    def mark_published(self, bot, day, post_url):
+        self._update(bot, day, state=PUBLISHED, post_url=post_url, last_error=None)
+
+    def mark_failed(self, bot, day, error):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE items SET attempts = attempts + 1, last_error = ?, updated_at = ? WHERE bot = ? AND day = ?",
+                (f"{type(error).__name__}: {error}", time.time(), bot, day.isoformat()),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+class PublishRateLimiter:
+    """Espace les publications d'au moins `interval` secondes."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next = 0.0
+
+    async def wait(self):
+        delay = self._next - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._next = time.monotonic() + self.interval
+
+
+async def run_backfill(bot, days, generate, postprocess, publish, checkpoint, outbox, outbox_bot,
+                       concurrency=BACKFILL_CONCURRENCY, publish_interval=BACKFILL_PUBLISH_INTERVAL,
+                       workers=BACKFILL_POSTPROCESS_WORKERS, task_timeout=BATCH_TASK_TIMEOUT, publish_enabled=True,
+                       index=None, lookup=None):
+    """
+    Traite les `days` du backfill de `bot` et retourne {jour: état final}.
+
+    - `generate(day, cancel_event)` retourne le texte brut d'un jour (fonction bloquante, pool de threads) ;
+    - `postprocess(text)` le post-traite (fonction de module sérialisable, pool de processus) ;
+    - `publish(content, day)` publie l'article et retourne l'URL du post.
+
+    Les articles générés sont enregistrés dans `outbox` sous le nom `outbox_bot` avant publication ;
+    `lookup(content)` retrouve un article déjà tenté sur la publication avant de le renvoyer.
+    Avec `index` (DuplicateIndex), un quasi-doublon de l'archive est écarté : la date reste à
+    générer lors de la prochaine exécution.
+    """
+    loop = asyncio.get_running_loop()
+    items = checkpoint.load(bot, days)
+    states = {day: item["state"] for day, item in zip(days, items)}
+    todo = [day for day, item in zip(days, items) if item["state"] == PENDING]
+    resumed = [(day, item["content_hash"]) for day, item in zip(days, items) if item["state"] == GENERATED]
+    print(f"🚀 Backfill {bot}: {len(days)} item(s) from {days[0]} to {days[-1]} — "
+          f"{len(days) - len(todo) - len(resumed)} already published, {len(resumed)} to publish, "
+          f"{len(todo)} to generate (concurrency {concurrency}).")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue()
+    limiter = PublishRateLimiter(publish_interval)
+    threads = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="hardstyle-backfill")
+    publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hardstyle-backfill-publish")
+    processes = ProcessPoolExecutor(max_workers=workers or None)
+
+    def publish_one(digest, day):
+        # Connexion SQLite propre au thread de publication
+        publisher_outbox = Outbox(outbox.path)
+        try:
+            return publish_entry(publisher_outbox, digest, lambda content: publish(content, day), lookup)
+        finally:
+            publisher_outbox.close()
+
+    async def produce(day):
+        cancel_event = threading.Event()
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                raw = await asyncio.wait_for(loop.run_in_executor(threads, generate, day, cancel_event),
+                                             timeout=task_timeout)
+                # CPU : nettoyage et embeds dans un autre processus, la boucle continue les E/S
+                article = await loop.run_in_executor(processes, postprocess, raw)
+            except asyncio.TimeoutError:
+                cancel_event.set()
+                error = BatchTaskTimeout(f"Generation for {day} exceeded {task_timeout:g}s and was cancelled.")
+                print(f"❌ Backfill {day}: {error}")
+                checkpoint.mark_failed(bot, day, error)
+                return
+            except Exception as e:
+                print(f"❌ Backfill {day}: generation failed: {type(e).__name__}: {e}")
+                checkpoint.mark_failed(bot, day, e)
+                return
+        match = index.check(article) if index is not None else None
+        if match is not None:
+            error = DuplicateArticleError(f"near-duplicate ({match[0]:.0%}) of '{match[3] or match[1][:12]}'")
+            print(f"⚠️ Backfill {day}: article rejected, {error}.")
+            checkpoint.mark_failed(bot, day, error)
+            return
+        if index is not None:
+            index.add(article, outbox_bot, title=first_line_title(article))
+        digest = outbox.add(outbox_bot, article)
+        checkpoint.mark_generated(bot, day, digest)
+        states[day] = GENERATED
+        print(f"✅ Backfill {day}: article generated in {time.monotonic() - started:.2f}s.")
+        if publish_enabled:
+            await queue.put((day, digest))
+
+    async def consume():
+        while True:
+            day, digest = await queue.get()
+            try:
+                await limiter.wait()
+                post_url = await loop.run_in_executor(publisher, publish_one, digest, day)
+            except Exception as e:
+                print(f"❌ Backfill {day}: publication failed, article kept for the next run: {e}")
+                checkpoint.mark_failed(bot, day, e)
+            else:
+                checkpoint.mark_published(bot, day, post_url)
+                states[day] = PUBLISHED
+            finally:
+                queue.task_done()
+
+    consumer = asyncio.ensure_future(consume())
+    try:
+        if publish_enabled:
+            for day, digest in resumed:
+                await queue.put((day, digest))
+        await asyncio.gather(*(produce(day) for day in todo))
+        await queue.join()
+    finally:
+        consumer.cancel()
+        threads.shutdown(wait=False)
+        publisher.shutdown(wait=False)
+        processes.shutdown(wait=True)
+    return states
+
+
+def deferred_postprocess(options):
+    """`postprocess(text)` sérialisable à partir des paramètres `postprocess_options()` d'un bot."""
+    return functools.partial(postprocess_article, **options)
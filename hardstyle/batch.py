@@ -0,0 +1,91 @@
+"""Exécution concurrente (asyncio) de plusieurs générations d'articles avec une limite de parallélisme."""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_TASK_TIMEOUT = float(os.getenv("BATCH_TASK_TIMEOUT", "300"))
+
+
+class BatchTaskTimeout(Exception):
+    """Une génération du batch a dépassé son délai et a été annulée."""
+
+
+async def run_batch(job, items, concurrency=BATCH_CONCURRENCY, task_timeout=BATCH_TASK_TIMEOUT):
+    """
+    Exécute `job(item, cancel_event)` pour chaque élément, au plus `concurrency` à la fois.
+
+    `job` est une fonction bloquante (appels HTTP synchrones) exécutée dans un pool de threads ;
+    elle doit surveiller `cancel_event` (un `threading.Event`) pour s'arrêter proprement quand
+    sa tâche expire ou que le batch est annulé. Le délai `task_timeout` court à partir du démarrage
+    effectif de la tâche dans un thread : une tâche en attente derrière un thread expiré qui n'a
+    pas encore vu son `cancel_event` n'y perd rien. Retourne une liste alignée sur `items`
+    contenant pour chaque élément soit le résultat, soit l'exception levée.
+    """
+    items = list(items)
+    if not items:
+        return []
+    semaphore = asyncio.Semaphore(concurrency)
+    cancel_events = [threading.Event() for _ in items]
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(items))),
+                                  thread_name_prefix="hardstyle-batch")
+
+    async def run_one(index, item):
+        async with semaphore:
+            began = asyncio.Event()
+
+            def work():
+                loop.call_soon_threadsafe(began.set)
+                return job(item, cancel_events[index])
+
+            future = loop.run_in_executor(executor, work)
+            try:
+                await began.wait()
+                started = time.monotonic()
+                result = await asyncio.wait_for(future, timeout=task_timeout)
+            except asyncio.TimeoutError:
+                cancel_events[index].set()
+                raise BatchTaskTimeout(f"Task #{index + 1} exceeded {task_timeout:g}s and was cancelled.")
+            except asyncio.CancelledError:
+                cancel_events[index].set()
+                raise
+            print(f"DEBUG: Batch task #{index + 1}/{len(items)} done in {time.monotonic() - started:.2f}s.")
+            return result
+
+    tasks = [asyncio.ensure_future(run_one(i, item)) for i, item in enumerate(items)]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=True)
+    except asyncio.CancelledError:
+        # Annulation du batch entier : on prévient tous les threads encore actifs
+        for event in cancel_events:
+            event.set()
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        # Ne pas bloquer la boucle sur les threads annulés : ils sortent d'eux-mêmes via cancel_event
+        executor.shutdown(wait=False)
+
+
+def save_drafts(results, drafts_dir, prefix):
+    """
+    Écrit chaque article réussi d'un batch dans `drafts_dir` et signale les échecs.
+    Retourne la liste des articles réussis, dans l'ordre du batch.
+    """
+    os.makedirs(drafts_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    articles = []
+    for index, result in enumerate(results, start=1):
+        if isinstance(result, BaseException):
+            print(f"❌ Batch task #{index} failed: {type(result).__name__}: {result}")
+            continue
+        path = os.path.join(drafts_dir, f"{prefix}-{stamp}-{index:02d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(result)
+        print(f"✅ Draft saved: {path}")
+        articles.append(result)
+    print(f"DEBUG: Batch finished: {len(articles)}/{len(results)} article(s) generated.")
+    return articles
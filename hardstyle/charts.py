@@ -0,0 +1,395 @@
+"""
+Classement hebdomadaire calculé à partir de signaux réels par artiste, au lieu d'un échantillon
+du roster que le modèle ordonne à sa guise.
+
+Les signaux sont lus dans un fichier CSV ou Parquet (Parquet : dépendance optionnelle `pyarrow`),
+une ligne par artiste, semaine et source ; les lignes d'un même artiste et d'une même semaine
+s'additionnent :
+
+    artist,week,streams,chart_position,playlist_adds,festival_bookings
+    Sub Zero Project,2025-06-02,184220,12,35,2
+
+`week` est une date (ramenée au lundi de sa semaine) ou une semaine ISO ("2025-W23") ; une
+position vide signifie « hors classement » et chaque position rapporte RANKING_CHART_SIZE + 1 -
+position points de classement.
+
+Le score de momentum combine, pour chaque signal pondéré par RANKING_WEIGHTS, son niveau de la
+semaine et sa progression par rapport à la semaine précédente (logarithmes centrés-réduits sur
+les artistes actifs) ; RANKING_MOMENTUM_MIX fixe la part de la progression. Tout le calcul est
+vectorisé avec NumPy (sommes par artiste et par semaine en un `bincount` par signal) : quelques
+dizaines de millisecondes par million de lignes. Le fichier lu est gardé au format NumPy dans
+`.cache/` tant qu'il ne change pas.
+"""
+import csv
+import datetime
+import hashlib
+import os
+import threading
+from array import array
+
+import numpy as np
+
+from hardstyle.roster import normalize_name
+from hardstyle.storage import state_path
+from hardstyle.telemetry import span
+
+# Colonnes numériques du fichier de signaux, dans l'ordre de SignalTable.values
+SIGNAL_COLUMNS = ("streams", "chart_position", "playlist_adds", "festival_bookings")
+# Signaux du score (la position dans les charts y devient des points de classement)
+SIGNALS = ("streams", "chart", "playlist_adds", "festival_bookings")
+CHART_COLUMN = SIGNAL_COLUMNS.index("chart_position")
+
+
+def parse_weights(value):
+    """"streams:0.4,chart:0.3" -> {"streams": 0.4, "chart": 0.3} (signaux inconnus ignorés)."""
+    weights = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition(":")
+        name = name.strip().lower()
+        if name in SIGNALS:
+            try:
+                weights[name] = float(weight)
+            except ValueError:
+                continue
+    return weights
+
+
+WEEKLY_SIGNALS_FILE = os.getenv("WEEKLY_SIGNALS_FILE", "")
+RANKING_WEIGHTS = parse_weights(os.getenv(
+    "RANKING_WEIGHTS", "streams:0.4,chart:0.3,playlist_adds:0.2,festival_bookings:0.1"))
+# Part de la progression sur la semaine précédente dans le score (le reste : niveau de la semaine)
+RANKING_MOMENTUM_MIX = float(os.getenv("RANKING_MOMENTUM_MIX", "0.5"))
+# Progression maximale retenue pour un signal (facteur) : une entrée ou une sortie compte comme ×4 ou ÷4
+RANKING_MAX_GROWTH = float(os.getenv("RANKING_MAX_GROWTH", "4"))
+WEEKLY_RANKING_SIZE = int(os.getenv("WEEKLY_RANKING_SIZE", "10"))
+# Nombre de places des charts : la première rapporte RANKING_CHART_SIZE points, la dernière 1
+RANKING_CHART_SIZE = int(os.getenv("RANKING_CHART_SIZE", "100"))
+
+
+def week_index(day):
+    """Numéro de la semaine (du lundi au dimanche) de `day` : le 1er janvier de l'an 1 est un lundi."""
+    return (day.toordinal() - 1) // 7
+
+
+def week_start(index):
+    """Lundi de la semaine `index`."""
+    return datetime.date.fromordinal(index * 7 + 1)
+
+
+def parse_week(value):
+    """Semaine d'une date ("2025-06-04") ou d'une semaine ISO ("2025-W23", "2025W23")."""
+    value = value.strip().upper()
+    if "W" in value:
+        year, _, week = value.partition("W")
+        return week_index(datetime.date.fromisocalendar(int(year.rstrip("-")), int(week.split("-")[0]), 1))
+    return week_index(datetime.date.fromisoformat(value[:10]))
+
+
+class _ArtistIndex:
+    """Numérotation des artistes à la lecture : un nom brut déjà vu ne coûte qu'une recherche."""
+
+    def __init__(self):
+        self.names = []
+        self._keys = {}
+        self._raw = {}
+
+    def __call__(self, raw):
+        artist = self._raw.get(raw)
+        if artist is None:
+            key = normalize_name(raw)
+            artist = self._keys.get(key)
+            if artist is None:
+                artist = self._keys[key] = len(self.names)
+                self.names.append(" ".join(raw.split()))
+            self._raw[raw] = artist
+        return artist
+
+
+def _number(text):
+    text = text.strip()
+    return float(text) if text else 0.0
+
+
+def _read_csv(path):
+    artists = _ArtistIndex()
+    weeks_by_label = {}
+    artist_ids, weeks, values = array("q"), array("q"), array("d")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        if "artist" not in header or "week" not in header:
+            raise ValueError(f"{path}: the signals file needs 'artist' and 'week' columns.")
+        artist_column, week_column = header.index("artist"), header.index("week")
+        columns = [header.index(name) if name in header else None for name in SIGNAL_COLUMNS]
+        for line_number, row in enumerate(reader, start=2):
+            if not row or not row[artist_column].strip():
+                continue
+            try:
+                label = row[week_column]
+                week = weeks_by_label.get(label)
+                if week is None:
+                    week = weeks_by_label[label] = parse_week(label)
+                values.extend([_number(row[column]) if column is not None else 0.0 for column in columns])
+            except (ValueError, IndexError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid row ({e})")
+            artist_ids.append(artists(row[artist_column]))
+            weeks.append(week)
+    return (artists.names, np.array(artist_ids, dtype=np.int64), np.array(weeks, dtype=np.int64),
+            np.array(values, dtype=np.float64))
+
+
+def _read_parquet(path):
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError(f"Reading {path} requires pyarrow (pip install pyarrow); a CSV signals file works without it.")
+    table = pq.read_table(path)
+    if "artist" not in table.column_names or "week" not in table.column_names:
+        raise ValueError(f"{path}: the signals file needs 'artist' and 'week' columns.")
+    table = table.filter(pc.is_valid(table.column("artist")))
+    artists = _ArtistIndex()
+    # Noms distincts seulement : la numérotation ne parcourt pas chaque ligne en Python
+    encoded = table.column("artist").combine_chunks().dictionary_encode()
+    remap = np.array([artists(str(name)) for name in encoded.dictionary.to_pylist()], dtype=np.int64)
+    artist_ids = remap[encoded.indices.to_numpy(zero_copy_only=False)]
+
+    week = table.column("week").combine_chunks()
+    if pa.types.is_string(week.type) or pa.types.is_large_string(week.type):
+        encoded = week.dictionary_encode()
+        labels = np.array([parse_week(label) for label in encoded.dictionary.to_pylist()], dtype=np.int64)
+        weeks = labels[encoded.indices.to_numpy(zero_copy_only=False)]
+    else:
+        days = week.cast(pa.date32()).cast(pa.int32()).to_numpy(zero_copy_only=False).astype(np.int64)
+        weeks = (days + datetime.date(1970, 1, 1).toordinal() - 1) // 7
+
+    values = np.zeros((len(table), len(SIGNAL_COLUMNS)), dtype=np.float64)
+    for position, name in enumerate(SIGNAL_COLUMNS):
+        if name in table.column_names:
+            column = pc.fill_null(table.column(name).cast(pa.float64()), 0.0)
+            values[:, position] = column.to_numpy()
+    return artists.names, artist_ids, weeks, values
+
+
+class SignalTable:
+    """Signaux en colonnes NumPy : artiste (indice dans `artists`), semaine (`week_index`) et SIGNAL_COLUMNS."""
+
+    def __init__(self, artists, artist_ids, weeks, values):
+        self.artists = list(artists)
+        self.artist_ids = np.asarray(artist_ids, dtype=np.int64)
+        self.weeks = np.asarray(weeks, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.weeks), len(SIGNAL_COLUMNS))
+        self.index = {normalize_name(name): artist for artist, name in enumerate(self.artists)}
+
+    def __len__(self):
+        return len(self.weeks)
+
+    @classmethod
+    def load(cls, path=WEEKLY_SIGNALS_FILE, cache=True):
+        """Lit un fichier CSV ou Parquet ; la version NumPy mise en cache sert tant que le fichier ne change pas."""
+        source = os.path.abspath(path)
+        stat = os.stat(source)
+        fingerprint = f"{source}:{stat.st_size}:{stat.st_mtime_ns}"
+        cache_path = state_path(f"signals-{hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]}.npz")
+        if cache:
+            try:
+                with np.load(cache_path, allow_pickle=False) as data:
+                    if str(data["fingerprint"]) == fingerprint:
+                        return cls(data["artists"].tolist(), data["artist_ids"], data["weeks"], data["values"])
+            except (OSError, KeyError, ValueError):
+                pass
+        with span("signals_load", path=path) as load_span:
+            reader = _read_parquet if path.lower().endswith((".parquet", ".pq")) else _read_csv
+            table = cls(*reader(path))
+            load_span.set(rows=len(table), artists=len(table.artists))
+        print(f"DEBUG: Weekly signals loaded from {path}: {len(table)} row(s), {len(table.artists)} artist(s).")
+        if cache:
+            # Nom propre au processus et au thread : deux chargements simultanés n'écrivent pas le même fichier
+            tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+            np.savez(tmp_path, fingerprint=np.array(fingerprint), artists=np.array(table.artists, dtype=str),
+                     artist_ids=table.artist_ids, weeks=table.weeks, values=table.values)
+            os.replace(tmp_path, cache_path)
+        return table
+
+    def mask(self, names):
+        """Masque (un booléen par artiste de la table) des artistes de `names`, ex. le roster."""
+        mask = np.zeros(len(self.artists), dtype=bool)
+        for name in names:
+            artist = self.index.get(normalize_name(name))
+            if artist is not None:
+                mask[artist] = True
+        return mask
+
+    def totals(self, week, weeks=3, chart_size=RANKING_CHART_SIZE):
+        """
+        Sommes par artiste des SIGNALS pour `week` et les `weeks` - 1 semaines précédentes :
+        tableau (semaines, artistes, signaux), la semaine `week` en premier.
+        """
+        count = len(self.artists)
+        offset = week - self.weeks
+        rows = (offset >= 0) & (offset < weeks)
+        bins = offset[rows] * count + self.artist_ids[rows]
+        values = self.values[rows]
+        position = values[:, CHART_COLUMN]
+        values[:, CHART_COLUMN] = np.where(position > 0, np.clip(chart_size + 1 - position, 0, None), 0.0)
+        totals = np.empty((weeks, count, len(SIGNALS)))
+        for signal in range(len(SIGNALS)):
+            totals[:, :, signal] = np.bincount(bins, weights=values[:, signal],
+                                               minlength=weeks * count).reshape(weeks, count)
+        return totals
+
+    def best_positions(self, week, artists):
+        """Meilleure position dans les charts de chaque artiste de `artists` pour `week` (0 : hors classement)."""
+        artists = np.asarray(artists, dtype=np.int64)
+        best = np.full(len(artists), np.inf)
+        rows = np.flatnonzero(self.weeks == week)
+        rows = rows[np.isin(self.artist_ids[rows], artists) & (self.values[rows, CHART_COLUMN] > 0)]
+        if len(rows):
+            order = np.argsort(artists)
+            slots = order[np.searchsorted(artists[order], self.artist_ids[rows])]
+            np.minimum.at(best, slots, self.values[rows, CHART_COLUMN])
+        return np.where(np.isfinite(best), best, 0).astype(np.int64)
+
+
+def _standardize(values):
+    deviation = values.std(axis=0)
+    deviation[deviation == 0] = 1.0
+    return (values - values.mean(axis=0)) / deviation
+
+
+def momentum_scores(current, previous, weights=None, mix=RANKING_MOMENTUM_MIX, max_growth=RANKING_MAX_GROWTH):
+    """
+    Score de chaque artiste à partir de ses sommes (artistes × SIGNALS) de deux semaines
+    consécutives ; -inf pour un artiste sans aucune activité sur ces deux semaines.
+    """
+    weights = RANKING_WEIGHTS if weights is None else weights
+    vector = np.array([weights.get(name, 0.0) for name in SIGNALS])
+    level = np.log1p(current)
+    limit = np.log(max(max_growth, 1.0))
+    growth = np.clip(level - np.log1p(previous), -limit, limit)
+    active = (current.sum(axis=1) + previous.sum(axis=1)) > 0
+    scores = np.full(len(current), -np.inf)
+    if active.any():
+        scores[active] = (mix * _standardize(growth[active]) + (1 - mix) * _standardize(level[active])) @ vector
+    return scores
+
+
+def _order(scores, candidates, limit=None):
+    """Indices de `candidates` par score décroissant (les `limit` premiers seulement si précisé)."""
+    if limit is not None and len(candidates) > limit:
+        candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class ChartRanking(list):
+    """
+    Noms des artistes classés, du premier au dernier (utilisable partout où un échantillon
+    d'artistes l'est) ; `entries` détaille chaque rang et `week` est le lundi de la semaine.
+    """
+
+    def __init__(self, week, entries, size):
+        super().__init__(entry["artist"] for entry in entries)
+        self.week = week
+        self.entries = entries
+        self.size = size
+
+
+def rank_week(table, week=None, size=WEEKLY_RANKING_SIZE, weights=None, mix=RANKING_MOMENTUM_MIX,
+              eligible=None, pinned=(), chart_size=RANKING_CHART_SIZE):
+    """
+    Top `size` de la semaine `week` (date ou numéro ; défaut : la dernière semaine des données)
+    parmi les artistes `eligible` (masque de `SignalTable.mask`, défaut : tous). Les artistes
+    `pinned` y figurent toujours, à la place des derniers si besoin. Chaque entrée porte son score,
+    son rang de la semaine précédente et ses signaux des deux semaines. None sans données pour la semaine.
+    """
+    if not len(table):
+        return None
+    if week is None:
+        week = int(table.weeks.max())
+    elif isinstance(week, datetime.date):
+        week = week_index(week)
+    with span("ranking", rows=len(table), artists=len(table.artists)) as ranking_span:
+        totals = table.totals(week, weeks=3, chart_size=chart_size)
+        if not totals[0].any():
+            return None
+        scores = momentum_scores(totals[0], totals[1], weights, mix)
+        previous_scores = momentum_scores(totals[1], totals[2], weights, mix)
+        eligible = np.ones(len(table.artists), dtype=bool) if eligible is None else eligible
+
+        previous_ranks = np.zeros(len(scores), dtype=np.int64)
+        previous_order = _order(previous_scores, np.flatnonzero(eligible & np.isfinite(previous_scores)))
+        previous_ranks[previous_order] = np.arange(1, len(previous_order) + 1)
+
+        chosen = [int(artist) for artist in _order(scores, np.flatnonzero(eligible & np.isfinite(scores)), size)]
+        # Artistes épinglés : ils remplacent les derniers du classement (sans chiffres s'ils sont absents des données)
+        pinned_ids = [table.index.get(normalize_name(name)) for name in pinned]
+        required = [artist for artist in pinned_ids if artist is not None and np.isfinite(scores[artist])]
+        unranked = [name for name, artist in zip(pinned, pinned_ids) if artist not in required]
+        chosen += [artist for artist in required if artist not in chosen]
+        replaceable = [artist for artist in chosen if artist not in required]
+        while len(chosen) + len(unranked) > size and replaceable:
+            chosen.remove(replaceable.pop())
+        chosen.sort(key=lambda artist: -scores[artist])
+
+        best = table.best_positions(week, chosen)
+        previous_best = table.best_positions(week - 1, chosen)
+        entries = []
+        for position, artist in enumerate(chosen):
+            entries.append({
+                "rank": position + 1,
+                "artist": table.artists[artist],
+                "score": round(float(scores[artist]), 4),
+                "previous_rank": int(previous_ranks[artist]) or None,
+                "signals": {name: (float(totals[0, artist, signal]), float(totals[1, artist, signal]))
+                            for signal, name in enumerate(SIGNALS)},
+                "best_position": (int(best[position]) or None, int(previous_best[position]) or None),
+            })
+        for name in unranked:
+            entries.append({"rank": len(entries) + 1, "artist": name, "score": None, "previous_rank": None,
+                            "signals": None, "best_position": (None, None)})
+        ranking_span.set(entries=len(entries))
+    return ChartRanking(week_start(week), entries, size)
+
+
+def _change(current, previous):
+    if not previous:
+        return "new this week" if current else "flat"
+    return f"{current / previous - 1:+.0%} week over week"
+
+
+def describe_entry(entry, size=WEEKLY_RANKING_SIZE):
+    """Chiffres d'une entrée du classement, en une phrase pour le prompt."""
+    if entry["score"] is None:
+        return "no streaming or chart data this week"
+    parts = []
+    streams, previous = entry["signals"]["streams"]
+    if streams or previous:
+        parts.append(f"{streams:,.0f} streams ({_change(streams, previous)})")
+    best, previous_best = entry["best_position"]
+    if best:
+        parts.append(f"best chart position #{best}" + (f" (#{previous_best} last week)" if previous_best
+                                                       else " (new chart entry)"))
+    elif previous_best:
+        parts.append(f"out of the charts (#{previous_best} last week)")
+    adds, previous = entry["signals"]["playlist_adds"]
+    if adds or previous:
+        parts.append(f"{adds:,.0f} playlist adds ({_change(adds, previous)})")
+    bookings, previous = entry["signals"]["festival_bookings"]
+    if bookings or previous:
+        parts.append(f"{bookings:,.0f} festival bookings ({bookings - previous:+,.0f})")
+    previous_rank = entry["previous_rank"]
+    if previous_rank is None or previous_rank > size:
+        parts.append("new in the Top")
+    elif previous_rank == entry["rank"]:
+        parts.append("same position as last week")
+    else:
+        moved = previous_rank - entry["rank"]
+        parts.append(f"{'up' if moved > 0 else 'down'} {abs(moved)} place(s) from #{previous_rank}")
+    return ", ".join(parts)
+
+
+def format_ranking(ranking):
+    """Une ligne par rang : "#1 Artiste — chiffres de la semaine"."""
+    return "\n".join(f"#{entry['rank']} {entry['artist']} — {describe_entry(entry, ranking.size)}"
+                     for entry in ranking.entries)
@@ -0,0 +1,130 @@
+"""
+Réparation de longueur par continuation : quand une génération s'arrête sur `max_tokens`
+(finish_reason "length") ou reste sous le nombre de mots demandé, on demande au modèle de
+poursuivre le texte à partir de sa fin seulement, au lieu de régénérer tout l'article.
+
+Seule la fin du texte (LENGTH_REPAIR_TAIL_CHARS caractères) est renvoyée comme contexte, et les
+continuations sont bornées par un budget de tokens : on ne paie que la partie manquante.
+"""
+import os
+
+from hardstyle.telemetry import span
+
+LENGTH_REPAIR = os.getenv("LENGTH_REPAIR", "true").lower() not in ("0", "false", "no")
+LENGTH_REPAIR_MAX_ROUNDS = int(os.getenv("LENGTH_REPAIR_MAX_ROUNDS", "2"))
+LENGTH_REPAIR_TOKEN_BUDGET = int(os.getenv("LENGTH_REPAIR_TOKEN_BUDGET", "1200"))
+LENGTH_REPAIR_TAIL_CHARS = int(os.getenv("LENGTH_REPAIR_TAIL_CHARS", "1500"))
+# Tolérance sur le nombre de mots demandé (1200 mots demandés -> réparation sous 1080)
+LENGTH_REPAIR_TOLERANCE = float(os.getenv("LENGTH_REPAIR_TOLERANCE", "0.9"))
+
+# Estimation grossière pour le budget : ~4 caractères par token, ~1,33 token par mot
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 1.33
+MIN_ROUND_TOKENS = 64
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def repair_reason(text, finish_reason, min_words=0, tolerance=LENGTH_REPAIR_TOLERANCE):
+    """Retourne "length" si la génération a été coupée, "short" si elle est trop courte, sinon None."""
+    if finish_reason == "length":
+        return "length"
+    if min_words and count_words(text) < min_words * tolerance:
+        return "short"
+    return None
+
+
+def tail_context(text, max_chars=LENGTH_REPAIR_TAIL_CHARS):
+    """Fin du texte, coupée au début d'une ligne si possible pour ne pas commencer au milieu d'un mot."""
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    newline = tail.find("\n")
+    return tail[newline + 1:] if 0 <= newline < max_chars // 2 else tail
+
+
+def strip_overlap(text, continuation, max_overlap=200, min_overlap=20):
+    """Retire le début de `continuation` s'il répète la fin de `text` (le modèle recopie parfois sa dernière phrase)."""
+    for size in range(min(max_overlap, len(text), len(continuation)), min_overlap - 1, -1):
+        if continuation.startswith(text[-size:]):
+            return continuation[size:]
+    return continuation
+
+
+def join_continuation(text, continuation, reason):
+    """Texte à ajouter après `text` : la suite directe d'une phrase coupée, ou de nouveaux paragraphes."""
+    continuation = strip_overlap(text, continuation)
+    if reason == "length":
+        if not text or text[-1].isspace() or continuation[:1].isspace() or continuation[:1] in ".,;:!?)":
+            return continuation
+        return " " + continuation
+    return "\n\n" + continuation.strip()
+
+
+def build_continuation_prompt(tail, reason, missing_words):
+    if reason == "length":
+        request = "It was cut off mid-way: continue it exactly where it stops and bring it to a proper ending"
+    else:
+        request = f"It is too short: continue it with about {missing_words} more words of new, relevant content"
+    return (
+        f"Below is the end of a Hardstyle blog article written in English. {request}. "
+        "Do not repeat any of the text below, do not restart the article and do not add a title. "
+        "Keep the same tone, formatting and language. Do NOT include any closing signature or any notes "
+        "about Spotify links being examples or placeholder.\n\n"
+        f"--- END OF THE ARTICLE SO FAR ---\n{tail}\n--- CONTINUE FROM HERE ---"
+    )
+
+
+def repair_length(text, finish_reason, complete, min_words=0, on_text=None,
+                  max_rounds=LENGTH_REPAIR_MAX_ROUNDS, token_budget=LENGTH_REPAIR_TOKEN_BUDGET,
+                  max_tokens_per_round=None):
+    """
+    Complète `text` par continuations tant qu'il est coupé ou trop court (au plus `max_rounds`
+    appels, `token_budget` tokens au total).
+
+    `complete(prompt, max_tokens)` fait l'appel au modèle et retourne (texte, finish_reason).
+    `on_text(fragment)` reçoit chaque fragment ajouté (ex. `IncrementalArticleProcessor.feed`).
+    Retourne (texte complété, rapport) ; le rapport contient la raison initiale, le nombre
+    d'appels, les mots ajoutés et les tokens estimés consommés.
+    """
+    reason = repair_reason(text, finish_reason, min_words)
+    report = {"reason": reason, "rounds": 0, "added_words": 0, "tokens": 0, "complete": reason is None}
+    if reason is None or not LENGTH_REPAIR:
+        return text, report
+
+    with span("length_repair", reason=reason, words=count_words(text), min_words=min_words) as repair_span:
+        while reason is not None and report["rounds"] < max_rounds:
+            remaining = token_budget - report["tokens"]
+            if reason == "short":
+                missing_words = max(50, int(min_words - count_words(text)))
+                wanted = int(missing_words * TOKENS_PER_WORD) + MIN_ROUND_TOKENS
+            else:
+                missing_words = 0
+                wanted = max_tokens_per_round or remaining
+            max_tokens = min(wanted, remaining, max_tokens_per_round or remaining)
+            if max_tokens < MIN_ROUND_TOKENS:
+                print(f"⚠️ Length repair stopped: token budget exhausted ({report['tokens']}/{token_budget}).")
+                break
+            print(f"DEBUG: Length repair round {report['rounds'] + 1} ({reason}, "
+                  f"{count_words(text)} words so far, max_tokens {max_tokens})...")
+            continuation, finish_reason = complete(
+                build_continuation_prompt(tail_context(text), reason, missing_words), max_tokens)
+            report["rounds"] += 1
+            report["tokens"] += min(max_tokens, len(continuation) // CHARS_PER_TOKEN + 1)
+            if not continuation.strip():
+                break
+            fragment = join_continuation(text, continuation, reason)
+            text += fragment
+            report["added_words"] += count_words(fragment)
+            if on_text is not None:
+                on_text(fragment)
+            reason = repair_reason(text, finish_reason, min_words)
+        report["complete"] = reason is None
+        repair_span.set(rounds=report["rounds"], added_words=report["added_words"],
+                        tokens=report["tokens"], complete=report["complete"])
+    status = "complete" if report["complete"] else "still incomplete"
+    print(f"DEBUG: Length repair {status} after {report['rounds']} call(s): "
+          f"+{report['added_words']} words (~{report['tokens']} tokens).")
+    return text, report
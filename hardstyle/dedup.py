@@ -0,0 +1,255 @@
+"""
+Index des quasi-doublons (MinHash + LSH) de tous les articles générés, conservé dans
+`.cache/dedup.sqlite3`.
+
+Chaque article est réduit à l'ensemble de ses 5-grammes de mots (embeds, liens et Markdown
+retirés), puis à une signature MinHash de DEDUP_NUM_PERM entiers. La signature utilise une seule
+permutation (chaque 5-gramme est haché une fois puis réparti dans DEDUP_NUM_PERM compartiments,
+dont on garde le minimum ; les compartiments vides sont densifiés par rotation) : son coût est
+linéaire en la taille de l'article au lieu de DEDUP_NUM_PERM passes.
+
+La signature est découpée en DEDUP_BANDS bandes, chacune rangée dans un seau SQLite indexé : un
+nouvel article n'est comparé qu'aux articles qui partagent au moins un seau avec lui, au lieu de
+toute l'archive. La similarité (Jaccard estimée) n'est calculée que pour ces candidats.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from array import array
+
+from hardstyle.outbox import content_hash
+from hardstyle.storage import state_path
+from hardstyle.telemetry import span
+
+DEDUP_CHECK = os.getenv("DEDUP_CHECK", "true").lower() not in ("0", "false", "no")
+# Similarité (Jaccard estimée sur les 5-grammes) à partir de laquelle un article est un doublon
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.5"))
+DEDUP_MAX_REGENERATIONS = int(os.getenv("DEDUP_MAX_REGENERATIONS", "2"))
+# 16 bandes de 4 lignes : seuil de la courbe LSH ~ (1/16)^(1/4) = 0,5
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))
+
+SHINGLE_WORDS = 5
+SIGNATURE_SCHEME = "oph-blake2b"
+MAX_HASH = (1 << 32) - 1
+# Décalage (nombre d'or) ajouté à une valeur empruntée par un compartiment vide, par pas de rotation
+DENSIFY_OFFSET = 0x9E3779B1
+
+EMBED_RE = re.compile(r"<iframe\b.*?</iframe>", re.IGNORECASE | re.DOTALL)
+URL_RE = re.compile(r"https?://\S+")
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class DuplicateArticleError(Exception):
+    """Article trop proche d'un article déjà généré (et régénérations épuisées)."""
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """Empreintes 64 bits des n-grammes de mots de l'article, sans embeds, liens ni Markdown."""
+    text = URL_RE.sub(" ", EMBED_RE.sub(" ", text)).lower()
+    words = WORD_RE.findall(text)
+    grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))} if words else set()
+    return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+            for gram in grams}
+
+
+def estimate_similarity(first, second):
+    """Jaccard estimée : proportion de composantes égales entre deux signatures."""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+class DuplicateIndex:
+    def __init__(self, path=None, num_perm=DEDUP_NUM_PERM, bands=DEDUP_BANDS, threshold=DEDUP_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        self.path = path or state_path("dedup.sqlite3")
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL UNIQUE,
+                bot TEXT NOT NULL,
+                title TEXT,
+                signature BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        # Clé de seau = hachage 64 bits (bande, lignes de la signature) : une seule colonne indexée
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key INTEGER NOT NULL, article_id INTEGER NOT NULL, "
+            "PRIMARY KEY (key, article_id)) WITHOUT ROWID"
+        )
+        self._check_parameters()
+        self.conn.commit()
+
+    def _check_parameters(self):
+        """Une signature n'est comparable qu'avec les mêmes paramètres : sinon l'index est vidé et reconstruit."""
+        parameters = f"{SIGNATURE_SCHEME}/{self.num_perm}/{self.bands}/{SHINGLE_WORDS}"
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'parameters'").fetchone()
+        if stored is not None and stored["value"] != parameters:
+            print(f"⚠️ Duplicate index parameters changed ({stored['value']} -> {parameters}), rebuilding it.")
+            self.conn.execute("DELETE FROM buckets")
+            self.conn.execute("DELETE FROM articles")
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('parameters', ?)", (parameters,))
+
+    def signature(self, text):
+        """Signature MinHash de l'article (None s'il ne contient aucun mot)."""
+        values = shingles(text)
+        if not values:
+            return None
+        size = self.num_perm
+        bins = [None] * size
+        for value in values:
+            # Bits de poids faible : compartiment ; 32 bits de poids fort : valeur comparée
+            index, rank = value % size, value >> 32
+            if bins[index] is None or rank < bins[index]:
+                bins[index] = rank
+        if None in bins:
+            # Compartiment vide : valeur du prochain compartiment non vide (rotation), décalée par pas
+            filled = list(bins)
+            for index in range(size):
+                step = 0
+                while filled[(index + step) % size] is None:
+                    step += 1
+                bins[index] = (filled[(index + step) % size] + step * DENSIFY_OFFSET) & MAX_HASH
+        return array("I", bins)
+
+    def _bucket_keys(self, signature):
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(band.to_bytes(2, "little") + rows.tobytes(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def __contains__(self, digest):
+        return self.conn.execute("SELECT 1 FROM articles WHERE content_hash = ?", (digest,)).fetchone() is not None
+
+    def query(self, text, signature=None):
+        """
+        Articles de l'archive au moins aussi proches que `threshold`, du plus proche au plus éloigné :
+        liste de (similarité, content_hash, bot, titre). Seuls les candidats LSH sont comparés.
+        """
+        signature = signature or self.signature(text)
+        if signature is None:
+            return []
+        keys = self._bucket_keys(signature)
+        candidates = self.conn.execute(
+            f"SELECT DISTINCT a.id, a.content_hash, a.bot, a.title, a.signature FROM buckets b "
+            f"JOIN articles a ON a.id = b.article_id WHERE b.key IN ({', '.join('?' * len(keys))})",
+            keys,
+        ).fetchall()
+        matches = []
+        for row in candidates:
+            similarity = estimate_similarity(signature, array("I", row["signature"]))
+            if similarity >= self.threshold:
+                matches.append((similarity, row["content_hash"], row["bot"], row["title"]))
+        matches.sort(reverse=True)
+        return matches
+
+    def add(self, text, bot, title=None, signature=None):
+        """Ajoute l'article à l'archive (sans effet s'il y est déjà) ; retourne son empreinte."""
+        with self.conn:
+            return self._insert(text, bot, title, signature)
+
+    def _insert(self, text, bot, title=None, signature=None):
+        digest = content_hash(text)
+        signature = signature or self.signature(text)
+        if signature is None or digest in self:
+            return digest
+        cursor = self.conn.execute(
+            "INSERT INTO articles (content_hash, bot, title, signature, created_at) VALUES (?, ?, ?, ?, ?)",
+            (digest, bot, title, signature.tobytes(), time.time()),
+        )
+        self.conn.executemany("INSERT OR IGNORE INTO buckets (key, article_id) VALUES (?, ?)",
+                              [(key, cursor.lastrowid) for key in self._bucket_keys(signature)])
+        return digest
+
+    def sync(self, outbox):
+        """Indexe les articles de l'outbox pas encore connus (articles antérieurs à l'index, autre machine...)."""
+        known = {row[0] for row in self.conn.execute("SELECT content_hash FROM articles")}
+        missing = [row[0] for row in outbox.conn.execute("SELECT content_hash FROM articles") if row[0] not in known]
+        added = 0
+        with self.conn:
+            # Une seule transaction pour tout l'import
+            for digest in missing:
+                row = outbox.get(digest)
+                self._insert(row["content"], row["bot"], title=first_line_title(row["content"]))
+                added += 1
+        if added:
+            print(f"DEBUG: Duplicate index: {added} article(s) imported from the outbox ({len(self)} indexed).")
+        return added
+
+    def check(self, text):
+        """Meilleure correspondance (similarité, content_hash, bot, titre) au-dessus du seuil, ou None."""
+        with span("dedup_check") as check_span:
+            matches = self.query(text)
+            check_span.set(candidates=len(matches), similarity=round(matches[0][0], 3) if matches else 0.0)
+        return matches[0] if matches else None
+
+    def close(self):
+        self.conn.close()
+
+
+def first_line_title(text):
+    line = text.lstrip().split("\n", 1)[0]
+    return line.lstrip("#").strip() if line.startswith("#") else None
+
+
+def open_duplicate_index(outbox):
+    """Index des quasi-doublons à jour avec l'outbox, ou None si DEDUP_CHECK est désactivé."""
+    if not DEDUP_CHECK:
+        return None
+    index = DuplicateIndex()
+    index.sync(outbox)
+    return index
+
+
+def generate_distinct(generate, index, bot, max_regenerations=DEDUP_MAX_REGENERATIONS):
+    """
+    Appelle `generate()` jusqu'à obtenir un article qui n'est pas un quasi-doublon de l'archive
+    (au plus `max_regenerations` nouvelles tentatives), l'ajoute à l'index et le retourne.
+    Relève DuplicateArticleError si toutes les tentatives ressemblent à un article existant.
+    Sans index (`None`), retourne simplement `generate()`.
+    """
+    if index is None:
+        return generate()
+    for attempt in range(max_regenerations + 1):
+        article = generate()
+        match = index.check(article)
+        if match is None:
+            index.add(article, bot, title=first_line_title(article))
+            return article
+        similarity, digest, match_bot, title = match
+        print(f"⚠️ Generated article is a near-duplicate ({similarity:.0%}) of {match_bot} article "
+              f"'{title or digest[:12]}' (attempt {attempt + 1}/{max_regenerations + 1}).")
+    raise DuplicateArticleError(f"still a near-duplicate ({similarity:.0%}) of '{title or digest[:12]}' "
+                                f"after {max_regenerations + 1} attempt(s)")
+
+
+def reject_duplicates(articles, index, bot):
+    """Écarte les articles d'un lot trop proches de l'archive ou d'un article précédent du lot."""
+    if index is None:
+        return articles
+    kept = []
+    for article in articles:
+        match = index.check(article)
+        if match is not None:
+            print(f"⚠️ Batch article rejected: near-duplicate ({match[0]:.0%}) of '{match[3] or match[1][:12]}'.")
+            continue
+        index.add(article, bot, title=first_line_title(article))
+        kept.append(article)
+    return kept
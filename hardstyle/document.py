@@ -0,0 +1,143 @@
+"""
+Modèle de document léger pour un article Markdown, construit une seule fois par article.
+
+Les lignes sont ajoutées au fil de l'eau ; le document indexe au passage les titres, les
+mentions des entités suivies (XCEED, 113xA... ou tout le roster avec un `EntityMatcher`) et les
+embeds déjà présents. Les insertions
+(embeds Spotify) sont rattachées à une ligne d'ancrage au lieu de décaler la liste, et le
+texte final est produit par une seule sérialisation.
+"""
+
+# Entités dont les mentions sont indexées par défaut
+TRACKED_ENTITIES = ("XCEED", "113xA")
+
+
+def split_title(content):
+    """
+    Sépare le titre H1 de la première ligne du reste de l'article, sans découper tout le texte.
+    Retourne (titre ou None, contenu sans le titre).
+    """
+    end = content.find("\n")
+    first_line = (content if end == -1 else content[:end]).strip()
+    if first_line.startswith("# "):
+        return first_line[2:].strip(), content[len(first_line):].strip()
+    return None, content
+
+
+class ArticleDocument:
+    def __init__(self, tracked_entities=TRACKED_ENTITIES, known_embeds=(), matcher=None):
+        self.lines = []
+        self.title = None
+        self.headings = []                  # (index de ligne, niveau, texte)
+        self.matcher = matcher
+        self.mentions = {self._entity_key(entity): [] for entity in tracked_entities}
+        self.mention_spans = {}             # index de ligne -> [(début, fin, entité)] (avec `matcher`)
+        # Entités suivies inconnues du matcher : recherchées comme sous-chaînes
+        self._substring_entities = tuple(entity for entity in tracked_entities
+                                         if matcher is None or entity not in matcher)
+        self.embeds = set()                 # embeds présents (écrits par l'IA ou insérés)
+        self._known_embeds = tuple(known_embeds)
+        self._inserted_after = {}           # index de ligne (-1 = début) -> blocs insérés après
+        self._appended = []                 # blocs ajoutés en fin d'article
+
+    def __len__(self):
+        return len(self.lines)
+
+    @classmethod
+    def parse(cls, content, **kwargs):
+        document = cls(**kwargs)
+        for line in content.split("\n"):
+            document.append_line(line)
+        return document
+
+    def append_line(self, line):
+        """Ajoute une ligne complète et met à jour les index ; les lignes vides de tête sont ignorées."""
+        if not self.lines and not line.strip():
+            return
+        index = len(self.lines)
+        self.lines.append(line)
+        if line.startswith("#"):
+            level = len(line) - len(line.lstrip("#"))
+            text = line[level:].strip()
+            self.headings.append((index, level, text))
+            if index == 0 and line.startswith("# "):
+                self.title = text
+        if self.matcher is not None:
+            # Toutes les entités du roster en une passe sur la ligne
+            spans = self.matcher.find(line)
+            if spans:
+                self.mention_spans[index] = spans
+                for entity in dict.fromkeys(entity for _, _, entity in spans):
+                    self.mentions.setdefault(entity, []).append(index)
+        for entity in self._substring_entities:
+            if entity in line:
+                self.mentions[entity].append(index)
+        for embed in self._known_embeds:
+            if embed in line:
+                self.embeds.add(embed)
+
+    def _entity_key(self, entity):
+        return (self.matcher.canonical(entity) if self.matcher is not None else None) or entity
+
+    def mentioned_entities(self):
+        """Entités mentionnées, dans l'ordre de leur première mention."""
+        return [entity for _, entity in sorted((positions[0], entity)
+                                               for entity, positions in self.mentions.items() if positions)]
+
+    def content_length(self):
+        """Nombre de lignes hors lignes vides finales."""
+        last = len(self.lines)
+        while last > 0 and not self.lines[last - 1].strip():
+            last -= 1
+        return last
+
+    def has_embed(self, embed):
+        return embed in self.embeds
+
+    def first_mention(self, entity, min_line_length=0, after=-1):
+        """Index de la première ligne après `after` mentionnant `entity` (et plus longue que `min_line_length`)."""
+        for index in self.mentions.get(self._entity_key(entity), ()):
+            if index > after and len(self.lines[index]) > min_line_length:
+                return index
+        return None
+
+    def find_heading(self, text, min_level=2):
+        """Index du premier titre de niveau >= `min_level` contenant `text` (None si absent)."""
+        for index, level, heading in self.headings:
+            if level >= min_level and text in heading:
+                return index
+        return None
+
+    def replace_line(self, index, line):
+        """Remplace le texte de la ligne `index` (ex. mentions transformées en liens), index inchangés."""
+        self.lines[index] = line
+
+    def insert_after(self, index, block, embed=None):
+        """Insère `block` après la ligne `index` (-1 : en tête) sans décaler les lignes existantes."""
+        self._inserted_after.setdefault(index, []).append(block)
+        if embed is not None:
+            self.embeds.add(embed)
+
+    def append_block(self, block, embed=None):
+        """Ajoute `block` après la fin de l'article (après suppression des lignes vides finales)."""
+        self._appended.append(block)
+        if embed is not None:
+            self.embeds.add(embed)
+
+    def serialize(self):
+        """Produit le texte final en une seule jointure (texte de l'article débarrassé de ses espaces de bord)."""
+        last = self.content_length() - 1
+        parts = list(self._inserted_after.get(-1, ()))
+        for index in range(last + 1):
+            line = self.lines[index]
+            if index == 0:
+                line = line.lstrip()
+            if index == last:
+                line = line.rstrip()
+            parts.append(line)
+            if index in self._inserted_after:
+                parts.extend(self._inserted_after[index])
+        # Insertions ancrées au-delà de la fin (article très court) : placées en fin de corps
+        parts.extend(block for index, blocks in sorted(self._inserted_after.items())
+                     if index > last for block in blocks)
+        return "\n".join(parts) + "".join(self._appended)
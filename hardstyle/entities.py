@@ -0,0 +1,208 @@
+"""
+Repérage des artistes du roster dans un article, en une seule passe quelle que soit la taille du roster.
+
+Un automate d'Aho-Corasick est construit une fois à partir des noms (casse et accents neutralisés) :
+le texte est parcouru caractère par caractère et chaque état donne directement les noms qui se
+terminent à cette position. Seules les occurrences délimitées par des frontières de mots sont
+retenues, la plus longue l'emportant en cas de chevauchement ("Sub Zero Project" plutôt que
+"Sub Zero").
+
+Les mentions alimentent les liens internes (dernier post du blog sur l'artiste), les embeds
+Spotify par artiste et les tags Hashnode de l'article.
+"""
+import os
+import re
+import unicodedata
+
+from hardstyle.roster import normalize_name
+
+ENTITY_LINKING = os.getenv("ENTITY_LINKING", "true").lower() not in ("0", "false", "no")
+# Embeds Spotify d'artistes ajoutés au maximum par article (en plus de l'embed XCEED)
+ENTITY_MAX_EMBEDS = int(os.getenv("ENTITY_MAX_EMBEDS", "3"))
+# Hashnode accepte au plus 5 tags par post
+HASHNODE_MAX_TAGS = int(os.getenv("HASHNODE_MAX_TAGS", "5"))
+
+SPOTIFY_ARTIST_EMBED = """<iframe style="border-radius:12px" src="https://open.spotify.com/embed/artist/{artist_id}?utm_source=generator&theme=0" width="100%" height="152" frameBorder="0" allowfullscreen="" allow="autoplay; clipboard-write; encrypted-media; fullscreen; picture-in-picture" loading="lazy"></iframe>"""
+SPOTIFY_ARTIST_RE = re.compile(r"open\.spotify\.com/embed/artist/([A-Za-z0-9]+)")
+# Zones d'une ligne où une mention n'est pas transformée en lien : liens Markdown, URLs, code
+PROTECTED_RE = re.compile(r"\[[^\]]*\]\([^)]*\)|https?://\S+|`[^`]*`")
+SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+WHITESPACE = str.maketrans("\t\n\r\f\v", "     ")
+# Les transitions de l'automate sont rangées dans un seul dictionnaire, clé (état << 21) | caractère :
+# bien plus compact qu'un dictionnaire par état pour des dizaines de milliers de noms
+CHAR_BITS = 21
+
+
+def fold_text(text):
+    """
+    Texte sans casse ni accents, et positions d'origine de chacun de ses caractères
+    (None quand le texte est ASCII : les positions sont alors inchangées).
+    """
+    if text.isascii():
+        return text.lower().translate(WHITESPACE), None
+    chars, positions = [], []
+    for index, char in enumerate(text):
+        for folded in unicodedata.normalize("NFKD", char).casefold():
+            if unicodedata.combining(folded):
+                continue
+            chars.append(" " if folded.isspace() else folded)
+            positions.append(index)
+    return "".join(chars), positions
+
+
+def fold_name(name):
+    return fold_text(" ".join(name.split()))[0]
+
+
+def slugify(name):
+    """Slug de tag Hashnode d'un nom d'artiste ("D-Block & S-te-Fan" -> "d-block-s-te-fan")."""
+    return SLUG_RE.sub("-", fold_name(name)).strip("-")
+
+
+def spotify_artist_embed(artist_id):
+    return SPOTIFY_ARTIST_EMBED.format(artist_id=artist_id)
+
+
+class EntityMatcher:
+    def __init__(self, names=()):
+        self.names = []             # orthographe de référence de chaque entité
+        self._keys = {}             # nom replié -> entité
+        self._goto = {}             # (état << CHAR_BITS) | caractère -> état suivant
+        self._fail = [0]
+        self._depth = [0]
+        self._output = [-1]         # entité dont le nom se termine exactement sur cet état (-1 : aucune)
+        self._next_output = [0]     # état de sortie le plus proche sur la chaîne d'échec (0 : aucun)
+        for name in names:
+            self._add(name)
+        self._build()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return fold_name(name) in self._keys
+
+    def canonical(self, name):
+        """Orthographe de référence de `name` (None si inconnu)."""
+        entity = self._keys.get(fold_name(name))
+        return None if entity is None else self.names[entity]
+
+    def _add(self, name):
+        key = fold_name(name)
+        if not key or key in self._keys:
+            return
+        self._keys[key] = len(self.names)
+        self.names.append(" ".join(name.split()))
+        state = 0
+        for char in key:
+            code = (state << CHAR_BITS) | ord(char)
+            next_state = self._goto.get(code)
+            if next_state is None:
+                next_state = len(self._fail)
+                self._goto[code] = next_state
+                self._fail.append(0)
+                self._depth.append(self._depth[state] + 1)
+                self._output.append(-1)
+                self._next_output.append(0)
+            state = next_state
+        self._output[state] = self._keys[key]
+
+    def _build(self):
+        """Liens d'échec et de sortie, calculés en largeur d'abord (profondeur croissante)."""
+        children = {}
+        for code, state in self._goto.items():
+            children.setdefault(code >> CHAR_BITS, []).append((code & ((1 << CHAR_BITS) - 1), state))
+        queue = [state for _, state in children.get(0, ())]
+        for state in queue:
+            for char, child in children.get(state, ()):
+                fallback = self._fail[state]
+                while fallback and ((fallback << CHAR_BITS) | char) not in self._goto:
+                    fallback = self._fail[fallback]
+                target = self._goto.get((fallback << CHAR_BITS) | char, 0)
+                self._fail[child] = target
+                self._next_output[child] = target if self._output[target] >= 0 else self._next_output[target]
+                queue.append(child)
+
+    def find(self, text):
+        """Mentions de `text` : liste de (début, fin, nom de référence), sans chevauchement, dans l'ordre."""
+        if not self.names:
+            return []
+        folded, positions = fold_text(text)
+        goto, fail, output, next_output, depth = self._goto.get, self._fail, self._output, self._next_output, self._depth
+        length = len(folded)
+        candidates = []
+        state = 0
+        for end, char in enumerate(folded):
+            code = ord(char)
+            while True:
+                next_state = goto((state << CHAR_BITS) | code)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+            hit = state if output[state] >= 0 else next_output[state]
+            while hit:
+                start = end + 1 - depth[hit]
+                if ((start == 0 or not (folded[start - 1].isalnum() and folded[start].isalnum()))
+                        and (end + 1 == length or not (folded[end].isalnum() and folded[end + 1].isalnum()))):
+                    candidates.append((start, end + 1, output[hit]))
+                hit = next_output[hit]
+        # Plus à gauche d'abord, puis la plus longue
+        candidates.sort(key=lambda match: (match[0], -match[1]))
+        matches, last_end = [], 0
+        for start, end, entity in candidates:
+            if start < last_end:
+                continue
+            last_end = end
+            if positions is not None:
+                start, end = positions[start], positions[end - 1] + 1
+            matches.append((start, end, self.names[entity]))
+        return matches
+
+    def mentions(self, text):
+        """Nombre de mentions par entité, dans l'ordre de première apparition."""
+        counts = {}
+        for _, _, name in self.find(text):
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+
+class EntityLinker:
+    """
+    Entités du roster et ce qui leur est associé : identifiant d'artiste Spotify, URL du dernier post
+    du blog qui en parle (clés : nom normalisé) et artistes épinglés, prioritaires pour les tags.
+    """
+
+    def __init__(self, names, spotify_ids=None, links=None, pinned=(), max_embeds=ENTITY_MAX_EMBEDS):
+        self.matcher = EntityMatcher(names)
+        self.spotify_ids = dict(spotify_ids or {})
+        self.links = dict(links or {})
+        self.pinned = {normalize_name(name) for name in pinned}
+        self.max_embeds = max_embeds
+
+    def spotify_id(self, name):
+        return self.spotify_ids.get(normalize_name(name))
+
+    def link(self, name):
+        return self.links.get(normalize_name(name))
+
+    def tags(self, text, base_tags, limit=HASHNODE_MAX_TAGS):
+        """
+        `base_tags` complétés par les artistes mentionnés, dans la limite de `limit` tags :
+        artistes épinglés d'abord, puis les plus cités.
+        """
+        counts = self.matcher.mentions(text)
+        ordered = sorted(counts, key=lambda name: (normalize_name(name) not in self.pinned, -counts[name]))
+        tags = list(base_tags)
+        slugs = {tag["slug"] for tag in tags}
+        for name in ordered:
+            if len(tags) >= limit:
+                break
+            slug = slugify(name)
+            if slug and slug not in slugs:
+                tags.append({"name": name, "slug": slug})
+                slugs.add(slug)
+        return tags
@@ -0,0 +1,164 @@
+"""
+Déclinaison de chaque article publié en plusieurs langues, chacune sur sa publication Hashnode.
+
+L'article nettoyé est découpé par section (titres Markdown), les embeds restant tels quels ; les
+sections de toutes les langues sont traduites en même temps, dans un seul pool de FANOUT_CONCURRENCY
+appels Mistral AI. Dès que toutes les sections d'une langue sont traduites, sa variante est
+enregistrée dans l'outbox (bot "<bot>/<langue>") puis publiée, en parallèle des autres langues et
+sur le pool de connexions partagé : la durée totale reste proche de celle d'une seule traduction.
+
+    FANOUT_LANGUAGES=fr:6859c2f970cff8e4319738f3,de:685a0b...   # langue:identifiant de publication
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from hardstyle.continuation import CHARS_PER_TOKEN
+from hardstyle.outbox import Outbox, publish_entry, publish_pending
+from hardstyle.telemetry import span
+
+
+class TranslationError(ValueError):
+    """Traduction inutilisable (vide ou coupée par max_tokens)."""
+
+
+def parse_targets(value):
+    """"fr:<publication>,de:<publication>" -> {"fr": "<publication>", "de": "<publication>"}."""
+    targets = {}
+    for item in value.split(","):
+        language, _, publication_id = item.strip().partition(":")
+        if language.strip() and publication_id.strip():
+            targets[language.strip().lower()] = publication_id.strip()
+    return targets
+
+
+FANOUT_TARGETS = parse_targets(os.getenv("FANOUT_LANGUAGES", ""))
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))
+# Taille maximale (caractères) d'un fragment traduit : une section plus longue est coupée entre deux paragraphes
+FANOUT_CHUNK_CHARS = int(os.getenv("FANOUT_CHUNK_CHARS", "3000"))
+
+LANGUAGE_NAMES = {
+    "fr": "French", "de": "German", "es": "Spanish", "it": "Italian", "nl": "Dutch",
+    "pt": "Portuguese", "pl": "Polish", "ja": "Japanese",
+}
+# Blocs recopiés sans traduction : embeds et autres blocs HTML
+VERBATIM_RE = re.compile(r"^\s*<")
+# Les langues cibles sont souvent plus longues que l'anglais : marge sur le budget de tokens
+TRANSLATION_TOKEN_FACTOR = 2
+MIN_TRANSLATION_TOKENS = 256
+
+
+def variant_bot(bot, language):
+    """Nom de bot des variantes traduites dans l'outbox (republiées séparément de l'article d'origine)."""
+    return f"{bot}/{language}"
+
+
+def split_chunks(markdown, max_chars=FANOUT_CHUNK_CHARS):
+    """
+    Découpe l'article en blocs : liste de (à traduire, texte). Un nouveau fragment commence à chaque
+    titre Markdown ou quand le fragment dépasserait `max_chars` ; les blocs HTML sont isolés.
+    """
+    chunks = []
+    current = []
+
+    def flush():
+        if current:
+            chunks.append((True, "\n\n".join(current)))
+            current.clear()
+
+    for block in re.split(r"\n\s*\n", markdown.strip()):
+        if not block.strip():
+            continue
+        if VERBATIM_RE.match(block):
+            flush()
+            chunks.append((False, block))
+            continue
+        if current and (block.lstrip().startswith("#") or len("\n\n".join(current)) + len(block) + 2 > max_chars):
+            flush()
+        current.append(block)
+    flush()
+    return chunks
+
+
+def build_translation_prompt(text, language):
+    name = LANGUAGE_NAMES.get(language, language)
+    return (
+        f"Translate the following excerpt of a Hardstyle music blog post from English into {name}. "
+        "Keep the Markdown formatting exactly (headings, bold, lists, links and their URLs). "
+        "Do not translate artist names, track titles, label or festival names. "
+        "Answer ONLY with the translation, without any comment or note.\n\n"
+        f"{text}"
+    )
+
+
+def translate_chunk(text, language, complete):
+    max_tokens = max(MIN_TRANSLATION_TOKENS, int(len(text) / CHARS_PER_TOKEN * TRANSLATION_TOKEN_FACTOR))
+    with span("translate_chunk", language=language, chars=len(text)):
+        translation, finish_reason = complete(build_translation_prompt(text, language), max_tokens)
+    if finish_reason == "length" or not translation.strip():
+        raise TranslationError(f"{language} translation of a {len(text)}-char section was "
+                               f"{'cut by max_tokens' if translation.strip() else 'empty'}.")
+    return translation.strip()
+
+
+def publish_variants(outbox, bot, article, complete, publish, targets=None, concurrency=FANOUT_CONCURRENCY,
+                     max_chars=FANOUT_CHUNK_CHARS):
+    """
+    Traduit `article` (Markdown nettoyé, titre H1 compris) dans chaque langue de `targets` ({langue: publication})
+    et publie chaque variante : `complete(prompt, max_tokens)` retourne (texte, finish_reason) et
+    `publish(contenu, publication_id)` l'URL du post. Retourne {langue: URL ou exception} ; l'échec d'une
+    langue n'empêche pas les autres, et une variante non publiée reste dans l'outbox.
+    """
+    targets = FANOUT_TARGETS if targets is None else targets
+    if not targets:
+        return {}
+    chunks = split_chunks(article, max_chars)
+    to_translate = sum(translate for translate, _ in chunks)
+    print(f"\n🌍 Translating the article into {len(targets)} language(s) ({', '.join(targets)}): "
+          f"{to_translate} section(s) each, concurrency {concurrency}...")
+
+    def publish_language(language, publication_id, futures):
+        with span("fanout_variant", language=language) as variant_span:
+            variant = "\n\n".join(future.result() if future is not None else text
+                                  for (_, text), future in zip(chunks, futures))
+            variant_span.set(bytes=len(variant))
+            # Connexion SQLite propre au thread de publication
+            variant_outbox = Outbox(outbox.path)
+            try:
+                digest = variant_outbox.add(variant_bot(bot, language), variant)
+                return publish_entry(variant_outbox, digest, lambda content: publish(content, publication_id))
+            finally:
+                variant_outbox.close()
+
+    results = {}
+    with span("fanout", languages=len(targets), chunks=to_translate) as fanout_span:
+        # Toutes les sections de toutes les langues partent ensemble ; une publication par langue
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="hardstyle-translate") as pool, \
+                ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="hardstyle-fanout") as publishers:
+            pending = {}
+            for language, publication_id in targets.items():
+                futures = [pool.submit(translate_chunk, text, language, complete) if translate else None
+                           for translate, text in chunks]
+                pending[language] = publishers.submit(publish_language, language, publication_id, futures)
+            for language, future in pending.items():
+                try:
+                    results[language] = future.result()
+                    print(f"✅ {language} variant published to {targets[language]} : {results[language]}")
+                except Exception as e:
+                    results[language] = e
+                    print(f"❌ Could not publish the {language} variant : {e}")
+        fanout_span.set(failed=sum(isinstance(result, Exception) for result in results.values()))
+    return results
+
+
+def publish_pending_variants(outbox, bot, publish, targets=None):
+    """Republie les variantes traduites restées dans l'outbox ; retourne le nombre de variantes reprises."""
+    targets = FANOUT_TARGETS if targets is None else targets
+    resumed = 0
+    for language, publication_id in targets.items():
+        try:
+            resumed += publish_pending(outbox, variant_bot(bot, language),
+                                       lambda content, publication_id=publication_id: publish(content, publication_id))
+        except Exception as e:
+            print(f"❌ Could not publish a pending {language} variant : {e}")
+    return resumed
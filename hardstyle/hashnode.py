@@ -0,0 +1,165 @@
+"""
+Éléments partagés pour l'API GraphQL de Hashnode : mutation de publication, publication en lots
+et lecture paginée des posts d'une publication.
+
+Plusieurs posts sont envoyés dans une seule requête sous forme de mutations aliasées
+(`p0: publishPost(...)`, `p1: publishPost(...)`...). Les lots sont bornés en nombre de posts et en
+taille de payload, et les erreurs GraphQL sont rattachées au post concerné grâce à leur `path`.
+"""
+import functools
+import json
+import os
+
+import requests
+
+from hardstyle.http_client import get_client
+from hardstyle.telemetry import span
+
+# Nombre maximal de posts par requête et taille maximale (octets JSON) des variables d'un lot
+HASHNODE_BATCH_MAX_POSTS = int(os.getenv("HASHNODE_BATCH_MAX_POSTS", "10"))
+HASHNODE_BATCH_MAX_BYTES = int(os.getenv("HASHNODE_BATCH_MAX_BYTES", "1000000"))
+
+POST_FIELDS = "post { id title slug url }"
+
+PUBLISH_POST_MUTATION = f"""
+mutation PublishPost($input: PublishPostInput!) {{
+  publishPost(input: $input) {{ {POST_FIELDS} }}
+}}
+"""
+
+# Posts d'une publication, du plus récent au plus ancien (pagination par curseur)
+PUBLICATION_POSTS_QUERY = """
+query PublicationPosts($id: ObjectId!, $first: Int!, $after: String) {
+  publication(id: $id) {
+    posts(first: $first, after: $after) {
+      edges { node { id slug title url publishedAt updatedAt tags { name slug } content { markdown } } }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+# Même liste réduite aux identifiants et dates : sonde peu coûteuse d'une synchronisation incrémentale
+PUBLICATION_POST_STAMPS_QUERY = """
+query PublicationPostStamps($id: ObjectId!, $first: Int!) {
+  publication(id: $id) {
+    posts(first: $first) {
+      edges { node { id publishedAt updatedAt } }
+    }
+  }
+}
+"""
+
+
+class HashnodeError(Exception):
+    """Erreur GraphQL renvoyée par Hashnode lors d'une publication."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"Hashnode GraphQL errors: {errors}")
+
+
+@functools.lru_cache(maxsize=None)
+def batch_mutation(size):
+    """Document GraphQL de `size` mutations publishPost aliasées, construit une seule fois par taille."""
+    arguments = ", ".join(f"$input{index}: PublishPostInput!" for index in range(size))
+    fields = "\n".join(f"  p{index}: publishPost(input: $input{index}) {{ {POST_FIELDS} }}" for index in range(size))
+    return f"mutation PublishPosts({arguments}) {{\n{fields}\n}}"
+
+
+def pack_batches(inputs, max_posts=HASHNODE_BATCH_MAX_POSTS, max_bytes=HASHNODE_BATCH_MAX_BYTES):
+    """
+    Répartit les indices de `inputs` en lots consécutifs d'au plus `max_posts` posts et
+    `max_bytes` octets de variables JSON. Un post plus gros que le budget part seul.
+    """
+    batches = []
+    current, current_bytes = [], 0
+    for index, post_input in enumerate(inputs):
+        size = len(json.dumps(post_input, ensure_ascii=False).encode("utf-8"))
+        if current and (len(current) >= max_posts or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_errors(errors):
+    """Range les erreurs GraphQL par alias (premier élément de `path`) ; les autres restent globales."""
+    by_alias, unattributed = {}, []
+    for error in errors or []:
+        path = error.get("path") if isinstance(error, dict) else None
+        if path:
+            by_alias.setdefault(str(path[0]), []).append(error)
+        else:
+            unattributed.append(error)
+    return by_alias, unattributed
+
+
+def publish_posts(url, headers, inputs, client=None, max_posts=HASHNODE_BATCH_MAX_POSTS,
+                  max_bytes=HASHNODE_BATCH_MAX_BYTES):
+    """
+    Publie les `inputs` (PublishPostInput) en lots de mutations aliasées.
+
+    Retourne un résultat par entrée, dans l'ordre : le dictionnaire `post` renvoyé par Hashnode,
+    ou l'exception propre à ce post (HashnodeError, ou l'erreur HTTP de tout son lot). Un alias
+    sans `post` dans la réponse compte comme un échec, même sans erreur GraphQL.
+    """
+    client = client or get_client()
+    results = [None] * len(inputs)
+    for indices in pack_batches(inputs, max_posts, max_bytes):
+        variables = {f"input{position}": inputs[index] for position, index in enumerate(indices)}
+        with span("hashnode_batch", posts=len(indices)) as batch_span:
+            try:
+                resp = client.post(url, json={"query": batch_mutation(len(indices)), "variables": variables},
+                                   headers=headers)
+                resp.raise_for_status()
+                response_data = resp.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"❌ Hashnode batch request failed for {len(indices)} post(s): {e}")
+                batch_span.set(failed=len(indices))
+                for index in indices:
+                    results[index] = e
+                continue
+
+            data = response_data.get("data") or {}
+            by_alias, unattributed = split_errors(response_data.get("errors"))
+            failed = 0
+            for position, index in enumerate(indices):
+                alias = f"p{position}"
+                result = data.get(alias)
+                post = result.get("post") if isinstance(result, dict) else None
+                if alias in by_alias or not post:
+                    results[index] = HashnodeError(by_alias.get(alias) or unattributed
+                                                   or [{"message": f"no post returned for {alias}"}])
+                    failed += 1
+                else:
+                    results[index] = post
+            batch_span.set(status_code=resp.status_code, failed=failed)
+    return results
+
+
+def fetch_publication_posts(url, headers, publication_id, first, after=None, stamps_only=False, client=None):
+    """
+    Une page des posts de `publication_id` : retourne (posts, curseur de la page suivante ou None).
+    Avec `stamps_only`, seuls `id`, `publishedAt` et `updatedAt` sont demandés (pas de pagination).
+    """
+    query = PUBLICATION_POST_STAMPS_QUERY if stamps_only else PUBLICATION_POSTS_QUERY
+    variables = {"id": publication_id, "first": first}
+    if after and not stamps_only:
+        variables["after"] = after
+    resp = (client or get_client()).post(url, json={"query": query, "variables": variables}, headers=headers,
+                                         idempotent=True)
+    resp.raise_for_status()
+    response_data = resp.json()
+    if response_data.get("errors"):
+        raise HashnodeError(response_data["errors"])
+    publication = (response_data.get("data") or {}).get("publication")
+    if publication is None:
+        raise HashnodeError([{"message": f"publication {publication_id} not found"}])
+    connection = publication["posts"]
+    posts = [edge["node"] for edge in connection["edges"]]
+    page_info = connection.get("pageInfo") or {}
+    return posts, page_info.get("endCursor") if page_info.get("hasNextPage") else None
@@ -0,0 +1,446 @@
+"""
+Exécution des appels Mistral AI sensible à la latence : requêtes doublées (hedging) et disjoncteur.
+
+Les latences observées (temps jusqu'au premier token en streaming, durée de la réponse sinon)
+sont rangées par type d'appel dans des histogrammes à compartiments géométriques, partagés par les
+processus et conservés d'une exécution à l'autre dans `.cache/latency_histograms.sqlite3`. Quand une
+requête dépasse le percentile HEDGE_PERCENTILE de son histogramme, une copie est envoyée : la première
+des deux à répondre l'emporte. Seul un flux perdant est annulé (fermeture au fragment suivant) : une
+complétion non streamée perdante va jusqu'au bout, et est facturée, mais sa réponse est ignorée.
+
+Chaque modèle a son disjoncteur, ouvert après CIRCUIT_FAILURE_THRESHOLD échecs consécutifs (erreurs
+réseau, flux coupés, 429/5xx) : les appels suivants à ce modèle échouent aussitôt (CircuitOpenError)
+pendant CIRCUIT_RESET_TIMEOUT secondes, puis un seul appel d'essai décide de sa fermeture. Le
+routeur de modèles (`hardstyle.routing`) se replie alors sur un autre modèle.
+"""
+import atexit
+import contextvars
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from hardstyle.http_client import RETRYABLE_STATUS_CODES, get_client
+from hardstyle.storage import state_path
+from hardstyle.streaming import StreamAborted, chat_completion, stream_chat_completion
+from hardstyle.telemetry import annotate, span
+
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "true").lower() not in ("0", "false", "no")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.95"))
+# Latences observées avant d'envoyer des copies (en dessous, le percentile n'est pas fiable)
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+# Délai minimal (secondes) avant d'envoyer une copie, quel que soit le percentile appris
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "1.0"))
+# Poids total au-delà duquel un histogramme est divisé par deux : les latences anciennes s'effacent
+HEDGE_HISTORY_SIZE = int(os.getenv("HEDGE_HISTORY_SIZE", "200"))
+# Délai maximal (secondes) avant l'écriture des latences observées dans la base partagée
+HEDGE_FLUSH_INTERVAL = float(os.getenv("HEDGE_FLUSH_INTERVAL", "10"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "60"))
+
+# Compartiments de latence : 10 ms × 1,2^i, jusqu'à ~1 h
+BUCKET_MIN = 0.01
+BUCKET_FACTOR = 1.2
+BUCKET_COUNT = 70
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Levée sans envoyer de requête tant que le disjoncteur de l'endpoint est ouvert."""
+
+
+def bucket_index(seconds):
+    if seconds <= BUCKET_MIN:
+        return 0
+    return min(BUCKET_COUNT - 1, math.ceil(math.log(seconds / BUCKET_MIN) / math.log(BUCKET_FACTOR)))
+
+
+def bucket_bound(index):
+    """Borne supérieure (secondes) du compartiment `index`."""
+    return BUCKET_MIN * BUCKET_FACTOR ** index
+
+
+class LatencyHistogram:
+    def __init__(self, counts=None):
+        self.counts = [0.0] * BUCKET_COUNT
+        for index, count in enumerate((counts or [])[:BUCKET_COUNT]):
+            self.counts[index] = float(count)
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def observe(self, seconds, history_size=HEDGE_HISTORY_SIZE):
+        self.counts[bucket_index(seconds)] += 1
+        if self.total > history_size:
+            self.counts = [count / 2 for count in self.counts]
+
+    def merge(self, counts, history_size=HEDGE_HISTORY_SIZE):
+        """Ajoute des observations (nombre par compartiment), puis divise par deux tant que le poids dépasse `history_size`."""
+        for index, count in enumerate(counts[:BUCKET_COUNT]):
+            self.counts[index] += count
+        while self.total > history_size:
+            self.counts = [count / 2 for count in self.counts]
+
+    def quantile(self, q):
+        """Latence (borne du compartiment) sous laquelle tombe la proportion `q` des observations."""
+        target = q * self.total
+        cumulative = 0.0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= target:
+                return bucket_bound(index)
+        return bucket_bound(BUCKET_COUNT - 1)
+
+
+class LatencyStore:
+    """
+    Histogrammes par type d'appel, partagés par les processus (SQLite).
+
+    Les observations s'accumulent en mémoire et sont ajoutées à la base au plus toutes les
+    `flush_interval` secondes (et à la sortie du processus), dans une transaction `BEGIN IMMEDIATE` :
+    les observations des autres processus sont fusionnées, jamais écrasées.
+    """
+
+    def __init__(self, path=None, flush_interval=HEDGE_FLUSH_INTERVAL, history_size=HEDGE_HISTORY_SIZE):
+        self.path = path or state_path("latency_histograms.sqlite3")
+        self.flush_interval = flush_interval
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # État reconstructible : inutile de forcer l'écriture sur disque
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS histograms (name TEXT PRIMARY KEY, counts TEXT NOT NULL)")
+        self.histograms = {row["name"]: LatencyHistogram(json.loads(row["counts"]))
+                           for row in self.conn.execute("SELECT name, counts FROM histograms")}
+        # Observations pas encore écrites : nombre par compartiment, par type d'appel
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+        atexit.register(self.flush)
+
+    def get(self, name):
+        with self._lock:
+            return self.histograms.setdefault(name, LatencyHistogram())
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.histograms.setdefault(name, LatencyHistogram()).observe(seconds, self.history_size)
+            self._pending.setdefault(name, [0] * BUCKET_COUNT)[bucket_index(seconds)] += 1
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Ajoute les observations en attente à la base, puis reprend les histogrammes fusionnés."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+            if not pending:
+                return
+            try:
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    merged = {}
+                    for name, counts in pending.items():
+                        row = self.conn.execute("SELECT counts FROM histograms WHERE name = ?", (name,)).fetchone()
+                        histogram = LatencyHistogram(json.loads(row["counts"]) if row is not None else None)
+                        histogram.merge(counts, self.history_size)
+                        self.conn.execute("INSERT OR REPLACE INTO histograms (name, counts) VALUES (?, ?)",
+                                          (name, json.dumps([round(count, 3) for count in histogram.counts])))
+                        merged[name] = histogram
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                self.conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not save {sum(map(sum, pending.values()))} latency observation(s): {e}")
+                return
+            self.histograms.update(merged)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Relève CircuitOpenError si l'endpoint est considéré en panne ; laisse passer un seul appel
+        d'essai, pour lequel elle retourne True (l'appelant doit alors appeler `release_trial()`).
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+                print(f"DEBUG: Circuit breaker for {self.name} half-open, sending a trial request.")
+                return True
+            raise CircuitOpenError(f"{self.name} circuit breaker is open after {self.failures} consecutive "
+                                   f"failure(s), failing fast (retry in {max(0.0, remaining):.0f}s).")
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"✅ Circuit breaker for {self.name} closed again.")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                print(f"⚠️ Circuit breaker for {self.name} opened after {self.failures} consecutive failure(s): "
+                      f"calls fail fast for {self.reset_timeout:g}s.")
+
+    def release_trial(self):
+        """
+        Fin de l'appel d'essai. S'il n'a rien décidé (annulé par l'appelant, erreur de la requête
+        et non de l'endpoint), le disjoncteur repasse ouvert avec un délai écoulé : l'appel suivant
+        sert de nouvel essai, au lieu de rester demi-ouvert et de tout refuser.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self._opened_at = time.monotonic() - self.reset_timeout
+                print(f"DEBUG: Circuit breaker for {self.name} trial request ended without a verdict, "
+                      f"the next call will be a new trial.")
+
+
+def is_endpoint_failure(error):
+    """Erreur imputable à l'endpoint (réseau, flux coupé, 429/5xx), par opposition à une erreur de la requête."""
+    if isinstance(error, CircuitOpenError) or not isinstance(error, requests.exceptions.RequestException):
+        return False
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return True
+
+
+class _CancelSignal:
+    """`is_set()` vrai quand l'appelant (mode batch) ou la course (tentative perdante) annule la tentative."""
+
+    def __init__(self, outer=None):
+        self.outer = outer
+        self.event = threading.Event()
+
+    def is_set(self):
+        return self.event.is_set() or (self.outer is not None and self.outer.is_set())
+
+
+class _Race:
+    """Tentatives concurrentes d'un même appel : la première à répondre l'emporte."""
+
+    def __init__(self, cancel_event=None):
+        self.cancel_event = cancel_event
+        self.condition = threading.Condition()
+        self.signals = []
+        self.started = []
+        self.finished = []
+        self.results = []
+        self.errors = []
+        self.winner = None
+        self.latency = None
+
+    def launch(self, attempt):
+        with self.condition:
+            index = len(self.signals)
+            self.signals.append(_CancelSignal(self.cancel_event))
+            self.started.append(time.monotonic())
+            self.finished.append(False)
+            self.results.append(None)
+            self.errors.append(None)
+        # Contexte de l'appelant (génération en cours du registre des tokens) transmis à la tentative
+        threading.Thread(target=contextvars.copy_context().run, args=(self._run, index, attempt),
+                         name=f"hardstyle-hedge-{index}", daemon=True).start()
+
+    def claim(self, index):
+        """Déclare la tentative `index` première à répondre ; retourne False si une autre l'a devancée."""
+        with self.condition:
+            if self.winner is None:
+                self.winner = index
+                self.latency = time.monotonic() - self.started[index]
+                for other, signal in enumerate(self.signals):
+                    if other != index:
+                        signal.event.set()
+                self.condition.notify_all()
+            return self.winner == index
+
+    def _run(self, index, attempt):
+        try:
+            result = attempt(self.signals[index], lambda: self.claim(index))
+        except BaseException as e:
+            with self.condition:
+                self.errors[index] = e
+                self.finished[index] = True
+                self.condition.notify_all()
+            return
+        self.claim(index)
+        with self.condition:
+            self.results[index] = result
+            self.finished[index] = True
+            self.condition.notify_all()
+
+    def _settled(self):
+        return self.winner is not None or all(self.finished)
+
+    def wait_first(self, timeout):
+        """Attend qu'une tentative réponde ou que toutes échouent (au plus `timeout` secondes)."""
+        with self.condition:
+            return self.condition.wait_for(self._settled, timeout=timeout)
+
+    def outcome(self):
+        """(index, résultat) de la tentative gagnante une fois terminée ; sinon relève son erreur (ou la première)."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.finished[self.winner] if self.winner is not None
+                                    else all(self.finished))
+            if self.winner is None:
+                raise next(error for error in self.errors if error is not None)
+            if self.errors[self.winner] is not None:
+                raise self.errors[self.winner]
+            return self.winner, self.results[self.winner]
+
+
+class HedgedExecutor:
+    def __init__(self, store=None, breaker=None, enabled=HEDGE_REQUESTS, percentile=HEDGE_PERCENTILE,
+                 min_samples=HEDGE_MIN_SAMPLES, min_delay=HEDGE_MIN_DELAY):
+        self.store = store or LatencyStore()
+        # Un disjoncteur par modèle, sauf si un disjoncteur commun est fourni
+        self.breaker = breaker
+        self.breakers = {}
+        self._breakers_lock = threading.Lock()
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+
+    def breaker_for(self, name):
+        """Disjoncteur du modèle de l'appel `name` ("stream_ttft/<modèle>", "completion/<modèle>/<max_tokens>")."""
+        if self.breaker is not None:
+            return self.breaker
+        model = name.split("/")[1] if "/" in name else name
+        with self._breakers_lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(f"Mistral AI ({model})")
+            return self.breakers[model]
+
+    def hedge_delay(self, name):
+        """Délai avant d'envoyer une copie de l'appel `name` (None : pas de copie)."""
+        histogram = self.store.get(name)
+        if not self.enabled or histogram.total < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.quantile(self.percentile))
+
+    def call(self, name, attempt, cancel_event=None):
+        """
+        Exécute `attempt(cancel, claim)` avec au plus une copie. `cancel.is_set()` signale une
+        tentative annulée ; `claim()` (appelé au premier fragment d'un flux) retourne False si
+        l'autre tentative a répondu d'abord. Sans appel à `claim()`, la réponse complète compte.
+        """
+        breaker = self.breaker_for(name)
+        trial = breaker.before_call()
+        try:
+            return self._call(name, attempt, cancel_event, breaker)
+        finally:
+            if trial:
+                breaker.release_trial()
+
+    def _call(self, name, attempt, cancel_event, breaker):
+        delay = self.hedge_delay(name)
+        race = _Race(cancel_event)
+        with span("mistral_request", call=name) as request_span:
+            race.launch(attempt)
+            if not race.wait_first(delay) and delay is not None:
+                print(f"⚠️ Mistral AI request slower than its p{self.percentile * 100:g} ({delay:.1f}s), "
+                      f"sending a hedged copy...")
+                race.launch(attempt)
+            try:
+                winner, result = race.outcome()
+            except Exception as e:
+                # Une annulation par l'appelant (délai du mode batch) n'est pas une panne de l'endpoint
+                if is_endpoint_failure(e) and not (cancel_event is not None and cancel_event.is_set()):
+                    breaker.record_failure()
+                request_span.set(attempts=len(race.signals))
+                raise
+            breaker.record_success()
+            self.store.observe(name, race.latency)
+            request_span.set(attempts=len(race.signals), winner="hedge" if winner else "primary",
+                             latency=round(race.latency, 3), hedge_delay=delay)
+        if winner:
+            annotate(hedged=True)
+        return result
+
+
+_shared_executor = None
+_shared_lock = threading.Lock()
+
+
+def get_executor():
+    """Exécuteur partagé par les appels Mistral AI du processus (histogrammes et disjoncteurs communs)."""
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = HedgedExecutor()
+        return _shared_executor
+
+
+def completion_name(payload):
+    """Type d'appel d'une complétion non streamée : la latence dépend du modèle et de `max_tokens`."""
+    return f"completion/{payload.get('model')}/{payload.get('max_tokens')}"
+
+
+def hedged_stream_chat_completion(url, headers, payload, on_delta=None, cancel_event=None, **options):
+    """
+    `stream_chat_completion` doublé si le premier token tarde : seule la tentative qui reçoit
+    son premier fragment en premier transmet ses fragments à `on_delta`.
+    """
+    def attempt(cancel, claim):
+        def forward(delta):
+            if not claim():
+                raise StreamAborted("Hedged Mistral stream lost the race.")
+            if on_delta is not None:
+                on_delta(delta)
+        return stream_chat_completion(url, headers, payload, on_delta=forward, cancel_event=cancel, **options)
+
+    return get_executor().call(f"stream_ttft/{payload.get('model')}", attempt, cancel_event)
+
+
+def hedged_chat_completion(url, headers, payload, timeout=None):
+    """
+    `chat_completion` doublé si la réponse tarde ; retourne (contenu, finish_reason). La tentative
+    perdante n'est pas interrompue : sa réponse est ignorée.
+    """
+    content, finish_reason = get_executor().call(
+        completion_name(payload), lambda cancel, claim: chat_completion(url, headers, payload, timeout=timeout))
+    annotate(finish_reason=finish_reason, bytes=len(content))
+    return content, finish_reason
+
+
+def hedged_post(url, name, cancel_event=None, **kwargs):
+    """
+    POST doublé si la réponse tarde (complétion Mistral AI : renvoyée sur 5xx comme un appel idempotent) ;
+    une réponse 429/5xx compte comme un échec de la tentative. Comme pour `hedged_chat_completion`, la
+    tentative perdante va jusqu'au bout et sa réponse est ignorée ; `cancel_event` n'empêche que l'attente.
+    """
+    def attempt(cancel, claim):
+        response = get_client().post(url, idempotent=True, **kwargs)
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            response.raise_for_status()
+        return response
+
+    return get_executor().call(name, attempt, cancel_event)
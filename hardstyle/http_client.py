@@ -0,0 +1,214 @@
+"""Client HTTP partagé (Mistral AI + Hashnode) : connexions keep-alive, timeouts, retries et limite de débit."""
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from hardstyle.ratelimit import RATE_LIMITER, RateLimiter, estimate_tokens, parse_delay
+from hardstyle.telemetry import annotate, span
+from hardstyle.transport import Cassette, RecordingAdapter, ReplayAdapter
+
+# --- Configuration par défaut (surchargeable par variables d'environnement) ---
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "1.0"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Transport : "live" (réseau), "record" (réseau + enregistrement) ou "replay" (cassette seule)
+HTTP_TRANSPORT = os.getenv("HTTP_TRANSPORT", "live").lower()
+HTTP_CASSETTE = os.getenv("HTTP_CASSETTE", os.path.join("cassettes", "hardstyle.json"))
+
+# Statuts réessayés : 429 (requête refusée sans être traitée), 5xx pour les seuls appels idempotents
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Méthodes idempotentes par défaut ; un POST ne l'est que si l'appelant le précise (idempotent=True)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def _host_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HttpClient:
+    """
+    Session `requests` partagée avec un pool de connexions keep-alive par hôte.
+
+    Les requêtes refusées (429) ou dont la connexion n'a pas pu s'établir sont réessayées avec
+    un backoff exponentiel « full jitter » (ou le délai `Retry-After` si le serveur en fournit un).
+    Un 5xx n'est réessayé que pour un appel idempotent (`idempotent=True` : complétions Mistral AI,
+    requêtes GraphQL de lecture) : après un 502/504, une mutation de publication a peut-être abouti,
+    la renvoyer créerait un doublon (c'est l'outbox qui la reprend). `stats()` expose la
+    réutilisation des connexions par hôte.
+
+    Avec le limiteur de débit (RATE_LIMITER), chaque requête attend d'abord sa place dans le budget
+    partagé entre processus, calibré sur les en-têtes de quota ; un 429 bloque l'hôte pour tous
+    pendant son `Retry-After` et est réessayé jusqu'à RATE_LIMIT_MAX_RETRIES fois.
+    """
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 max_retries=HTTP_MAX_RETRIES, backoff_base=HTTP_BACKOFF_BASE,
+                 backoff_max=HTTP_BACKOFF_MAX, pool_maxsize=HTTP_POOL_MAXSIZE,
+                 transport=HTTP_TRANSPORT, cassette_path=HTTP_CASSETTE, rate_limit=RATE_LIMITER):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        # Les retries sont gérés ici (avec jitter), pas par urllib3
+        if transport == "replay":
+            self.adapter = ReplayAdapter(Cassette(cassette_path))
+        elif transport == "record":
+            self.adapter = RecordingAdapter(Cassette(cassette_path), pool_connections=4,
+                                            pool_maxsize=pool_maxsize, max_retries=0)
+        else:
+            self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        if transport in ("replay", "record"):
+            print(f"DEBUG: HTTP transport '{transport}' using cassette {cassette_path}.")
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        # Rejeu de cassette : aucune requête réelle, donc aucun budget à respecter
+        self.limiter = RateLimiter() if rate_limit and transport != "replay" else None
+        # Hôtes contactés (ordre de premier appel) et retries par hôte, partagés par les threads
+        self._hosts = {}
+        self._retries = {}
+        self._lock = threading.Lock()
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method, url, timeout=None, idempotent=None, **kwargs):
+        """
+        Envoie une requête via la session partagée.
+
+        `idempotent` (défaut : selon la méthode, faux pour un POST) autorise les retries sur 5xx.
+        Retourne la dernière réponse obtenue : après épuisement des retries, une réponse
+        429/5xx est renvoyée telle quelle pour que l'appelant applique `raise_for_status()`.
+        """
+        host = _host_of(url)
+        with self._lock:
+            self._hosts.setdefault(host, None)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        with span("http", method=method, host=host) as request_span:
+            response = self._send(method, url, host, timeout, idempotent, **kwargs)
+            request_span.set(status_code=response.status_code)
+            length = response.headers.get("Content-Length", "")
+            if length.isdigit():
+                request_span.set(bytes=int(length))
+            return response
+
+    def _send(self, method, url, host, timeout, idempotent, **kwargs):
+        attempt = 0
+        waited = 0.0
+        tokens = estimate_tokens(kwargs.get("json")) if self.limiter is not None else 0
+        while True:
+            if self.limiter is not None:
+                waited += self.limiter.acquire(host, tokens)
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.exceptions.ConnectTimeout:
+                # La requête n'a jamais été envoyée : on peut réessayer sans risque de doublon
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️ Connection timeout to {host}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})...")
+            else:
+                if self.limiter is not None:
+                    self.limiter.observe(host, response)
+                if response.status_code == 429 and self.limiter is not None:
+                    if attempt >= self.limiter.max_retries or waited >= self.limiter.max_wait:
+                        annotate(attempts=attempt + 1)
+                        return response
+                    # Retry-After respecté en entier (pas de plafond) et partagé : l'attente a lieu dans acquire()
+                    delay = parse_delay(response.headers.get("Retry-After"))
+                    self.limiter.block(host, self._backoff(attempt) if delay is None else delay)
+                    print(f"⚠️ {host} answered 429, waiting for the shared rate limit "
+                          f"({attempt + 1}/{self.limiter.max_retries})...")
+                    response.close()
+                    self._count_retry(host)
+                    attempt += 1
+                    continue
+                retryable = response.status_code == 429 or (idempotent and response.status_code in RETRYABLE_STATUS_CODES)
+                if not retryable or attempt >= self.max_retries:
+                    annotate(attempts=attempt + 1)
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                print(f"⚠️ {host} answered {response.status_code}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})...")
+                response.close()
+            self._count_retry(host)
+            attempt += 1
+            time.sleep(delay)
+
+    def _count_retry(self, host):
+        with self._lock:
+            self._retries[host] = self._retries.get(host, 0) + 1
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return min(self.backoff_max, max(0.0, float(value)))
+        except ValueError:
+            return None
+
+    def stats(self):
+        """
+        Compteurs par hôte : requêtes envoyées, connexions ouvertes (handshakes TCP/TLS),
+        connexions réutilisées et retries effectués.
+        """
+        with self._lock:
+            result = {host: {"requests": 0, "connections": 0, "reused": 0, "retries": self._retries.get(host, 0)}
+                      for host in self._hosts}
+        poolmanager = getattr(self.adapter, "poolmanager", None)
+        if poolmanager is None:
+            # Rejeu de cassette : aucune connexion réelle
+            return result
+        pools = poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            netloc = key.key_host if key.key_port is None else f"{key.key_host}:{key.key_port}"
+            counters = result.setdefault(f"{key.key_scheme}://{netloc}",
+                                         {"requests": 0, "connections": 0, "reused": 0, "retries": 0})
+            counters["requests"] += pool.num_requests
+            counters["connections"] += pool.num_connections
+            counters["reused"] = max(0, counters["requests"] - counters["connections"])
+        return result
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_client():
+    """Retourne le client HTTP partagé par tous les appels du processus."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
+
+
+def print_connection_stats(client=None):
+    """Affiche la réutilisation des connexions par hôte (DEBUG)."""
+    client = client or get_client()
+    for host, counters in client.stats().items():
+        print(f"DEBUG: HTTP pool {host}: {counters['requests']} request(s), "
+              f"{counters['connections']} connection(s) opened, {counters['reused']} reused, "
+              f"{counters['retries']} retry(ies).")
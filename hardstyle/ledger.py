@@ -0,0 +1,326 @@
+"""
+Registre local (SQLite, en ajout seul) des tokens consommés par chaque appel Mistral AI.
+
+Chaque appel (test d'authentification, génération streamée ou non, continuation, section d'un
+classement, traduction, copie d'une requête doublée) est enregistré avec son modèle, les tokens
+du bloc `usage` de la réponse (estimés à ~4 caractères par token quand il manque, ex. flux coupé),
+sa durée, son débit en tokens/s et son coût d'après MISTRAL_PRICES. Les appels d'une même
+génération (repli de modèle, réparation de longueur, sections parallèles) partagent un
+identifiant, propagé aux threads par `contextvars`.
+
+`hardstyle_usage.py report` rapproche ces coûts des articles publiés (outbox) ;
+`hardstyle_usage.py check` compare les derniers débits et tokens par génération à une base
+glissante et signale les régressions.
+
+    MISTRAL_PRICES=mistral-small-latest:0.2/0.6,...    # $ par million de tokens (entrée/sortie)
+"""
+import contextvars
+import os
+import sqlite3
+import statistics
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from hardstyle.continuation import CHARS_PER_TOKEN
+from hardstyle.storage import state_path
+from hardstyle.telemetry import get_tracer
+
+
+def parse_prices(value):
+    """"modèle:entrée/sortie,..." -> {modèle: (entrée, sortie)} en $ par million de tokens."""
+    prices = {}
+    for item in value.split(","):
+        model, _, price = item.strip().partition(":")
+        prompt, _, completion = price.partition("/")
+        try:
+            prices[model.strip()] = (float(prompt), float(completion or prompt))
+        except ValueError:
+            continue
+    return prices
+
+
+USAGE_LEDGER = os.getenv("USAGE_LEDGER", "true").lower() not in ("0", "false", "no")
+MISTRAL_PRICES = parse_prices(os.getenv(
+    "MISTRAL_PRICES",
+    "mistral-tiny:0.25/0.25,mistral-small-latest:0.2/0.6,mistral-medium-latest:0.4/2,mistral-large-latest:2/6"))
+# Régressions : médiane des LEDGER_RECENT dernières mesures comparée à celle des LEDGER_BASELINE précédentes
+LEDGER_RECENT = int(os.getenv("LEDGER_RECENT", "5"))
+LEDGER_BASELINE = int(os.getenv("LEDGER_BASELINE", "30"))
+LEDGER_REGRESSION_THRESHOLD = float(os.getenv("LEDGER_REGRESSION_THRESHOLD", "0.25"))
+
+GENERATION_OPERATIONS = ("stream", "completion")
+
+_generation = contextvars.ContextVar("hardstyle_generation", default=None)
+
+
+@contextmanager
+def generation(job):
+    """Rattache les appels Mistral du bloc (et des threads lancés avec son contexte) à une génération de `job`."""
+    generation_id = uuid.uuid4().hex[:12]
+    token = _generation.set((job, generation_id))
+    try:
+        yield generation_id
+    finally:
+        _generation.reset(token)
+
+
+def current_generation():
+    """(job, identifiant) de la génération en cours, ou None."""
+    return _generation.get()
+
+
+def call_cost(model, prompt_tokens, completion_tokens, prices=None):
+    """Coût en $ d'un appel (None si le prix du modèle est inconnu)."""
+    price = (MISTRAL_PRICES if prices is None else prices).get(model)
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6
+
+
+def _estimate_prompt_tokens(payload):
+    messages = payload.get("messages") or []
+    return round(sum(len(str(message.get("content") or "")) for message in messages) / CHARS_PER_TOKEN)
+
+
+def _median(values):
+    return statistics.median(values) if values else None
+
+
+class UsageLedger:
+    def __init__(self, path=None):
+        self.path = path or state_path("usage_ledger.sqlite3")
+        # Une connexion pour tous les threads du processus (appels doublés, sections parallèles)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS calls (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                at REAL NOT NULL,
+                run_id TEXT,
+                job TEXT NOT NULL,
+                generation TEXT,
+                operation TEXT NOT NULL,
+                model TEXT,
+                status TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                estimated INTEGER NOT NULL DEFAULT 0,
+                seconds REAL NOT NULL,
+                tokens_per_second REAL,
+                finish_reason TEXT,
+                cost REAL
+            );
+            CREATE INDEX IF NOT EXISTS calls_job ON calls (job, at);
+            CREATE INDEX IF NOT EXISTS calls_generation ON calls (generation);
+            CREATE INDEX IF NOT EXISTS calls_series ON calls (job, model, operation);
+            CREATE TRIGGER IF NOT EXISTS calls_no_update BEFORE UPDATE ON calls
+                BEGIN SELECT RAISE(ABORT, 'the usage ledger is append-only'); END;
+            CREATE TRIGGER IF NOT EXISTS calls_no_delete BEFORE DELETE ON calls
+                BEGIN SELECT RAISE(ABORT, 'the usage ledger is append-only'); END;"""
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def record(self, job, operation, model, prompt_tokens, completion_tokens, seconds, status="ok",
+               finish_reason=None, estimated=False, generation_id=None, run_id=None):
+        tokens_per_second = completion_tokens / seconds if seconds > 0 and completion_tokens else None
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO calls (at, run_id, job, generation, operation, model, status, prompt_tokens, "
+                "completion_tokens, estimated, seconds, tokens_per_second, finish_reason, cost) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), run_id, job, generation_id, operation, model, status, prompt_tokens,
+                 completion_tokens, int(estimated), seconds, tokens_per_second, finish_reason,
+                 call_cost(model, prompt_tokens, completion_tokens)),
+            )
+
+    def calls(self, since=0.0, job=None):
+        query = "SELECT * FROM calls WHERE at >= ?" + (" AND job = ?" if job else "") + " ORDER BY id"
+        return self.conn.execute(query, (since, job) if job else (since,)).fetchall()
+
+    def report(self, since=0.0, job=None, outbox_path=None):
+        """
+        Par job, puis par modèle : appels, générations, tokens, coût, débit médian ; pour le job, le coût
+        moyen d'une génération (ses seuls appels) et le coût par article publié (tous ses appels, générations écartées et tests compris, rapportés aux
+        articles publiés depuis `since` d'après l'outbox).
+        """
+        published = published_articles(since, outbox_path)
+        jobs = {}
+        for row in self.calls(since, job):
+            entry = jobs.setdefault(row["job"], {"calls": 0, "generations": set(), "prompt_tokens": 0,
+                                                 "completion_tokens": 0, "cost": 0.0, "generation_cost": 0.0,
+                                                 "unpriced": 0, "models": {}})
+            model = entry["models"].setdefault(row["model"], {"calls": 0, "prompt_tokens": 0,
+                                                              "completion_tokens": 0, "cost": 0.0, "speeds": []})
+            for target in (entry, model):
+                target["calls"] += 1
+                target["prompt_tokens"] += row["prompt_tokens"]
+                target["completion_tokens"] += row["completion_tokens"]
+                target["cost"] += row["cost"] or 0.0
+            entry["unpriced"] += row["cost"] is None
+            if row["generation"]:
+                entry["generations"].add(row["generation"])
+                entry["generation_cost"] += row["cost"] or 0.0
+            if row["status"] == "ok" and row["operation"] in GENERATION_OPERATIONS and row["tokens_per_second"]:
+                model["speeds"].append(row["tokens_per_second"])
+        for name, entry in jobs.items():
+            entry["generations"] = len(entry["generations"])
+            entry["published"] = published.get(name, 0)
+            generations = entry["generations"]
+            entry["cost_per_generation"] = entry.pop("generation_cost") / generations if generations else None
+            entry["cost_per_article"] = entry["cost"] / entry["published"] if entry["published"] else None
+            for model in entry["models"].values():
+                model["tokens_per_second"] = _median(model.pop("speeds"))
+        return jobs
+
+    def regressions(self, job=None, recent=LEDGER_RECENT, baseline=LEDGER_BASELINE,
+                    threshold=LEDGER_REGRESSION_THRESHOLD):
+        """
+        Régressions des dernières mesures par rapport à la base glissante qui les précède :
+        débit (tokens/s) des appels de génération par job, modèle et type d'appel, en baisse de plus
+        de `threshold` ; tokens consommés par génération, par job, en hausse de plus de `threshold`.
+        Seules les `recent + baseline` dernières mesures de chaque série sont lues.
+        """
+        limit = recent + baseline
+        series = {}
+        jobs = [job] if job else [row["job"] for row in self.conn.execute("SELECT DISTINCT job FROM calls")]
+        for name in jobs:
+            groups = self.conn.execute(
+                "SELECT DISTINCT model, operation FROM calls WHERE job = ? AND generation IS NOT NULL", (name,)
+            ).fetchall()
+            for group in groups:
+                # Index (job, model, operation) : parcours à rebours arrêté après `limit` mesures
+                rows = self.conn.execute(
+                    "SELECT tokens_per_second FROM calls WHERE job = ? AND model IS ? AND operation = ? "
+                    "AND generation IS NOT NULL AND status = 'ok' AND tokens_per_second > 0 AND estimated = 0 "
+                    "ORDER BY id DESC LIMIT ?",
+                    (name, group["model"], group["operation"], limit),
+                ).fetchall()
+                if rows:
+                    series[("throughput", name, f"{group['model']} {group['operation']}")] = [
+                        row["tokens_per_second"] for row in reversed(rows)]
+            generations = self._recent_generations(name, limit)
+            if generations:
+                # Les générations dans l'ordre de leur premier appel
+                rows = self.conn.execute(
+                    f"SELECT SUM(prompt_tokens + completion_tokens) AS tokens FROM calls "
+                    f"WHERE generation IN ({', '.join('?' * len(generations))}) GROUP BY generation ORDER BY MIN(id)",
+                    generations,
+                ).fetchall()
+                series[("tokens_per_generation", name, None)] = [row["tokens"] for row in rows]
+
+        findings = []
+        for (metric, name, scope), values in series.items():
+            if len(values) < recent * 2:
+                continue
+            current = _median(values[-recent:])
+            reference = _median(values[-recent - baseline:-recent])
+            if not reference:
+                continue
+            change = current / reference - 1
+            # Un débit qui baisse ou une consommation qui augmente
+            worse = -change if metric == "throughput" else change
+            if worse > threshold:
+                findings.append({"job": name, "metric": metric, "scope": scope, "baseline": reference,
+                                 "recent": current, "change": change})
+        return findings
+
+    def _recent_generations(self, job, limit):
+        """Identifiants des `limit` dernières générations de `job` (index (job, at), parcours à rebours)."""
+        generations = []
+        cursor = self.conn.execute(
+            "SELECT generation FROM calls WHERE job = ? AND generation IS NOT NULL ORDER BY at DESC, id DESC", (job,))
+        for row in cursor:
+            if row["generation"] not in generations:
+                generations.append(row["generation"])
+                if len(generations) == limit:
+                    break
+        cursor.close()
+        return generations
+
+    def close(self):
+        self.conn.close()
+
+
+def published_articles(since=0.0, outbox_path=None):
+    """Articles publiés depuis `since` par job d'après l'outbox (le backfill compte pour son bot)."""
+    path = outbox_path or state_path("outbox.sqlite3")
+    if not os.path.exists(path):
+        return {}
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT bot, COUNT(*) FROM articles WHERE state = 'published' AND updated_at >= ? GROUP BY bot",
+            (since,),
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+    counts = {}
+    for bot, count in rows:
+        # Les variantes traduites ("daily/fr") ne sont pas des articles générés
+        if "/" not in bot:
+            job = bot[len("backfill-"):] if bot.startswith("backfill-") else bot
+            counts[job] = counts.get(job, 0) + count
+    return counts
+
+
+_shared_ledger = None
+_shared_lock = threading.Lock()
+
+
+def get_ledger():
+    """Registre partagé par les appels du processus."""
+    global _shared_ledger
+    with _shared_lock:
+        if _shared_ledger is None:
+            _shared_ledger = UsageLedger()
+        return _shared_ledger
+
+
+def record_call(operation, payload, usage=None, seconds=0.0, text="", finish_reason=None, status="ok", job=None):
+    """
+    Enregistre un appel Mistral AI de requête `payload` : `usage` est le bloc de la réponse
+    (tokens estimés d'après le prompt et `text` s'il manque). Sans `job`, l'appel est attribué
+    à la génération en cours, sinon au bot de l'exécution. Une erreur du registre n'interrompt jamais l'appel.
+    """
+    if not USAGE_LEDGER:
+        return
+    scope = current_generation()
+    job = job or (scope[0] if scope else get_tracer().context.get("bot", "unknown"))
+    usage = usage or {}
+    estimated = not usage
+    prompt_tokens = int(usage.get("prompt_tokens") or (_estimate_prompt_tokens(payload) if estimated else 0))
+    completion_tokens = int(usage.get("completion_tokens") or (round(len(text) / CHARS_PER_TOKEN) if estimated else 0))
+    try:
+        get_ledger().record(job, operation, payload.get("model"), prompt_tokens, completion_tokens, seconds,
+                            status=status, finish_reason=finish_reason, estimated=estimated,
+                            generation_id=scope[1] if scope else None, run_id=get_tracer().run_id)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not record Mistral usage in the ledger : {e}")
+
+
+def warn_regressions(job=None):
+    """Affiche les régressions de débit ou de consommation de tokens (fin d'exécution d'un bot)."""
+    if not USAGE_LEDGER:
+        return []
+    try:
+        findings = get_ledger().regressions(job)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not read the usage ledger : {e}")
+        return []
+    for finding in findings:
+        print(f"⚠️ {describe_regression(finding)}")
+    return findings
+
+
+def describe_regression(finding):
+    if finding["metric"] == "throughput":
+        return (f"Throughput regression for {finding['job']} ({finding['scope']}): "
+                f"{finding['recent']:.1f} tokens/s vs {finding['baseline']:.1f} baseline ({finding['change']:+.0%}).")
+    return (f"Token efficiency regression for {finding['job']}: {finding['recent']:.0f} tokens per generation "
+            f"vs {finding['baseline']:.0f} baseline ({finding['change']:+.0%}).")
@@ -0,0 +1,264 @@
+"""
+Miroir local (SQLite) des posts déjà publiés sur la publication Hashnode.
+
+La première synchronisation parcourt toute la publication page par page ; le curseur est
+enregistré après chaque page, une synchronisation interrompue reprend donc où elle s'est arrêtée.
+Les suivantes sont incrémentales : une sonde légère (identifiants et dates des derniers posts)
+suffit quand rien n'a changé, sinon les pages sont relues jusqu'à avoir repris tous les posts que la
+sonde signale (nouveaux ou modifiés) et atteint un post connu et inchangé. Une synchronisation complète (`full=True`) reprend aussi les modifications de posts
+anciens et retire les posts supprimés.
+
+Les posts sont indexés par slug, par tag et par artiste mentionné (noms du roster, repérés en une
+passe par `EntityMatcher`).
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+from hardstyle.entities import EntityMatcher
+from hardstyle.hashnode import fetch_publication_posts
+from hardstyle.roster import normalize_name
+from hardstyle.storage import state_path
+from hardstyle.telemetry import span
+
+HASHNODE_SYNC_PAGE_SIZE = int(os.getenv("HASHNODE_SYNC_PAGE_SIZE", "20"))
+# Nombre de posts récents vérifiés par la sonde d'une synchronisation incrémentale
+HASHNODE_SYNC_PROBE_SIZE = int(os.getenv("HASHNODE_SYNC_PROBE_SIZE", "10"))
+
+# Version de la détection des mentions : un changement réindexe les mentions déjà enregistrées
+MENTIONS_SCHEME = "aho-corasick-folded"
+
+
+def find_post_by_title(url, headers, publication_id, title, artists=(), client=None, path=None):
+    """
+    URL du dernier post de la publication intitulé `title`, après une synchronisation du miroir
+    (incrémentale : une requête quand rien n'a changé), ou None. Sert à vérifier qu'un article dont
+    la publication a échoué n'a pas été créé malgré tout avant de le renvoyer.
+    """
+    mirror = HashnodeMirror(path, artists=artists)
+    try:
+        mirror.sync(url, headers, publication_id, client=client)
+        row = mirror.by_title(title)
+        return row["url"] if row is not None else None
+    finally:
+        mirror.close()
+
+
+def internal_links(path=None):
+    """URL du dernier post du miroir qui mentionne chaque artiste (nom normalisé -> URL), vide sans miroir."""
+    path = path or state_path("hashnode_mirror.sqlite3")
+    if not os.path.exists(path):
+        return {}
+    mirror = HashnodeMirror(path)
+    try:
+        return mirror.latest_urls()
+    finally:
+        mirror.close()
+
+
+class HashnodeMirror:
+    def __init__(self, path=None, artists=()):
+        self.path = path or state_path("hashnode_mirror.sqlite3")
+        self.artists = {normalize_name(name): name for name in artists}
+        self.matcher = EntityMatcher(artists)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS posts (
+                id TEXT PRIMARY KEY,
+                slug TEXT NOT NULL,
+                title TEXT,
+                url TEXT,
+                published_at TEXT,
+                updated_at TEXT,
+                markdown TEXT,
+                seen_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS posts_slug ON posts (slug);
+            CREATE INDEX IF NOT EXISTS posts_published ON posts (published_at);
+            CREATE TABLE IF NOT EXISTS post_tags (
+                tag TEXT NOT NULL, post_id TEXT NOT NULL, name TEXT, PRIMARY KEY (tag, post_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS post_artists (
+                artist TEXT NOT NULL, post_id TEXT NOT NULL, PRIMARY KEY (artist, post_id)
+            ) WITHOUT ROWID;"""
+        )
+        self.conn.commit()
+        # Roster modifié depuis la dernière indexation : les mentions sont recalculées
+        fingerprint = hashlib.sha256("\n".join([MENTIONS_SCHEME, *sorted(self.artists)]).encode("utf-8")).hexdigest()
+        if self.artists and self._meta("artists_fingerprint") != fingerprint:
+            self.reindex_artists()
+            with self.conn:
+                self._set_meta(artists_fingerprint=fingerprint)
+
+    # --- État de synchronisation ---
+    def _meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row is not None else default
+
+    def _set_meta(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                              [(key, None if value is None else str(value)) for key, value in values.items()])
+
+    def _is_current(self, post):
+        row = self.conn.execute("SELECT updated_at, published_at FROM posts WHERE id = ?", (post["id"],)).fetchone()
+        return row is not None and (row["updated_at"], row["published_at"]) == (post.get("updatedAt"),
+                                                                                 post.get("publishedAt"))
+
+    def _upsert(self, post, seen_at):
+        markdown = (post.get("content") or {}).get("markdown") or ""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO posts (id, slug, title, url, published_at, updated_at, markdown, seen_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (post["id"], post["slug"], post.get("title"), post.get("url"), post.get("publishedAt"),
+             post.get("updatedAt"), markdown, seen_at),
+        )
+        self.conn.execute("DELETE FROM post_tags WHERE post_id = ?", (post["id"],))
+        self.conn.executemany("INSERT OR IGNORE INTO post_tags (tag, post_id, name) VALUES (?, ?, ?)",
+                              [(tag["slug"], post["id"], tag.get("name")) for tag in post.get("tags") or []])
+        self.conn.execute("DELETE FROM post_artists WHERE post_id = ?", (post["id"],))
+        self.conn.executemany("INSERT INTO post_artists (artist, post_id) VALUES (?, ?)",
+                              [(artist, post["id"]) for artist in self._mentions(markdown)])
+
+    def _mentions(self, markdown):
+        """Artistes (noms normalisés) mentionnés dans le post."""
+        return {normalize_name(name) for name in self.matcher.mentions(markdown)}
+
+    def _mark_seen(self, post_id, seen_at):
+        self.conn.execute("UPDATE posts SET seen_at = ? WHERE id = ?", (seen_at, post_id))
+
+    # --- Synchronisation ---
+    def sync(self, url, headers, publication_id, full=False, client=None,
+             page_size=HASHNODE_SYNC_PAGE_SIZE, probe_size=HASHNODE_SYNC_PROBE_SIZE):
+        """
+        Met le miroir à jour ; retourne {"mode", "requests", "updated", "removed"}.
+        Synchronisation complète si demandée, jamais terminée, ou faite pour une autre publication.
+        """
+        if self._meta("publication_id") != publication_id:
+            self._reset(publication_id)
+        if full or self._meta("full_sync_complete") != "1":
+            mode, result = "full", self._full_sync(url, headers, publication_id, client, page_size)
+        else:
+            mode, result = "incremental", self._incremental_sync(url, headers, publication_id, client,
+                                                                 page_size, probe_size)
+        with self.conn:
+            self._set_meta(last_sync_at=time.time())
+        result["mode"] = mode
+        print(f"DEBUG: Hashnode mirror {mode} sync: {result['updated']} post(s) updated, "
+              f"{result['removed']} removed, {result['requests']} request(s), {len(self)} post(s) mirrored.")
+        return result
+
+    def _reset(self, publication_id):
+        with self.conn:
+            for table in ("posts", "post_tags", "post_artists"):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.execute("DELETE FROM meta WHERE key != 'artists_fingerprint'")
+            self._set_meta(publication_id=publication_id)
+
+    def _full_sync(self, url, headers, publication_id, client, page_size):
+        # Reprise d'une synchronisation complète interrompue : même horodatage, curseur enregistré
+        started = float(self._meta("full_sync_started") or time.time())
+        cursor = self._meta("full_sync_cursor")
+        with self.conn:
+            self._set_meta(full_sync_started=started, full_sync_complete=0)
+        requests_made = updated = 0
+        with span("mirror_sync", mode="full", resumed=cursor is not None) as sync_span:
+            while True:
+                posts, cursor = fetch_publication_posts(url, headers, publication_id, page_size, cursor, client=client)
+                requests_made += 1
+                with self.conn:
+                    for post in posts:
+                        if self._is_current(post):
+                            self._mark_seen(post["id"], started)
+                        else:
+                            self._upsert(post, started)
+                            updated += 1
+                    self._set_meta(full_sync_cursor=cursor)
+                if cursor is None:
+                    break
+            with self.conn:
+                # Posts absents de la publication (supprimés sur Hashnode)
+                removed = [row["id"] for row in self.conn.execute("SELECT id FROM posts WHERE seen_at < ?", (started,))]
+                for post_id in removed:
+                    for table, column in (("posts", "id"), ("post_tags", "post_id"), ("post_artists", "post_id")):
+                        self.conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (post_id,))
+                self._set_meta(full_sync_complete=1, full_sync_started=None, full_sync_cursor=None)
+            sync_span.set(requests=requests_made, updated=updated, removed=len(removed))
+        return {"requests": requests_made, "updated": updated, "removed": len(removed)}
+
+    def _incremental_sync(self, url, headers, publication_id, client, page_size, probe_size):
+        now = time.time()
+        with span("mirror_sync", mode="incremental") as sync_span:
+            stamps, _ = fetch_publication_posts(url, headers, publication_id, probe_size, stamps_only=True,
+                                                client=client)
+            requests_made, updated = 1, 0
+            stale = {post["id"] for post in stamps if not self._is_current(post)}
+            if stale:
+                # Nouveaux posts ou récents modifiés, pas forcément en tête : pages complètes jusqu'à
+                # les avoir tous repris et atteint un post connu et inchangé
+                cursor = None
+                while True:
+                    posts, cursor = fetch_publication_posts(url, headers, publication_id, page_size, cursor,
+                                                            client=client)
+                    requests_made += 1
+                    reached_known = False
+                    with self.conn:
+                        for post in posts:
+                            stale.discard(post["id"])
+                            if self._is_current(post):
+                                reached_known = True
+                            else:
+                                self._upsert(post, now)
+                                updated += 1
+                    if cursor is None or (reached_known and not stale):
+                        break
+            sync_span.set(requests=requests_made, updated=updated)
+        return {"requests": requests_made, "updated": updated, "removed": 0}
+
+    # --- Consultation ---
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def by_slug(self, slug):
+        return self.conn.execute("SELECT * FROM posts WHERE slug = ?", (slug,)).fetchone()
+
+    def by_title(self, title):
+        """Post le plus récent intitulé `title` (espaces superflus ignorés), ou None."""
+        return self.conn.execute("SELECT * FROM posts WHERE TRIM(title) = ? ORDER BY published_at DESC LIMIT 1",
+                                 (" ".join(title.split()),)).fetchone()
+
+    def by_tag(self, tag_slug):
+        """Posts portant le tag `tag_slug`, du plus récent au plus ancien."""
+        return self.conn.execute(
+            "SELECT p.* FROM post_tags t JOIN posts p ON p.id = t.post_id WHERE t.tag = ? "
+            "ORDER BY p.published_at DESC", (tag_slug,)).fetchall()
+
+    def mentioning(self, artist):
+        """Posts qui mentionnent `artist` (nom du roster), du plus récent au plus ancien."""
+        return self.conn.execute(
+            "SELECT p.* FROM post_artists a JOIN posts p ON p.id = a.post_id WHERE a.artist = ? "
+            "ORDER BY p.published_at DESC", (normalize_name(artist),)).fetchall()
+
+    def latest(self, limit=10):
+        return self.conn.execute("SELECT * FROM posts ORDER BY published_at DESC LIMIT ?", (limit,)).fetchall()
+
+    def latest_urls(self):
+        """URL du post le plus récent qui mentionne chaque artiste : {nom normalisé: URL}."""
+        rows = self.conn.execute(
+            "SELECT a.artist, p.url, MAX(p.published_at) FROM post_artists a JOIN posts p ON p.id = a.post_id "
+            "WHERE p.url IS NOT NULL GROUP BY a.artist").fetchall()
+        return {row["artist"]: row["url"] for row in rows}
+
+    def reindex_artists(self):
+        """Recalcule les mentions d'artistes de tous les posts (après une modification du roster)."""
+        with self.conn:
+            self.conn.execute("DELETE FROM post_artists")
+            for row in self.conn.execute("SELECT id, markdown FROM posts").fetchall():
+                self.conn.executemany("INSERT INTO post_artists (artist, post_id) VALUES (?, ?)",
+                                      [(artist, row["id"]) for artist in self._mentions(row["markdown"])])
+
+    def close(self):
+        self.conn.close()
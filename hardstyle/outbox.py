@@ -0,0 +1,229 @@
+"""
+Outbox locale (SQLite) des articles générés, écrite avant toute publication Hashnode.
+
+Chaque article nettoyé est enregistré avec l'empreinte SHA-256 de son contenu et un état
+`generated` → `publishing` → `published`. Une publication ratée laisse l'article en attente :
+l'exécution suivante le republie au lieu de payer une nouvelle génération, et l'empreinte
+empêche de publier deux fois le même contenu. Après OUTBOX_MAX_ATTEMPTS échecs, l'article passe
+à l'état `failed` : il reste dans l'outbox mais n'est plus repris, pour ne pas bloquer le bot.
+
+Un article déjà tenté (interrompu pendant l'appel Hashnode, ou en échec après un 502/504) a peut-être
+été publié : avec `lookup(content)`, il est d'abord recherché sur la publication avant d'être renvoyé.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+
+from hardstyle.storage import state_path
+
+GENERATED = "generated"
+PUBLISHING = "publishing"
+PUBLISHED = "published"
+FAILED = "failed"
+
+# Tentatives de publication d'un article avant son passage à l'état `failed`
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class Outbox:
+    def __init__(self, path=None, max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.path = path or state_path("outbox.sqlite3")
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL : une écriture validée survit à un crash du processus juste après
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS articles (
+                content_hash TEXT PRIMARY KEY,
+                bot TEXT NOT NULL,
+                content TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                post_url TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS articles_pending ON articles (bot, state, created_at)")
+        self.conn.commit()
+
+    def add(self, bot, content):
+        """Enregistre un article (état `generated`) et retourne son empreinte ; sans effet s'il est déjà connu."""
+        digest = content_hash(content)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO articles (content_hash, bot, content, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, bot, content, GENERATED, now, now),
+            )
+        return digest
+
+    def get(self, digest):
+        return self.conn.execute("SELECT * FROM articles WHERE content_hash = ?", (digest,)).fetchone()
+
+    def pending(self, bot):
+        """Articles de `bot` à publier (ni publiés ni abandonnés), du plus ancien au plus récent."""
+        return self.conn.execute(
+            "SELECT * FROM articles WHERE bot = ? AND state NOT IN (?, ?) ORDER BY created_at",
+            (bot, PUBLISHED, FAILED),
+        ).fetchall()
+
+    def failed(self, bot):
+        """Articles de `bot` abandonnés après OUTBOX_MAX_ATTEMPTS échecs de publication."""
+        return self.conn.execute(
+            "SELECT * FROM articles WHERE bot = ? AND state = ? ORDER BY created_at", (bot, FAILED)
+        ).fetchall()
+
+    def requeue(self, digest):
+        """Remet un article abandonné en attente, avec un nouveau quota de tentatives."""
+        with self.conn:
+            self.conn.execute("UPDATE articles SET state = ?, attempts = 0, updated_at = ? WHERE content_hash = ?",
+                              (GENERATED, time.time(), digest))
+
+    def _set_state(self, digest, state, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        query = f"UPDATE articles SET state = ?, updated_at = ?{', ' + assignments if assignments else ''} WHERE content_hash = ?"
+        with self.conn:
+            self.conn.execute(query, (state, time.time(), *fields.values(), digest))
+
+    def mark_publishing(self, digest):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE articles SET state = ?, attempts = attempts + 1, updated_at = ? WHERE content_hash = ?",
+                (PUBLISHING, time.time(), digest),
+            )
+
+    def mark_published(self, digest, post_url):
+        self._set_state(digest, PUBLISHED, post_url=post_url, last_error=None)
+
+    def mark_failed(self, digest, error):
+        """Remet l'article en attente, ou l'abandonne (`failed`) s'il a épuisé ses tentatives ; retourne son état."""
+        entry = self.get(digest)
+        state = FAILED if entry is not None and entry["attempts"] >= self.max_attempts else GENERATED
+        self._set_state(digest, state, last_error=str(error))
+        if state == FAILED:
+            print(f"⚠️ Article {digest[:12]} abandoned after {entry['attempts']} failed publication attempt(s): "
+                  f"it stays in the outbox (state '{FAILED}') but is no longer retried. Last error: {error}")
+        return state
+
+    def close(self):
+        self.conn.close()
+
+
+def find_existing(outbox, entry, lookup):
+    """
+    Pour un article déjà tenté, URL du post retrouvé par `lookup(content)` (il est alors marqué publié),
+    sinon None. Une recherche impossible n'empêche pas le renvoi.
+    """
+    if lookup is None or not entry["attempts"]:
+        return None
+    digest = entry["content_hash"]
+    try:
+        post_url = lookup(entry["content"])
+    except Exception as e:
+        print(f"⚠️ Could not check whether article {digest[:12]} is already on Hashnode ({e}), resending it.")
+        return None
+    if post_url:
+        print(f"✅ Article {digest[:12]} (state: {entry['state']}) is already on Hashnode at {post_url}, not resending.")
+        outbox.mark_published(digest, post_url)
+    return post_url
+
+
+def publish_entry(outbox, digest, publish, lookup=None):
+    """
+    Publie l'article `digest` de l'outbox avec `publish(content)` (qui retourne l'URL du post).
+    Un article déjà publié n'est pas renvoyé, ni un article déjà tenté que `lookup` retrouve ;
+    un échec le remet en attente (ou l'abandonne après OUTBOX_MAX_ATTEMPTS échecs) puis relève l'erreur.
+    """
+    entry = outbox.get(digest)
+    if entry["state"] == PUBLISHED:
+        print(f"✅ Article {digest[:12]} already published at {entry['post_url']}, skipping.")
+        return entry["post_url"]
+    post_url = find_existing(outbox, entry, lookup)
+    if post_url:
+        return post_url
+    if entry["state"] == PUBLISHING:
+        # Exécution précédente interrompue pendant l'appel Hashnode : le post a peut-être été créé
+        print(f"⚠️ Article {digest[:12]} was interrupted while publishing, retrying.")
+    outbox.mark_publishing(digest)
+    try:
+        post_url = publish(entry["content"])
+    except Exception as e:
+        if outbox.mark_failed(digest, e) != FAILED:
+            print(f"DEBUG: Article {digest[:12]} kept in outbox for the next run (attempt {entry['attempts'] + 1}).")
+        raise
+    outbox.mark_published(digest, post_url)
+    return post_url
+
+
+def publish_entries(outbox, digests, publish_many, lookup=None):
+    """
+    Publie plusieurs articles de l'outbox en un appel `publish_many(contents)`, qui retourne pour
+    chaque contenu l'URL du post ou l'exception de son échec. Chaque article est marqué
+    individuellement ; la première erreur est relevée une fois tout le lot enregistré.
+    """
+    entries = [outbox.get(digest) for digest in digests]
+    todo, seen, found = [], set(), {}
+    for entry in entries:
+        if entry["state"] == PUBLISHED:
+            print(f"✅ Article {entry['content_hash'][:12]} already published at {entry['post_url']}, skipping.")
+        elif entry["content_hash"] not in seen:
+            seen.add(entry["content_hash"])
+            post_url = find_existing(outbox, entry, lookup)
+            if post_url:
+                found[entry["content_hash"]] = post_url
+            else:
+                todo.append(entry)
+    for entry in todo:
+        outbox.mark_publishing(entry["content_hash"])
+    try:
+        results = publish_many([entry["content"] for entry in todo]) if todo else []
+    except Exception as e:
+        for entry in todo:
+            outbox.mark_failed(entry["content_hash"], e)
+        raise
+
+    urls = {entry["content_hash"]: entry["post_url"] for entry in entries if entry["state"] == PUBLISHED}
+    urls.update(found)
+    errors = []
+    for entry, result in zip(todo, results):
+        if isinstance(result, Exception):
+            if outbox.mark_failed(entry["content_hash"], result) != FAILED:
+                print(f"DEBUG: Article {entry['content_hash'][:12]} kept in outbox for the next run "
+                      f"(attempt {entry['attempts'] + 1}).")
+            errors.append(result)
+        else:
+            outbox.mark_published(entry["content_hash"], result)
+            urls[entry["content_hash"]] = result
+    if errors:
+        raise errors[0]
+    return [urls[digest] for digest in digests]
+
+
+def publish_pending(outbox, bot, publish, publish_many=None, lookup=None):
+    """
+    Republie les articles en attente de `bot` ; retourne le nombre d'articles publiés.
+    Avec `publish_many`, plusieurs articles en attente partent en un seul lot. Les articles
+    abandonnés (`failed`) sont seulement signalés.
+    """
+    failed = outbox.failed(bot)
+    if failed:
+        print(f"⚠️ {len(failed)} {bot} article(s) abandoned after {outbox.max_attempts} failed publication "
+              f"attempts are kept in the outbox (state '{FAILED}') and no longer retried.")
+    pending = outbox.pending(bot)
+    for entry in pending:
+        print(f"\n📬 Resuming article {entry['content_hash'][:12]} from outbox (state: {entry['state']}, "
+              f"attempts: {entry['attempts']}, last error: {entry['last_error']}).")
+        if publish_many is None or len(pending) == 1:
+            publish_entry(outbox, entry["content_hash"], publish, lookup)
+    if publish_many is not None and len(pending) > 1:
+        publish_entries(outbox, [entry["content_hash"] for entry in pending], publish_many, lookup)
+    return len(pending)
@@ -0,0 +1,133 @@
+"""
+Génération en deux temps des articles longs : un appel court produit le plan (titre + ordre du
+classement), puis chaque entrée est développée par un appel distinct, en parallèle, et les
+sections sont assemblées dans l'ordre du plan.
+
+La latence totale devient celle de la section la plus lente au lieu de celle de l'article
+entier, et chaque section dispose de son propre budget de tokens : les dernières entrées ne
+sont plus tronquées par le `max_tokens` d'une réponse unique.
+"""
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from hardstyle.streaming import StreamAborted
+from hardstyle.telemetry import span
+
+
+class OutlineError(ValueError):
+    """Plan inutilisable (JSON invalide, titre absent, artiste obligatoire manquant...)."""
+
+
+def parse_outline(text, required_artists=(), max_entries=15, min_entries=3):
+    """
+    Lit le plan JSON renvoyé par le modèle : {"title": ..., "ranking": [{"rank", "artist", "angle"}]}.
+
+    Le JSON peut être entouré de texte ou d'une clôture ```json. Les doublons sont retirés, les
+    rangs renumérotés de 1 à N dans l'ordre du classement, et chaque artiste de
+    `required_artists` doit figurer dans les `max_entries` premières entrées.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise OutlineError("no JSON object in the outline response")
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError as e:
+        raise OutlineError(f"invalid outline JSON ({e})")
+    if not isinstance(data, dict):
+        raise OutlineError("outline JSON is not an object")
+    title = str(data.get("title") or "").strip().lstrip("#").strip()
+    if not title:
+        raise OutlineError("outline has no title")
+
+    items = [item for item in data.get("ranking") or [] if isinstance(item, dict)]
+    if all(isinstance(item.get("rank"), int) for item in items):
+        items.sort(key=lambda item: item["rank"])
+    entries = []
+    seen = set()
+    for item in items:
+        artist = " ".join(str(item.get("artist") or "").split())
+        if not artist or artist.casefold() in seen:
+            continue
+        seen.add(artist.casefold())
+        entries.append({"rank": len(entries) + 1, "artist": artist, "angle": str(item.get("angle") or "").strip()})
+        if len(entries) == max_entries:
+            break
+    if len(entries) < min_entries:
+        raise OutlineError(f"outline ranks only {len(entries)} artist(s)")
+    ranked = {entry["artist"].casefold() for entry in entries}
+    missing = [artist for artist in required_artists if artist.casefold() not in ranked]
+    if missing:
+        raise OutlineError(f"outline is missing required artist(s): {', '.join(missing)}")
+    return {"title": title, "entries": entries}
+
+
+def run_parallel(tasks, concurrency, cancel_event=None):
+    """
+    Exécute les fonctions sans argument de `tasks` dans un pool de threads et retourne leurs
+    résultats dans l'ordre. La première erreur annule les tâches pas encore démarrées et est relevée.
+    """
+    if not tasks:
+        return []
+
+    def guarded(task):
+        if cancel_event is not None and cancel_event.is_set():
+            raise StreamAborted("Generation cancelled.")
+        return task()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(tasks))),
+                            thread_name_prefix="hardstyle-expand") as pool:
+        # Chaque section garde le contexte de l'appelant (génération en cours du registre des tokens)
+        futures = [pool.submit(contextvars.copy_context().run, guarded, task) for task in tasks]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def strip_leading_headings(text):
+    """Retire les titres Markdown que le modèle ajoute parfois en tête d'une section."""
+    lines = text.strip().split("\n")
+    while lines and (lines[0].lstrip().startswith("#") or not lines[0].strip()):
+        lines.pop(0)
+    return "\n".join(lines).strip()
+
+
+def section_heading(entry):
+    return f"## #{entry['rank']}. {entry['artist']}"
+
+
+def stitch_article(title, intro, sections, conclusion):
+    """Assemble le Markdown final : titre H1, introduction, une section H2 par entrée, conclusion."""
+    parts = [f"# {title}", strip_leading_headings(intro)]
+    for entry, body in sections:
+        parts.append(f"{section_heading(entry)}\n\n{strip_leading_headings(body)}")
+    parts.append(strip_leading_headings(conclusion))
+    return "\n\n".join(part for part in parts if part)
+
+
+def expand_outline(outline, expand_intro, expand_entry, expand_conclusion, concurrency, cancel_event=None):
+    """
+    Développe le plan en parallèle : `expand_intro(outline)`, `expand_entry(outline, entry)` pour
+    chaque entrée et `expand_conclusion(outline)` retournent chacun (texte, finish_reason).
+    Retourne l'article assemblé.
+    """
+    def traced_task(name, function, *args, **attributes):
+        def task():
+            with span(name, **attributes):
+                text, finish_reason = function(*args)
+                if finish_reason == "length":
+                    print(f"⚠️ Section '{attributes.get('artist', name)}' hit max_tokens and may be truncated.")
+                return text
+        return task
+
+    entries = outline["entries"]
+    tasks = [traced_task("expand_intro", expand_intro, outline)]
+    tasks += [traced_task("expand_section", expand_entry, outline, entry, rank=entry["rank"], artist=entry["artist"])
+              for entry in entries]
+    tasks.append(traced_task("expand_conclusion", expand_conclusion, outline))
+    results = run_parallel(tasks, concurrency, cancel_event)
+    intro, bodies, conclusion = results[0], results[1:-1], results[-1]
+    return stitch_article(outline["title"], intro, list(zip(entries, bodies)), conclusion)
@@ -0,0 +1,231 @@
+"""
+Post-traitement incrémental des articles générés (nettoyage, insertion des embeds Spotify et,
+avec un `EntityLinker`, embeds et liens internes des artistes mentionnés).
+"""
+import time
+
+from hardstyle.document import ArticleDocument
+from hardstyle.entities import PROTECTED_RE, SPOTIFY_ARTIST_RE, spotify_artist_embed
+from hardstyle.sanitizer import MAX_NOTE_SPAN, UNCLOSED_NOTE_RE, format_report, merge_reports, sanitize
+from hardstyle.telemetry import record_span, span
+
+# Stratégies de placement de l'embed XCEED
+XCEED_AFTER_INTRO = "intro"      # Bot quotidien : après les 3 premières lignes si l'article est assez long
+XCEED_AFTER_MENTION = "mention"  # Bot hebdomadaire : après la première mention développée de XCEED
+XCEED_IN_SECTION = "section"     # Classement par sections : dans la section "## #N. XCEED" (sinon comme "mention")
+
+
+def postprocess_article(text, xceed_embed, playlist_embed, playlist_intro, xceed_strategy=XCEED_AFTER_INTRO,
+                        linker=None):
+    """
+    Post-traitement complet d'un article déjà reçu en entier. Fonction de module (sérialisable)
+    pour pouvoir s'exécuter dans un pool de processus.
+    """
+    processor = IncrementalArticleProcessor(xceed_embed, playlist_embed, playlist_intro, xceed_strategy=xceed_strategy,
+                                            linker=linker)
+    processor.feed(text)
+    return processor.finish()
+
+
+class RawArticleCollector:
+    """
+    Même interface que `IncrementalArticleProcessor`, sans aucun traitement : `finish()` retourne
+    le texte brut reçu, à post-traiter plus tard avec `postprocess_article` (ex. backfill).
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def feed(self, text):
+        self._parts.append(text)
+
+    def finish(self):
+        return "".join(self._parts)
+
+
+class IncrementalArticleProcessor:
+    """
+    Applique le nettoyage au fil des lignes complètes d'un article et construit son document indexé.
+
+    Les fragments de texte reçus en streaming sont passés à `feed()` ; chaque ligne terminée
+    est nettoyée puis ajoutée au `ArticleDocument` (qui indexe titres, mentions et embeds).
+    `finish()` place les embeds Spotify par simple consultation de ces index et retourne
+    l'article sérialisé une seule fois. Avec `linker`, les mentions de tout le roster sont indexées
+    et servent aux embeds par artiste et aux liens internes.
+    """
+
+    def __init__(self, xceed_embed, playlist_embed, playlist_intro, xceed_strategy=XCEED_AFTER_INTRO, linker=None):
+        self.xceed_embed = xceed_embed
+        self.playlist_embed = playlist_embed
+        self.playlist_intro = playlist_intro
+        self.xceed_strategy = xceed_strategy
+        self.linker = linker
+        self.document = ArticleDocument(known_embeds=(xceed_embed, playlist_embed),
+                                        matcher=linker.matcher if linker is not None else None)
+        self.report = {"removed": {}, "removed_chars": 0}
+        self._partial = ""
+        self._open_note = None          # (préfixe, lignes retenues) pendant un "*Note: ..." multi-ligne
+        self._sanitize_seconds = 0.0    # temps de nettoyage cumulé sur toutes les lignes (span "sanitize")
+        self._input_chars = 0
+
+    def feed(self, text):
+        """Ajoute un fragment de texte et traite les lignes qu'il termine."""
+        self._input_chars += len(text)
+        if "\n" not in text:
+            self._partial += text
+            return
+        pending = (self._partial + text).split("\n")
+        self._partial = pending.pop()
+        for line in pending:
+            self._process_line(line)
+
+    def finish(self):
+        """Traite la fin du flux, place les embeds et retourne l'article complet."""
+        if self._partial:
+            self._process_line(self._partial)
+            self._partial = ""
+        if self._open_note is not None:
+            # Note jamais refermée : les lignes retenues sont nettoyées normalement
+            prefix, held = self._open_note
+            self._open_note = None
+            for line in held:
+                self.document.append_line(self._sanitize(line))
+        if self.report["removed"]:
+            print(f"DEBUG: Sanitizer removed: {format_report(self.report)}.")
+        record_span("sanitize", self._sanitize_seconds, bytes=self._input_chars,
+                    lines=len(self.document), removed_chars=self.report["removed_chars"])
+
+        document = self.document
+        with span("embed_insertion", strategy=self.xceed_strategy) as insertion_span:
+            inserted = []
+            if not document.has_embed(self.xceed_embed) and self._place_xceed_embed(document):
+                inserted.append("xceed")
+            if self.linker is not None:
+                inserted.extend(self._place_artist_embeds(document))
+                linked = self._link_mentions(document)
+                if linked:
+                    insertion_span.set(linked=linked)
+            if not document.has_embed(self.playlist_embed):
+                document.append_block("\n\n" + self.playlist_intro + "\n" + self.playlist_embed + "\n",
+                                      embed=self.playlist_embed)
+                inserted.append("playlist")
+                print("DEBUG: Spotify playlist embed inserted.")
+            article = document.serialize()
+            insertion_span.set(inserted=inserted, bytes=len(article))
+        return article
+
+    def _place_xceed_embed(self, document):
+        """Place l'embed XCEED selon la stratégie ; retourne False si l'article est trop court."""
+        block = "\n" + self.xceed_embed + "\n"
+        if self.xceed_strategy == XCEED_IN_SECTION:
+            heading = document.find_heading("XCEED")
+            if heading is not None:
+                mention = document.first_mention("XCEED", min_line_length=50, after=heading)
+                document.insert_after(heading if mention is None else mention, block, embed=self.xceed_embed)
+                print("DEBUG: Spotify embed for XCEED inserted in its ranking section.")
+                return True
+        if self.xceed_strategy in (XCEED_AFTER_MENTION, XCEED_IN_SECTION):
+            mention = document.first_mention("XCEED", min_line_length=50)
+            if mention is not None:
+                document.insert_after(mention, block, embed=self.xceed_embed)
+                print("DEBUG: Spotify embed for XCEED inserted after its mention.")
+                return True
+        elif document.content_length() <= 5:
+            # Article trop court pour un embed en introduction
+            return False
+        document.insert_after(min(document.content_length(), 3) - 1, block, embed=self.xceed_embed)
+        if self.xceed_strategy != XCEED_AFTER_INTRO:
+            print("DEBUG: Spotify embed for XCEED inserted (fallback).")
+        else:
+            print("DEBUG: Spotify embed for XCEED inserted.")
+        return True
+
+    def _mention_anchor(self, document, entity):
+        """Ligne après laquelle placer l'embed d'un artiste (sa section en mode "section"), ou None."""
+        if self.xceed_strategy == XCEED_IN_SECTION:
+            heading = document.find_heading(entity)
+            if heading is not None:
+                mention = document.first_mention(entity, min_line_length=50, after=heading)
+                return heading if mention is None else mention
+        return document.first_mention(entity, min_line_length=50)
+
+    def _place_artist_embeds(self, document):
+        """Embed Spotify des artistes mentionnés qui ont un identifiant, au plus `linker.max_embeds`."""
+        present = set()
+        for line in document.lines:
+            if "embed/artist/" in line:
+                present.update(SPOTIFY_ARTIST_RE.findall(line))
+        if document.has_embed(self.xceed_embed):
+            present.update(SPOTIFY_ARTIST_RE.findall(self.xceed_embed))
+        placed = []
+        for entity in document.mentioned_entities():
+            if len(placed) >= self.linker.max_embeds:
+                break
+            artist_id = self.linker.spotify_id(entity)
+            if not artist_id or artist_id in present:
+                continue
+            anchor = self._mention_anchor(document, entity)
+            if anchor is None:
+                continue
+            embed = spotify_artist_embed(artist_id)
+            document.insert_after(anchor, "\n" + embed + "\n", embed=embed)
+            present.add(artist_id)
+            placed.append(entity)
+        if placed:
+            print(f"DEBUG: Spotify embeds inserted for: {', '.join(placed)}.")
+        return placed
+
+    def _link_mentions(self, document):
+        """Première mention de chaque artiste (hors titres, liens et code) liée à son dernier post sur le blog."""
+        linked = []
+        for index in sorted(document.mention_spans):
+            line = document.lines[index]
+            if line.startswith("#") or "<iframe" in line:
+                continue
+            protected = [match.span() for match in PROTECTED_RE.finditer(line)]
+            replacements = []
+            for start, end, entity in document.mention_spans[index]:
+                url = self.linker.link(entity)
+                if url is None or entity in linked or any(s < end and start < e for s, e in protected):
+                    continue
+                replacements.append((start, end, url))
+                linked.append(entity)
+            for start, end, url in reversed(replacements):
+                line = f"{line[:start]}[{line[start:end]}]({url}){line[end:]}"
+            if replacements:
+                document.replace_line(index, line)
+        if linked:
+            print(f"DEBUG: Internal links added for: {', '.join(linked)}.")
+        return linked
+
+    def _process_line(self, line):
+        if self._open_note is not None:
+            prefix, held = self._open_note
+            if "*" not in line:
+                held.append(line)
+                if sum(len(h) for h in held) > MAX_NOTE_SPAN:
+                    # Trop long pour être une note : on relâche les lignes retenues
+                    self._open_note = None
+                    for held_line in held:
+                        self.document.append_line(self._sanitize(held_line))
+                return
+            self._open_note = None
+            closing = line.index("*") + 1
+            removed_chars = sum(len(h) + 1 for h in held) - len(prefix) + closing
+            merge_reports(self.report, {"removed": {"note_block": 1}, "removed_chars": removed_chars})
+            line = prefix + line[closing:]
+
+        unclosed = UNCLOSED_NOTE_RE.search(line) if "*" in line else None
+        if unclosed:
+            # "*Note:" ouvert sans "*" fermant sur la ligne : on attend la suite
+            self._open_note = (line[:unclosed.start()], [line])
+            return
+        self.document.append_line(self._sanitize(line))
+
+    def _sanitize(self, line):
+        started = time.perf_counter()
+        cleaned, report = sanitize(line, strip=False)
+        self._sanitize_seconds += time.perf_counter() - started
+        if report["removed"]:
+            merge_reports(self.report, report)
+        return cleaned
@@ -0,0 +1,286 @@
+"""
+Limiteur de débit partagé par tous les processus d'une même machine (bots, workers du mode batch,
+planificateur).
+
+Chaque hôte a un seau de jetons pour les requêtes et, quand l'API annonce un quota de tokens
+(Mistral AI), un second seau pour les tokens. L'état des seaux est rangé dans
+`.cache/rate_limits.sqlite3` et modifié dans des transactions `BEGIN IMMEDIATE` : les deux bots et
+leurs workers consomment un seul et même budget quand ils tournent sur le même hôte (planificateur,
+backfill, crontab). Dans GitHub Actions, chaque workflow tourne sur son propre runner et ne restaure
+que son propre cache : le budget n'y est pas partagé entre les deux bots, seule la calibration des
+exécutions précédentes du même workflow est reprise.
+
+Les seaux se calibrent sur les en-têtes des réponses (`x-ratelimit-remaining-*`, `RateLimit-*`,
+`x-ratelimitbysize-*-minute`...) : le restant annoncé devient le contenu du seau et est étalé
+jusqu'à la remise à zéro du quota. Sans en-têtes, un 429 divise par deux le débit observé (une
+fois par seconde au plus : les 429 d'une même rafale ne comptent qu'une fois) et chaque succès le
+relève de 5 % ; la limite est levée dès qu'elle dépasse largement le débit réellement demandé. Un
+429 bloque aussi l'hôte pour tous les processus jusqu'à la fin de son `Retry-After`.
+
+Un appelant ne sonde pas : il réserve son jeton (le seau peut passer en négatif) et dort exactement
+le temps qu'il faut pour que sa réservation soit couverte.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from hardstyle.storage import state_path
+from hardstyle.telemetry import annotate
+
+RATE_LIMITER = os.getenv("RATE_LIMITER", "true").lower() not in ("0", "false", "no")
+# Une requête refusée (429) est réessayée au plus RATE_LIMIT_MAX_RETRIES fois et RATE_LIMIT_MAX_WAIT secondes
+# d'attente cumulée avant que la réponse soit rendue à l'appelant
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "20"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "300"))
+
+# Débit minimal (requêtes/s) après des 429 successifs, et reprise après chaque succès
+MIN_RATE = 0.05
+RECOVERY_FACTOR = 1.05
+DECREASE_FACTOR = 0.5
+# Délai minimal entre deux réductions du débit (s)
+DECREASE_INTERVAL = 1.0
+# Limite levée quand elle dépasse ce multiple du débit observé
+RELEASE_FACTOR = 2.0
+# Poids d'un nouvel intervalle dans le débit observé (moyenne mobile)
+OBSERVED_ALPHA = 0.2
+
+# Noms d'en-têtes (minuscules) : (restant, limite, remise à zéro, fenêtre implicite en secondes)
+REQUEST_HEADERS = (
+    ("x-ratelimit-remaining-requests", "x-ratelimit-limit-requests", "x-ratelimit-reset-requests", None),
+    ("ratelimit-remaining", "ratelimit-limit", "ratelimit-reset", None),
+    ("x-ratelimit-remaining", "x-ratelimit-limit", "x-ratelimit-reset", None),
+    ("x-ratelimit-remaining-req-minute", "x-ratelimit-limit-req-minute", None, 60),
+)
+TOKEN_HEADERS = (
+    ("x-ratelimit-remaining-tokens", "x-ratelimit-limit-tokens", "x-ratelimit-reset-tokens", None),
+    ("x-ratelimitbysize-remaining-minute", "x-ratelimitbysize-limit-minute", "x-ratelimitbysize-reset", 60),
+    ("x-ratelimit-remaining-tokens-minute", "x-ratelimit-limit-tokens-minute", None, 60),
+)
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+# Une valeur de remise à zéro au-delà est un horodatage Unix, pas un délai
+EPOCH_THRESHOLD = 1e9
+
+
+def parse_delay(value, now=None):
+    """Délai en secondes d'un en-tête : "12", "1.5", "6m0s", "250ms", horodatage Unix ou date HTTP (None si illisible)."""
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        parts = DURATION_RE.findall(value)
+        if parts and "".join(amount + unit for amount, unit in parts) == value.replace(" ", ""):
+            return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - (now or time.time()))
+        except (TypeError, ValueError):
+            return None
+    if number > EPOCH_THRESHOLD:
+        return max(0.0, number - (now or time.time()))
+    return max(0.0, number)
+
+
+def _number(headers, name):
+    try:
+        return float(headers[name]) if name in headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+def read_quota(headers, families, now=None):
+    """(restant, limite, secondes avant remise à zéro) de la première famille d'en-têtes présente, ou None."""
+    for remaining_name, limit_name, reset_name, window in families:
+        remaining = _number(headers, remaining_name)
+        if remaining is None:
+            continue
+        reset = parse_delay(headers.get(reset_name), now) if reset_name else None
+        return remaining, _number(headers, limit_name), reset if reset is not None else window
+    return None
+
+
+def estimate_tokens(payload):
+    """Tokens d'une requête Chat Completions : prompt (~4 caractères par token) + `max_tokens` demandés."""
+    if not isinstance(payload, dict) or "messages" not in payload:
+        return 0
+    return len(json.dumps(payload["messages"], ensure_ascii=False)) // 4 + int(payload.get("max_tokens") or 0)
+
+
+class RateLimiter:
+    def __init__(self, path=None, max_retries=RATE_LIMIT_MAX_RETRIES, max_wait=RATE_LIMIT_MAX_WAIT):
+        self.path = path or state_path("rate_limits.sqlite3")
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        # Une connexion pour tous les threads du processus ; les autres processus passent par le verrou SQLite
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # État reconstructible : inutile de forcer l'écriture sur disque à chaque requête
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                capacity REAL NOT NULL,
+                rate REAL,
+                calibrated INTEGER NOT NULL DEFAULT 0,
+                blocked_until REAL NOT NULL DEFAULT 0,
+                observed_rate REAL,
+                last_request REAL,
+                decreased_at REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction exclusive entre processus (BEGIN IMMEDIATE) et entre threads (verrou)."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _load(self, conn, key, now):
+        """Seau `key` rempli jusqu'à `now` (None s'il n'existe pas encore)."""
+        row = conn.execute("SELECT * FROM buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        bucket = dict(row)
+        if bucket["rate"]:
+            bucket["tokens"] = min(bucket["capacity"],
+                                   bucket["tokens"] + max(0.0, now - bucket["updated_at"]) * bucket["rate"])
+        bucket["updated_at"] = now
+        return bucket
+
+    def _store(self, conn, key, bucket):
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (key, tokens, capacity, rate, calibrated, blocked_until, observed_rate, "
+            "last_request, decreased_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, bucket["tokens"], bucket["capacity"], bucket["rate"], int(bucket["calibrated"]),
+             bucket["blocked_until"], bucket["observed_rate"], bucket["last_request"], bucket["decreased_at"],
+             bucket["updated_at"]),
+        )
+
+    @staticmethod
+    def _new_bucket(now):
+        # Sans calibration ni 429, aucun débit n'est imposé (rate NULL)
+        return {"tokens": 1.0, "capacity": 1.0, "rate": None, "calibrated": False, "blocked_until": 0.0,
+                "observed_rate": None, "last_request": None, "decreased_at": 0.0, "updated_at": now}
+
+    def reserve(self, host, tokens=0):
+        """Réserve une requête (et `tokens` tokens si l'hôte a un quota de tokens) ; retourne l'attente nécessaire."""
+        now = time.time()
+        wait = 0.0
+        with self._transaction() as conn:
+            bucket = self._load(conn, host, now) or self._new_bucket(now)
+            if bucket["last_request"] is not None:
+                rate = 1.0 / max(now - bucket["last_request"], 1e-3)
+                observed = bucket["observed_rate"]
+                bucket["observed_rate"] = rate if observed is None else observed + OBSERVED_ALPHA * (rate - observed)
+            bucket["last_request"] = now
+            wait = max(wait, bucket["blocked_until"] - now)
+            if bucket["rate"]:
+                bucket["tokens"] -= 1
+                if bucket["tokens"] < 0:
+                    wait = max(wait, -bucket["tokens"] / bucket["rate"])
+            self._store(conn, host, bucket)
+
+            token_bucket = self._load(conn, f"{host}#tokens", now) if tokens else None
+            if token_bucket is not None and token_bucket["rate"]:
+                token_bucket["tokens"] -= tokens
+                if token_bucket["tokens"] < 0:
+                    wait = max(wait, -token_bucket["tokens"] / token_bucket["rate"])
+                wait = max(wait, token_bucket["blocked_until"] - now)
+                self._store(conn, f"{host}#tokens", token_bucket)
+        return wait
+
+    def acquire(self, host, tokens=0):
+        """Attend que la requête (et ses tokens) tienne dans le budget partagé ; retourne le temps attendu."""
+        wait = self.reserve(host, tokens)
+        if wait > 0:
+            print(f"DEBUG: Rate limiter: waiting {wait:.2f}s before the next request to {host}.")
+            annotate(rate_limit_wait=round(wait, 3))
+            time.sleep(wait)
+        return wait
+
+    def _calibrate(self, conn, key, quota, now):
+        remaining, limit, reset = quota
+        bucket = self._load(conn, key, now) or self._new_bucket(now)
+        # Restant annoncé, sauf si des réservations locales (requêtes en attente) l'ont déjà entamé
+        bucket["tokens"] = min(bucket["tokens"], remaining) if bucket["calibrated"] else remaining
+        bucket["calibrated"] = True
+        bucket["capacity"] = max(1.0, limit or remaining)
+        if reset:
+            # D'ici la remise à zéro, le quota récupère ce qui a été consommé (limite - restant) ; sans
+            # limite annoncée, le restant est étalé sur la fenêtre
+            refill = limit - remaining if limit and limit > remaining else remaining or 1.0
+            bucket["rate"] = max(MIN_RATE, refill / reset)
+        self._store(conn, key, bucket)
+
+    def observe(self, host, response):
+        """Met à jour le budget de `host` d'après une réponse (en-têtes de quota, 429 ou succès)."""
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        now = time.time()
+        requests_quota = read_quota(headers, REQUEST_HEADERS, now)
+        tokens_quota = read_quota(headers, TOKEN_HEADERS, now)
+        with self._transaction() as conn:
+            if requests_quota is not None:
+                self._calibrate(conn, host, requests_quota, now)
+            if tokens_quota is not None:
+                self._calibrate(conn, f"{host}#tokens", tokens_quota, now)
+            elif response.status_code < 400:
+                token_bucket = self._load(conn, f"{host}#tokens", now)
+                if token_bucket is not None and token_bucket["rate"]:
+                    token_bucket.update(calibrated=False, rate=None)
+                    self._store(conn, f"{host}#tokens", token_bucket)
+            bucket = self._load(conn, host, now)
+            if bucket is None:
+                return
+            if bucket["calibrated"]:
+                if requests_quota is None and response.status_code < 400:
+                    # L'hôte n'annonce plus de quota (limite levée, autre offre) : plus de débit imposé
+                    bucket.update(calibrated=False, rate=None, capacity=1.0, tokens=1.0)
+                    self._store(conn, host, bucket)
+                return
+            if response.status_code == 429:
+                if now - bucket["decreased_at"] < DECREASE_INTERVAL:
+                    return
+                # Débit réel divisé par deux (ou débit imposé s'il est déjà plus bas)
+                observed = bucket["observed_rate"] or bucket["rate"] or 1.0
+                bucket["rate"] = max(MIN_RATE, min(bucket["rate"] or observed, observed) * DECREASE_FACTOR)
+                bucket["capacity"] = max(1.0, bucket["rate"])
+                bucket["tokens"] = min(bucket["tokens"], 0.0)
+                bucket["decreased_at"] = now
+            elif bucket["rate"] and response.status_code < 400:
+                bucket["rate"] *= RECOVERY_FACTOR
+                bucket["capacity"] = max(1.0, bucket["rate"])
+                if bucket["observed_rate"] and bucket["rate"] > bucket["observed_rate"] * RELEASE_FACTOR:
+                    bucket["rate"] = None
+            self._store(conn, host, bucket)
+
+    def block(self, host, seconds):
+        """Suspend toutes les requêtes vers `host`, dans tous les processus, pendant `seconds` secondes."""
+        now = time.time()
+        with self._transaction() as conn:
+            bucket = self._load(conn, host, now) or self._new_bucket(now)
+            bucket["blocked_until"] = max(bucket["blocked_until"], now + seconds)
+            self._store(conn, host, bucket)
+
+    def state(self, host):
+        now = time.time()
+        with self._transaction() as conn:
+            return self._load(conn, host, now)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,183 @@
+"""
+Roster des artistes du classement hebdomadaire : chargement depuis un fichier de données,
+déduplication, artistes épinglés et tirage pondéré sans remise tenant compte des rotations.
+
+Le roster est indexé une seule fois (appartenance en O(1), table d'alias de Vose construite
+en O(n)). Chaque tirage coûte ensuite O(k) en moyenne, quelle que soit la taille du roster :
+une entrée est tirée dans la table d'alias puis acceptée avec une probabilité égale à sa
+pénalité de rotation (rejet des doublons et des artistes récemment classés).
+"""
+import json
+import os
+import random
+import time
+
+from hardstyle.storage import state_path
+
+DEFAULT_ROSTER_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "data", "hardstyle_artists.txt")
+HARDSTYLE_ROSTER_FILE = os.getenv("HARDSTYLE_ROSTER_FILE", DEFAULT_ROSTER_FILE)
+# Nombre de classements passés pris en compte pour la rotation des artistes
+ROSTER_HISTORY_RUNS = int(os.getenv("ROSTER_HISTORY_RUNS", "4"))
+
+WEIGHT_SEPARATOR = "|"
+
+
+def normalize_name(name):
+    """Clé d'index d'un artiste : insensible à la casse et aux espaces superflus."""
+    return " ".join(name.split()).casefold()
+
+
+class Roster:
+    def __init__(self, entries=(), pinned=()):
+        self.names = []                     # orthographe de référence (première rencontrée)
+        self.weights = []
+        self.spotify_ids = {}               # nom normalisé -> identifiant d'artiste Spotify
+        self._index = {}                    # nom normalisé -> position
+        self.duplicates = 0
+        for name, weight, *spotify_id in entries:
+            self.add(name, weight, *spotify_id)
+        self.pinned = []
+        for name in pinned:
+            if name not in self:
+                self.add(name)
+            self.pinned.append(self.names[self._index[normalize_name(name)]])
+        self._alias = None
+
+    @classmethod
+    def load(cls, path=HARDSTYLE_ROSTER_FILE, pinned=()):
+        """
+        Charge un fichier d'un artiste par ligne ("Nom", "Nom | poids" ou "Nom | poids | id Spotify",
+        "#" pour les commentaires).
+        """
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                name, weight, spotify_id = (line.split(WEIGHT_SEPARATOR, 2) + ["", ""])[:3]
+                try:
+                    entries.append((name.strip(), float(weight) if weight.strip() else 1.0, spotify_id.strip()))
+                except ValueError:
+                    raise ValueError(f"{path}:{line_number}: invalid weight '{weight.strip()}'")
+        roster = cls(entries, pinned=pinned)
+        print(f"DEBUG: Roster loaded from {path}: {len(roster)} artist(s), "
+              f"{roster.duplicates} duplicate(s) ignored.")
+        return roster
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._index
+
+    def add(self, name, weight=1.0, spotify_id=None):
+        key = normalize_name(name)
+        if not key:
+            return
+        if key in self._index:
+            self.duplicates += 1
+            return
+        if weight <= 0:
+            raise ValueError(f"Artist '{name}' must have a positive weight (got {weight}).")
+        self._index[key] = len(self.names)
+        self.names.append(" ".join(name.split()))
+        self.weights.append(weight)
+        if spotify_id:
+            self.spotify_ids[key] = spotify_id
+        self._alias = None
+
+    def _alias_table(self):
+        """Table d'alias de Vose sur les poids de base, construite au premier tirage."""
+        if self._alias is not None:
+            return self._alias
+        n = len(self.weights)
+        total = sum(self.weights)
+        scaled = [weight * n / total for weight in self.weights]
+        probability = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            probability[low] = scaled[low]
+            alias[low] = high
+            scaled[high] -= 1.0 - scaled[low]
+            (small if scaled[high] < 1.0 else large).append(high)
+        self._alias = (probability, alias)
+        return self._alias
+
+    def sample(self, count, rng=random, penalties=None, max_draws=None):
+        """
+        Tire `count` artistes distincts : les épinglés d'abord, puis un tirage pondéré sans remise.
+
+        `penalties` associe à certains artistes (nom normalisé) un facteur dans ]0, 1] appliqué à
+        leur poids, par exemple `RotationHistory.penalties()`. L'ordre du résultat est mélangé.
+        """
+        selected = list(self.pinned[:count])
+        chosen = {self._index[normalize_name(name)] for name in selected}
+        wanted = min(count, len(self.names))
+        penalties = penalties or {}
+        if len(chosen) < wanted:
+            probability, alias = self._alias_table()
+            n = len(self.names)
+            # Filet de sécurité si presque tout le roster est pénalisé ou déjà tiré
+            max_draws = max_draws or 64 * wanted + 1000
+            draws = 0
+            while len(chosen) < wanted and draws < max_draws:
+                draws += 1
+                column = rng.randrange(n)
+                index = column if rng.random() < probability[column] else alias[column]
+                if index in chosen:
+                    continue
+                penalty = penalties.get(normalize_name(self.names[index]), 1.0)
+                if penalty < 1.0 and rng.random() >= penalty:
+                    continue
+                chosen.add(index)
+                selected.append(self.names[index])
+            if len(chosen) < wanted:
+                # Complète sans pondération parmi les artistes restants
+                remaining = [i for i in range(n) if i not in chosen]
+                for index in rng.sample(remaining, wanted - len(chosen)):
+                    chosen.add(index)
+                    selected.append(self.names[index])
+        rng.shuffle(selected)
+        return selected
+
+
+class RotationHistory:
+    """Artistes des derniers classements, conservés dans CACHE_DIR pour les faire tourner."""
+
+    def __init__(self, filename="artist_rotation.json", max_runs=ROSTER_HISTORY_RUNS):
+        self.path = state_path(filename)
+        self.max_runs = max_runs
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.runs = json.load(f).get("runs", [])
+        except (OSError, ValueError):
+            self.runs = []
+
+    def penalties(self, exempt=()):
+        """
+        Facteur de poids par artiste : 1/(N+1) pour le dernier classement, puis remontée linéaire
+        jusqu'à 1 après N classements. Les artistes de `exempt` (épinglés) ne sont pas pénalisés.
+        """
+        exempt = {normalize_name(name) for name in exempt}
+        factors = {}
+        recent_runs = self.runs[-self.max_runs:] if self.max_runs > 0 else []
+        for age, run in enumerate(reversed(recent_runs)):
+            factor = (age + 1) / (self.max_runs + 1)
+            for name in run["artists"]:
+                key = normalize_name(name)
+                if key not in exempt and key not in factors:
+                    factors[key] = factor
+        return factors
+
+    def record(self, artists):
+        self.runs.append({"at": int(time.time()), "artists": list(artists)})
+        self.runs = self.runs[-max(self.max_runs, 1):]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"runs": self.runs}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
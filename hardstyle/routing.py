@@ -0,0 +1,282 @@
+"""
+Choix du modèle Mistral AI de chaque génération d'après les performances mesurées.
+
+Les modèles de MISTRAL_MODELS sont rangés du moins cher au plus cher. Pour chaque type de job
+(article quotidien, classement hebdomadaire) et chaque modèle, le routeur conserve dans
+`.cache/model_stats.sqlite3` : un histogramme des durées de génération, le débit (tokens estimés par
+seconde), le taux de réponses coupées par `max_tokens` et le taux d'articles atteignant le nombre
+de mots demandé (avant réparation de longueur). Chaque mesure est appliquée à la ligne de la base
+dans une transaction `BEGIN IMMEDIATE` : les processus concurrents fusionnent leurs mesures au
+lieu d'écraser celles des autres.
+
+Le modèle retenu est le moins cher qui respecte le SLO du job (latence p95, taux d'articles à la
+bonne longueur, taux de troncature) ; un modèle encore peu mesuré est présumé conforme, ce qui
+l'essaie à son tour. Quand l'appel échoue côté endpoint (erreur réseau, flux bloqué, 429/5xx,
+disjoncteur ouvert), la génération repart aussitôt avec le modèle suivant, et le modèle fautif
+est écarté pendant MODEL_ERROR_COOLDOWN secondes.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+
+from hardstyle.continuation import CHARS_PER_TOKEN, LENGTH_REPAIR_TOLERANCE, count_words
+from hardstyle.hedging import CircuitOpenError, LatencyHistogram, is_endpoint_failure
+from hardstyle.ledger import generation
+from hardstyle.storage import state_path
+from hardstyle.telemetry import annotate, span
+
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "true").lower() not in ("0", "false", "no")
+# Modèles candidats, du moins cher au plus cher
+MISTRAL_MODELS = [model.strip() for model in os.getenv(
+    "MISTRAL_MODELS", "mistral-tiny,mistral-small-latest,mistral-medium-latest,mistral-large-latest").split(",")
+    if model.strip()]
+# Modèle imposé (routage et repli désactivés)
+MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "").strip()
+# SLO par défaut ; chaque valeur est surchargeable par job : MODEL_SLO_DAILY_MAX_LATENCY, MODEL_SLO_WEEKLY_MIN_HIT_RATE...
+MODEL_SLO_MAX_LATENCY = float(os.getenv("MODEL_SLO_MAX_LATENCY", "180"))
+MODEL_SLO_MIN_HIT_RATE = float(os.getenv("MODEL_SLO_MIN_HIT_RATE", "0.8"))
+MODEL_SLO_MAX_TRUNCATION = float(os.getenv("MODEL_SLO_MAX_TRUNCATION", "0.2"))
+# Générations observées avant de juger un modèle sur son SLO
+MODEL_MIN_SAMPLES = int(os.getenv("MODEL_MIN_SAMPLES", "5"))
+# Modèles essayés au plus par génération (le premier choix et ses replis)
+MODEL_MAX_ATTEMPTS = int(os.getenv("MODEL_MAX_ATTEMPTS", "3"))
+MODEL_ERROR_COOLDOWN = float(os.getenv("MODEL_ERROR_COOLDOWN", "600"))
+
+# Poids d'une nouvelle observation dans les moyennes mobiles (taux et débit)
+EWMA_ALPHA = 0.2
+SLO_PERCENTILE = 0.95
+
+
+def slo_for(job):
+    """SLO du type de job `job` : latence p95 maximale (s), taux minimal d'articles à la bonne longueur, troncature maximale."""
+    prefix = f"MODEL_SLO_{job.upper()}_"
+    return {
+        "max_latency": float(os.getenv(prefix + "MAX_LATENCY", MODEL_SLO_MAX_LATENCY)),
+        "min_hit_rate": float(os.getenv(prefix + "MIN_HIT_RATE", MODEL_SLO_MIN_HIT_RATE)),
+        "max_truncation": float(os.getenv(prefix + "MAX_TRUNCATION", MODEL_SLO_MAX_TRUNCATION)),
+    }
+
+
+class ModelStats:
+    """Mesures d'un modèle pour un type de job."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.samples = int(data.get("samples", 0))
+        self.latency = LatencyHistogram(data.get("latency"))
+        self.tokens_per_second = float(data.get("tokens_per_second", 0.0))
+        self.truncation_rate = float(data.get("truncation_rate", 0.0))
+        self.hit_rate = float(data.get("hit_rate", 1.0))
+
+    def observe(self, seconds, tokens, truncated, hit):
+        # La première observation remplace les valeurs initiales au lieu de s'y mêler
+        alpha = EWMA_ALPHA if self.samples else 1.0
+        self.samples += 1
+        self.latency.observe(seconds)
+        self.tokens_per_second += alpha * (tokens / max(seconds, 1e-3) - self.tokens_per_second)
+        self.truncation_rate += alpha * (float(truncated) - self.truncation_rate)
+        self.hit_rate += alpha * (float(hit) - self.hit_rate)
+
+    def p95(self):
+        return self.latency.quantile(SLO_PERCENTILE) if self.samples else None
+
+    def shortfall(self, slo):
+        """Écart relatif cumulé au SLO (0 : SLO respecté)."""
+        excess = 0.0
+        if self.samples:
+            excess += max(0.0, self.p95() / slo["max_latency"] - 1)
+            excess += max(0.0, slo["min_hit_rate"] - self.hit_rate)
+            excess += max(0.0, self.truncation_rate - slo["max_truncation"])
+        return excess
+
+    def to_dict(self):
+        return {
+            "samples": self.samples,
+            "latency": [round(count, 3) for count in self.latency.counts],
+            "tokens_per_second": round(self.tokens_per_second, 2),
+            "truncation_rate": round(self.truncation_rate, 4),
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class GenerationReport:
+    """Texte brut d'une tentative (avant réparation de longueur), signalé par la fonction de génération."""
+
+    def __init__(self):
+        self.text = None
+        self.finish_reason = None
+
+    def report(self, text, finish_reason):
+        self.text = text
+        self.finish_reason = finish_reason
+
+
+class ModelRouter:
+    def __init__(self, path=None, models=None, forced_model=MISTRAL_MODEL, enabled=MODEL_ROUTING,
+                 min_samples=MODEL_MIN_SAMPLES, max_attempts=MODEL_MAX_ATTEMPTS, cooldown=MODEL_ERROR_COOLDOWN):
+        self.path = path or state_path("model_stats.sqlite3")
+        self.models = list(models or MISTRAL_MODELS)
+        self.forced_model = forced_model
+        self.enabled = enabled
+        self.min_samples = min_samples
+        self.max_attempts = max_attempts
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS failures (model TEXT PRIMARY KEY, at REAL NOT NULL)")
+        self.stats = {}
+        # Dernier échec de chaque modèle (horodatage time.time(), partagé par tous les jobs)
+        self.failures = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reprend les mesures et les échecs enregistrés par tous les processus."""
+        try:
+            stats = {row["key"]: ModelStats(json.loads(row["data"]))
+                     for row in self.conn.execute("SELECT key, data FROM stats")}
+            failures = {row["model"]: row["at"] for row in self.conn.execute("SELECT model, at FROM failures")}
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not read the model statistics: {e}")
+            return
+        with self._lock:
+            self.stats.update(stats)
+            self.failures = failures
+
+    def get(self, job, model):
+        with self._lock:
+            return self.stats.setdefault(f"{job}/{model}", ModelStats())
+
+    def _write(self, update):
+        """Exécute `update(conn)` dans une transaction `BEGIN IMMEDIATE` (appelé sous `self._lock`)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = update(self.conn)
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return result
+
+    def cooling_down(self, model, now=None):
+        failed_at = self.failures.get(model)
+        return failed_at is not None and (now or time.time()) - failed_at < self.cooldown
+
+    def candidates(self, job):
+        """
+        Modèles à essayer pour `job`, dans l'ordre : ceux qui respectent le SLO (ou encore peu mesurés),
+        du moins cher au plus cher ; puis les autres, du plus proche au plus éloigné du SLO ; puis
+        ceux en pénitence après un échec récent.
+        """
+        if self.forced_model:
+            return [self.forced_model]
+        if not self.enabled or not self.models:
+            return self.models[:1]
+        self.refresh()
+        slo = slo_for(job)
+        now = time.time()
+        compliant, degraded, cooling = [], [], []
+        for cost, model in enumerate(self.models):
+            stats = self.get(job, model)
+            shortfall = stats.shortfall(slo) if stats.samples >= self.min_samples else 0.0
+            if self.cooling_down(model, now):
+                cooling.append((self.failures[model], model))
+            elif shortfall:
+                degraded.append((shortfall, cost, model))
+            else:
+                compliant.append(model)
+        ordered = compliant + [model for *_, model in sorted(degraded)] + [model for _, model in sorted(cooling)]
+        return ordered[:max(1, self.max_attempts)]
+
+    def observe(self, job, model, seconds, text, finish_reason, target_words):
+        key = f"{job}/{model}"
+        observation = (seconds, len(text) / CHARS_PER_TOKEN, finish_reason == "length",
+                       count_words(text) >= target_words * LENGTH_REPAIR_TOLERANCE)
+
+        def update(conn):
+            # La mesure s'ajoute à la ligne enregistrée, qui contient celles des autres processus
+            row = conn.execute("SELECT data FROM stats WHERE key = ?", (key,)).fetchone()
+            stats = ModelStats(json.loads(row["data"]) if row is not None else None)
+            stats.observe(*observation)
+            conn.execute("INSERT OR REPLACE INTO stats (key, data) VALUES (?, ?)", (key, json.dumps(stats.to_dict())))
+            conn.execute("DELETE FROM failures WHERE model = ?", (model,))
+            return stats
+
+        with self._lock:
+            try:
+                stats = self._write(update)
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not save the statistics of model '{model}': {e}")
+                stats = self.stats.setdefault(key, ModelStats())
+                stats.observe(*observation)
+            self.stats[key] = stats
+            self.failures.pop(model, None)
+        return stats
+
+    def record_failure(self, model):
+        failed_at = time.time()
+        with self._lock:
+            self.failures[model] = failed_at
+            try:
+                self._write(lambda conn: conn.execute(
+                    "INSERT OR REPLACE INTO failures (model, at) VALUES (?, ?)", (model, failed_at)))
+            except sqlite3.Error as e:
+                print(f"⚠️ Could not save the failure of model '{model}': {e}")
+
+    def run(self, job, attempt, target_words, cancel_event=None):
+        """
+        Exécute `attempt(model, report)` avec le modèle choisi pour `job` ; si l'endpoint échoue, recommence
+        avec le modèle suivant. `attempt` appelle `report.report(texte, finish_reason)` sur le texte brut
+        généré (avant réparation de longueur) et retourne l'article. Relève l'erreur de la dernière tentative.
+        Tous les appels des tentatives sont rattachés à une même génération dans le registre des tokens.
+        """
+        with generation(job):
+            return self._run(job, attempt, target_words, cancel_event)
+
+    def _run(self, job, attempt, target_words, cancel_event):
+        models = self.candidates(job)
+        for position, model in enumerate(models):
+            report = GenerationReport()
+            started = time.monotonic()
+            with span("model_attempt", job=job, model=model, position=position) as attempt_span:
+                try:
+                    article = attempt(model, report)
+                except requests.exceptions.RequestException as e:
+                    # Une erreur de la requête elle-même (400, 401...) se reproduirait avec un autre modèle ;
+                    # un disjoncteur ouvert signifie que ce modèle est déjà considéré en panne
+                    if (cancel_event is not None and cancel_event.is_set()) or not (
+                            is_endpoint_failure(e) or isinstance(e, CircuitOpenError)):
+                        raise
+                    self.record_failure(model)
+                    if position + 1 == len(models):
+                        raise
+                    print(f"⚠️ Mistral model '{model}' failed for the {job} job ({e}), "
+                          f"falling back to '{models[position + 1]}'...")
+                    continue
+                seconds = time.monotonic() - started
+                if report.text is not None:
+                    stats = self.observe(job, model, seconds, report.text, report.finish_reason, target_words)
+                    attempt_span.set(seconds=round(seconds, 3), p95=stats.p95(), hit_rate=round(stats.hit_rate, 3),
+                                     truncation_rate=round(stats.truncation_rate, 3))
+            annotate(model=model, fallbacks=position)
+            return article
+
+
+_shared_router = None
+_shared_lock = threading.Lock()
+
+
+def get_model_router():
+    """Routeur partagé par les générations du processus (statistiques communes)."""
+    global _shared_router
+    with _shared_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter()
+        return _shared_router
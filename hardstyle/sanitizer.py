@@ -0,0 +1,88 @@
+"""
+Nettoyage des articles générés en une seule passe, à partir d'une table de règles.
+
+Toutes les règles sont compilées une fois dans une unique alternative regex : le texte
+est parcouru une seule fois (un seul `re.sub`, une seule copie, un seul `.strip()`),
+et un rapport indique combien d'occurrences chaque règle a retirées.
+"""
+import re
+
+# Longueur maximale d'une note "*Note: ... *" : évite de balayer tout l'article à la recherche
+# d'un astérisque fermant (l'ancien motif DOTALL pouvait aller jusqu'à la fin du texte)
+MAX_NOTE_SPAN = 600
+
+
+def caseless(word):
+    """Motif insensible à la casse écrit en classes explicites, ex. "ote" -> "[Oo][Tt][Ee]"."""
+    return "".join(f"[{c.upper()}{c.lower()}]" if c.isalpha() else re.escape(c) for c in word)
+
+
+# (nom, motif) dans l'ordre de priorité. Chaque motif commence par un caractère littéral
+# (pas de drapeau IGNORECASE) : le moteur regex peut alors sauter directement aux positions
+# candidates au lieu d'essayer toutes les règles à chaque caractère.
+SANITIZE_RULES = (
+    ("signature_fr", r"Par Nathan Remacle\."),
+    ("signature_en", r"By Nathan Remacle\."),
+    ("note_block", r"\*" + caseless("note") + r"\s*:[^*]{0,%d}\*" % MAX_NOTE_SPAN),
+    ("note_label", "N" + caseless("ote") + r"\s*:\s*"),
+    ("note_label", "n" + caseless("ote") + r"\s*:\s*"),
+)
+
+# "*Note:" ouvert sans astérisque fermant avant la fin de la ligne (traitement ligne par ligne)
+UNCLOSED_NOTE_RE = re.compile(r"\*Note\s*:[^*]*$", re.IGNORECASE)
+
+
+class Sanitizer:
+    def __init__(self, rules=SANITIZE_RULES):
+        self.rules = [(name, re.compile(pattern)) for name, pattern in rules]
+        self.pattern = re.compile("|".join(f"(?:{pattern})" for _, pattern in rules))
+
+    def _rule_name(self, matched):
+        for name, rule in self.rules:
+            if rule.fullmatch(matched):
+                return name
+        return "unknown"
+
+    def sanitize(self, text, strip=True):
+        """
+        Retire toutes les occurrences des règles en une passe.
+        Retourne (texte nettoyé, rapport) ; le rapport vaut
+        {"removed": {règle: nombre}, "removed_chars": total}.
+        """
+        removed = {}
+        removed_chars = 0
+
+        def drop(match):
+            nonlocal removed_chars
+            name = self._rule_name(match.group())
+            removed[name] = removed.get(name, 0) + 1
+            removed_chars += match.end() - match.start()
+            return ""
+
+        cleaned = self.pattern.sub(drop, text)
+        if strip:
+            cleaned = cleaned.strip()
+        return cleaned, {"removed": removed, "removed_chars": removed_chars}
+
+
+DEFAULT_SANITIZER = Sanitizer()
+
+
+def sanitize(text, strip=True):
+    """Nettoie `text` avec les règles par défaut ; voir `Sanitizer.sanitize`."""
+    return DEFAULT_SANITIZER.sanitize(text, strip=strip)
+
+
+def merge_reports(total, report):
+    """Ajoute `report` au rapport cumulé `total` (modifié sur place)."""
+    for name, count in report["removed"].items():
+        total["removed"][name] = total["removed"].get(name, 0) + count
+    total["removed_chars"] += report["removed_chars"]
+    return total
+
+
+def format_report(report):
+    if not report["removed"]:
+        return "nothing removed"
+    details = ", ".join(f"{name} x{count}" for name, count in report["removed"].items())
+    return f"{details} ({report['removed_chars']} chars)"
@@ -0,0 +1,357 @@
+"""
+Planificateur en processus long : exécute les jobs des bots selon des expressions cron (UTC),
+avec un délai aléatoire (jitter), le rattrapage des exécutions manquées et un endpoint HTTP
+local de santé / contrôle.
+
+Les jobs tournent dans le même processus : pool de connexions HTTP, cache d'authentification
+et roster restent chauds d'une publication à l'autre.
+"""
+import hmac
+import ipaddress
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hardstyle.storage import state_path
+from hardstyle.telemetry import get_tracer, span
+
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "120"))
+# Une exécution manquée (processus arrêté, machine en veille) est rattrapée si elle date de moins de
+SCHEDULER_CATCHUP_WINDOW = float(os.getenv("SCHEDULER_CATCHUP_WINDOW", str(6 * 3600)))
+SCHEDULER_HEALTH_HOST = os.getenv("SCHEDULER_HEALTH_HOST", "127.0.0.1")
+SCHEDULER_HEALTH_PORT = int(os.getenv("SCHEDULER_HEALTH_PORT", "8787"))
+# Jeton exigé par les POST de contrôle (en-tête "Authorization: Bearer <jeton>") ; obligatoire hors boucle locale
+SCHEDULER_HEALTH_TOKEN = os.getenv("SCHEDULER_HEALTH_TOKEN", "")
+
+MONTH_NAMES = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+DAY_NAMES = ("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT")
+
+
+class CronError(ValueError):
+    """Expression cron invalide."""
+
+
+def _parse_field(field, low, high, names=None, name_offset=0):
+    values = set()
+    for part in field.upper().split(","):
+        expression, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if step < 1:
+            raise CronError(f"Invalid step in '{part}'.")
+        if expression == "*":
+            start, end = low, high
+        else:
+            bounds = [_parse_value(value, names, name_offset) for value in expression.split("-", 1)]
+            start, end = bounds[0], bounds[-1]
+            if step > 1 and len(bounds) == 1:
+                end = high
+        if not (low <= start <= high and low <= end <= high) or start > end:
+            raise CronError(f"Value out of range in '{part}' (expected {low}-{high}).")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def _parse_value(value, names, name_offset):
+    if names and value in names:
+        return names.index(value) + name_offset
+    try:
+        return int(value)
+    except ValueError:
+        raise CronError(f"Invalid cron value '{value}'.")
+
+
+class CronExpression:
+    """Expression cron à 5 champs (minute heure jour-du-mois mois jour-de-semaine), noms JAN/MON acceptés."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise CronError(f"Cron expression '{expression}' must have 5 fields.")
+        self.expression = expression
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12, MONTH_NAMES, 1)
+        weekdays = _parse_field(fields[4], 0, 7, DAY_NAMES)
+        self.weekdays = {day % 7 for day in weekdays}   # 0 et 7 : dimanche
+        # Comme cron : si jour du mois ET jour de semaine sont restreints, l'un OU l'autre suffit.
+        # Comme Vixie cron, un champ qui commence par "*" (dont "*/2") n'est pas restreint.
+        self._any_day = fields[2].startswith("*")
+        self._any_weekday = fields[4].startswith("*")
+
+    def __str__(self):
+        return self.expression
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment):
+        """Première échéance strictement postérieure à `moment` (datetime avec fuseau)."""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Au plus ~4 ans de jours parcourus (ex. "0 0 29 2 *"), heures et minutes sautées directement
+        for _ in range(366 * 5):
+            if candidate.month in self.months and self._day_matches(candidate):
+                for hour in sorted(h for h in self.hours if h >= candidate.hour):
+                    first_minute = candidate.minute if hour == candidate.hour else 0
+                    minutes = [m for m in sorted(self.minutes) if m >= first_minute]
+                    if minutes:
+                        return candidate.replace(hour=hour, minute=minutes[0])
+            candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+        raise CronError(f"Cron expression '{self.expression}' never fires.")
+
+    def previous_before(self, moment, window):
+        """Dernière échéance dans ]moment - window, moment] (None s'il n'y en a pas)."""
+        fire = self.next_after(moment - timedelta(seconds=window))
+        last = None
+        while fire <= moment:
+            last = fire
+            fire = self.next_after(fire)
+        return last
+
+
+class Job:
+    def __init__(self, name, cron, run, jitter=SCHEDULER_JITTER):
+        self.name = name
+        self.cron = cron if isinstance(cron, CronExpression) else CronExpression(cron)
+        self.run = run
+        self.jitter = jitter
+        self.next_run = None            # échéance cron (sans jitter)
+        self.due_at = None              # échéance effective (avec jitter)
+        self.last_run = None
+        self.last_status = None
+        self.last_duration = None
+        self.last_error = None
+        self.runs = 0
+        self.failures = 0
+
+    def schedule(self, after, rng=random):
+        self.next_run = self.cron.next_after(after)
+        self.due_at = self.next_run + timedelta(seconds=rng.uniform(0, self.jitter) if self.jitter else 0)
+
+    def to_dict(self):
+        return {
+            "cron": str(self.cron),
+            "next_run": _iso(self.due_at),
+            "last_run": _iso(self.last_run),
+            "last_status": self.last_status,
+            "last_duration_s": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_error": self.last_error,
+            "runs": self.runs,
+            "failures": self.failures,
+        }
+
+
+def _iso(moment):
+    return moment.isoformat(timespec="seconds") if moment else None
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+class Scheduler:
+    """
+    Boucle de planification mono-thread : les jobs s'exécutent l'un après l'autre, jamais en
+    parallèle. Les dates de dernière exécution sont conservées dans CACHE_DIR pour rattraper,
+    au redémarrage, une échéance manquée dans la fenêtre SCHEDULER_CATCHUP_WINDOW.
+    """
+
+    def __init__(self, jobs, catchup_window=SCHEDULER_CATCHUP_WINDOW, state_file="scheduler.json"):
+        self.jobs = {job.name: job for job in jobs}
+        self.catchup_window = catchup_window
+        self.state_path = state_path(state_file)
+        self.started_at = utcnow()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._triggered = []            # jobs demandés via l'endpoint de contrôle
+        self.running = None
+
+    # --- État persistant ---
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        state = {name: {"last_run": _iso(job.last_run), "last_status": job.last_status}
+                 for name, job in self.jobs.items()}
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def _plan(self):
+        """Calcule les prochaines échéances et programme immédiatement les exécutions manquées."""
+        now = utcnow()
+        state = self._load_state()
+        for name, job in self.jobs.items():
+            saved = state.get(name, {})
+            if saved.get("last_run"):
+                job.last_run = datetime.fromisoformat(saved["last_run"])
+                job.last_status = saved.get("last_status")
+            job.schedule(now)
+            missed = job.cron.previous_before(now, self.catchup_window) if self.catchup_window > 0 else None
+            if missed and (job.last_run is None or job.last_run < missed):
+                # Plusieurs échéances manquées ne donnent lieu qu'à un seul rattrapage
+                print(f"⚠️ Job '{name}' missed its {_iso(missed)} run, catching up now.")
+                job.next_run = missed
+                job.due_at = now
+            print(f"DEBUG: Job '{name}' ({job.cron}) next run at {_iso(job.due_at)}.")
+
+    # --- Contrôle ---
+    def trigger(self, name):
+        if name not in self.jobs:
+            raise KeyError(name)
+        with self._lock:
+            if name not in self._triggered:
+                self._triggered.append(name)
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def status(self):
+        healthy = not self._stop.is_set()
+        return {
+            "status": "ok" if healthy and all(job.last_status != "error" for job in self.jobs.values())
+            else ("stopping" if not healthy else "degraded"),
+            "started_at": _iso(self.started_at),
+            "uptime_s": round((utcnow() - self.started_at).total_seconds()),
+            "running": self.running,
+            "jobs": {name: job.to_dict() for name, job in self.jobs.items()},
+        }
+
+    # --- Exécution ---
+    def run_job(self, job, manual=False):
+        """Exécute `job` ; une exécution manuelle ne consomme pas la prochaine échéance planifiée."""
+        self.running = job.name
+        started = time.monotonic()
+        job.last_run = utcnow()
+        reason = "manual trigger" if manual else f"due {_iso(job.next_run)}"
+        print(f"\n⏰ Running scheduled job '{job.name}' ({reason}).")
+        try:
+            with span("scheduled_job", job=job.name, manual=manual):
+                job.run()
+            job.last_status, job.last_error = "ok", None
+            print(f"✅ Job '{job.name}' completed.")
+        except (Exception, SystemExit) as e:
+            # Un job en échec ne doit pas arrêter le démon : l'outbox reprendra à la prochaine échéance
+            job.last_status, job.last_error = "error", f"{type(e).__name__}: {e}"[:300]
+            job.failures += 1
+            print(f"❌ Job '{job.name}' failed: {job.last_error}")
+        finally:
+            job.runs += 1
+            job.last_duration = time.monotonic() - started
+            self.running = None
+            self._save_state()
+            if not manual:
+                job.schedule(max(utcnow(), job.next_run))
+            print(f"DEBUG: Job '{job.name}' next run at {_iso(job.due_at)}.")
+
+    def run_forever(self):
+        self._plan()
+        while not self._stop.is_set():
+            with self._lock:
+                triggered, self._triggered = self._triggered, []
+            for name in triggered:
+                self.run_job(self.jobs[name], manual=True)
+            now = utcnow()
+            due = sorted((job for job in self.jobs.values() if job.due_at <= now), key=lambda job: job.due_at)
+            for job in due:
+                if self._stop.is_set():
+                    break
+                self.run_job(job)
+            if due or triggered:
+                continue
+            wait = min(job.due_at for job in self.jobs.values()) - utcnow()
+            self._wake.wait(timeout=max(0.0, min(wait.total_seconds(), 60.0)))
+            self._wake.clear()
+        print("DEBUG: Scheduler stopped.")
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        scheduler = self.server.scheduler
+        if self.path in ("/", "/healthz", "/status"):
+            status = scheduler.status()
+            self._send(200 if status["status"] != "stopping" else 503, json.dumps(status, indent=1),
+                       "application/json")
+        elif self.path == "/metrics":
+            self._send(200, get_tracer().openmetrics(),
+                       "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        else:
+            self._send(404, json.dumps({"error": "not found"}), "application/json")
+
+    def do_POST(self):
+        scheduler = self.server.scheduler
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}"):
+            self._send(401, json.dumps({"error": "unauthorized"}), "application/json")
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "run":
+            try:
+                scheduler.trigger(parts[1])
+            except KeyError:
+                self._send(404, json.dumps({"error": f"unknown job '{parts[1]}'"}), "application/json")
+                return
+            self._send(202, json.dumps({"triggered": parts[1]}), "application/json")
+        elif parts == ["shutdown"]:
+            scheduler.stop()
+            self._send(202, json.dumps({"stopping": True}), "application/json")
+        else:
+            self._send(404, json.dumps({"error": "not found"}), "application/json")
+
+    def _send(self, status, body, content_type):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def start_health_server(scheduler, host=SCHEDULER_HEALTH_HOST, port=SCHEDULER_HEALTH_PORT,
+                        token=SCHEDULER_HEALTH_TOKEN):
+    """
+    Endpoint local : GET /healthz (état des jobs), GET /metrics (OpenMetrics),
+    POST /jobs/<nom>/run (exécution immédiate), POST /shutdown.
+
+    Par défaut, il n'écoute que 127.0.0.1 et les POST de contrôle ne sont pas authentifiés. Avec
+    `token`, ils exigent "Authorization: Bearer <token>" ; écouter une autre adresse sans jeton
+    est refusé (ValueError).
+    """
+    if not token and not _is_loopback(host):
+        raise ValueError(f"The scheduler control endpoint on {host} needs SCHEDULER_HEALTH_TOKEN "
+                         "(only 127.0.0.1 may be left unauthenticated).")
+    server = ThreadingHTTPServer((host, port), _HealthHandler)
+    server.daemon_threads = True
+    server.scheduler = scheduler
+    server.token = token
+    threading.Thread(target=server.serve_forever, name="scheduler-health", daemon=True).start()
+    print(f"DEBUG: Scheduler health endpoint on http://{host}:{server.server_address[1]}/healthz")
+    return server
@@ -0,0 +1,11 @@
+"""Emplacement des états locaux conservés entre deux exécutions des bots."""
+import os
+
+# Restauré par actions/cache dans les workflows GitHub Actions
+CACHE_DIR = os.getenv("HARDSTYLE_CACHE_DIR", ".cache")
+
+
+def state_path(filename):
+    """Chemin d'un fichier d'état dans CACHE_DIR (le dossier est créé au besoin)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
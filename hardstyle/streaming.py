@@ -0,0 +1,105 @@
+"""Clients de l'API Chat Completions de Mistral AI : streaming (SSE) et appel simple."""
+import json
+import time
+
+import requests
+
+from hardstyle.http_client import get_client
+from hardstyle.ledger import record_call
+from hardstyle.telemetry import annotate
+
+
+class StreamAborted(requests.exceptions.RequestException):
+    """Levée quand un flux Mistral est coupé (blocage ou durée maximale dépassée)."""
+
+
+def iter_sse_events(response):
+    """Itère sur les objets JSON d'un flux `text/event-stream` jusqu'au marqueur [DONE]."""
+    if response.encoding is None:
+        response.encoding = "utf-8"
+    for raw_line in response.iter_lines(decode_unicode=True):
+        # Lignes vides = séparateurs d'événements, ':' = commentaires keep-alive
+        if not raw_line or raw_line.startswith(":") or not raw_line.startswith("data:"):
+            continue
+        data = raw_line[5:].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
+
+
+def stream_chat_completion(url, headers, payload, on_delta=None, connect_timeout=10,
+                           stall_timeout=30, max_duration=600, client=None,
+                           cancel_event=None):
+    """
+    Envoie une requête Chat Completions avec `stream: true` et consomme les tokens au fil de l'eau.
+
+    `on_delta` est appelé avec chaque fragment de texte reçu. Le `stall_timeout` s'applique
+    entre deux lectures sur la socket : un flux bloqué est coupé sans attendre la durée totale.
+    Retourne (texte complet, statistiques) ; les statistiques contiennent le temps jusqu'au
+    premier token (`ttft`), la durée totale, le nombre de fragments, le `finish_reason` et le
+    bloc `usage` du dernier événement. Le flux est inscrit au registre des tokens, même coupé.
+    La requête passe par le client HTTP partagé (`client`) pour réutiliser ses connexions.
+    Si `cancel_event` (un `threading.Event`) est levé, le flux est fermé au fragment suivant.
+    """
+    client = client or get_client()
+    payload = dict(payload, stream=True)
+    headers = dict(headers, Accept="text/event-stream")
+    started = time.monotonic()
+    stats = {"ttft": None, "total": None, "chunks": 0, "finish_reason": None, "usage": None}
+    parts = []
+
+    with client.post(url, headers=headers, json=payload, stream=True, idempotent=True,
+                     timeout=(connect_timeout, stall_timeout)) as response:
+        response.raise_for_status()
+        stats["status_code"] = response.status_code
+        status = "aborted"
+        try:
+            for event in iter_sse_events(response):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise StreamAborted("Mistral stream cancelled.")
+                if time.monotonic() - started > max_duration:
+                    raise StreamAborted(f"Mistral stream exceeded {max_duration}s, aborting.")
+                if event.get("usage"):
+                    stats["usage"] = event["usage"]
+                choices = event.get("choices") or []
+                if not choices:
+                    continue
+                choice = choices[0]
+                delta = (choice.get("delta") or {}).get("content")
+                if delta:
+                    if stats["ttft"] is None:
+                        stats["ttft"] = time.monotonic() - started
+                    stats["chunks"] += 1
+                    parts.append(delta)
+                    if on_delta is not None:
+                        on_delta(delta)
+                if choice.get("finish_reason"):
+                    stats["finish_reason"] = choice["finish_reason"]
+            status = "ok"
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+            # requests remonte un délai de lecture dépassé pendant l'itération en ConnectionError
+            raise StreamAborted(f"Mistral stream stalled or was cut (stall timeout {stall_timeout}s): {e}") from e
+        finally:
+            # Un flux coupé a tout de même consommé des tokens (estimés d'après le texte reçu)
+            record_call("stream", payload, stats["usage"], time.monotonic() - started, "".join(parts),
+                        stats["finish_reason"], status)
+
+    stats["total"] = time.monotonic() - started
+    return "".join(parts), stats
+
+
+def chat_completion(url, headers, payload, timeout=None, client=None):
+    """Appel Chat Completions non streamé ; retourne (contenu, finish_reason)."""
+    started = time.monotonic()
+    response = (client or get_client()).post(url, headers=headers, json=payload, timeout=timeout, idempotent=True)
+    response.raise_for_status()
+    data = response.json()
+    try:
+        choice = data["choices"][0]
+        content = choice["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise ValueError(f"Mistral AI response does not contain the expected chat completions format: {str(data)[:300]}")
+    record_call("completion", payload, data.get("usage"), time.monotonic() - started, content,
+                choice.get("finish_reason"))
+    annotate(status_code=response.status_code, finish_reason=choice.get("finish_reason"), bytes=len(content))
+    return content, choice.get("finish_reason")
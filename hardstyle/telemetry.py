@@ -0,0 +1,259 @@
+"""
+Traces et métriques des exécutions : spans horodatés (test d'authentification, construction du
+prompt, génération, nettoyage, insertion des embeds, publication, requêtes HTTP) portant tailles,
+codes HTTP et statut, exportés en fin d'exécution dans un fichier local.
+
+    HARDSTYLE_TRACE_FILE=.cache/trace.jsonl            # un span JSON par ligne (ajout)
+    HARDSTYLE_TRACE_FORMAT=openmetrics                 # ou agrégats au format OpenMetrics (réécrit)
+
+Sans HARDSTYLE_TRACE_FILE, les spans ne servent qu'au résumé affiché en fin d'exécution.
+Le vidage des payloads de debug est lui aussi optionnel (HARDSTYLE_DEBUG_PAYLOADS) et tronqué.
+"""
+import atexit
+import collections
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+HARDSTYLE_TRACE_FILE = os.getenv("HARDSTYLE_TRACE_FILE", "")
+HARDSTYLE_TRACE_FORMAT = os.getenv("HARDSTYLE_TRACE_FORMAT", "jsonl").lower()
+HARDSTYLE_DEBUG_PAYLOADS = os.getenv("HARDSTYLE_DEBUG_PAYLOADS", "false").lower() in ("1", "true", "yes")
+# Longueur maximale de chaque chaîne d'un payload affiché en debug
+HARDSTYLE_DEBUG_MAX_CHARS = int(os.getenv("HARDSTYLE_DEBUG_MAX_CHARS", "300"))
+
+TRACE_FORMATS = ("jsonl", "openmetrics")
+# Spans conservés en mémoire (les plus anciens sont oubliés au-delà, ex. processus de longue durée)
+MAX_BUFFERED_SPANS = 10000
+METRIC_PREFIX = "hardstyle"
+
+
+class Span:
+    def __init__(self, span_id, name, parent_id=None, attributes=None):
+        self.id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def to_dict(self):
+        return {
+            "span_id": self.id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round((self.duration or 0.0) * 1e3, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.context = {}                   # attributs communs à toute l'exécution (ex. bot)
+        self.spans = collections.deque(maxlen=MAX_BUFFERED_SPANS)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()     # pile des spans ouverts, par thread (mode batch)
+
+    def bind(self, **context):
+        self.context.update(context)
+
+    def current(self):
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Mesure le bloc ; une exception (y compris sys.exit) marque le span en erreur puis est relevée."""
+        parent = self.current()
+        span = Span(next(self._ids), name, parent.id if parent else None, attributes)
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def record(self, name, seconds, **attributes):
+        """Ajoute un span déjà mesuré (ex. temps de nettoyage cumulé sur toutes les lignes)."""
+        parent = self.current()
+        span = Span(next(self._ids), name, parent.id if parent else None, attributes)
+        span.start -= seconds
+        span.duration = seconds
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def summary(self):
+        """Agrégats par nom de span : {nom: {"count", "errors", "seconds"}}, dans l'ordre d'apparition."""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in sorted(spans, key=lambda s: s.start):
+            entry = totals.setdefault(span.name, {"count": 0, "errors": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["errors"] += span.status != "ok"
+            entry["seconds"] += span.duration or 0.0
+        return totals
+
+    def export(self, path=HARDSTYLE_TRACE_FILE, fmt=HARDSTYLE_TRACE_FORMAT):
+        if not path:
+            return
+        if fmt not in TRACE_FORMATS:
+            print(f"⚠️ Unknown trace format '{fmt}', falling back to 'jsonl'.")
+            fmt = "jsonl"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            spans = list(self.spans)
+        if fmt == "jsonl":
+            with open(path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    record = {"run_id": self.run_id, **self.context, **span.to_dict()}
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        else:
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.openmetrics())
+            os.replace(tmp_path, path)
+        print(f"DEBUG: {len(spans)} span(s) written to {path} ({fmt}).")
+
+    def openmetrics(self):
+        """Agrégats au format texte OpenMetrics (durées, erreurs, octets par span)."""
+        labels = "".join(f',{key}="{_escape_label(value)}"' for key, value in sorted(self.context.items()))
+        summary = self.summary()
+        bytes_by_span = {}
+        with self._lock:
+            for span in self.spans:
+                size = span.attributes.get("bytes")
+                if isinstance(size, (int, float)):
+                    bytes_by_span[span.name] = bytes_by_span.get(span.name, 0) + size
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_span_duration_seconds summary",
+            f"# UNIT {METRIC_PREFIX}_span_duration_seconds seconds",
+            f"# HELP {METRIC_PREFIX}_span_duration_seconds Wall time spent in each traced phase.",
+        ]
+        for name, entry in summary.items():
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_count{{span="{name}"{labels}}} {entry["count"]}')
+            lines.append(f'{METRIC_PREFIX}_span_duration_seconds_sum{{span="{name}"{labels}}} {entry["seconds"]:.6f}')
+        lines += [
+            f"# TYPE {METRIC_PREFIX}_span_errors counter",
+            f"# HELP {METRIC_PREFIX}_span_errors Traced phases that ended with an error.",
+        ]
+        for name, entry in summary.items():
+            lines.append(f'{METRIC_PREFIX}_span_errors_total{{span="{name}"{labels}}} {entry["errors"]}')
+        if bytes_by_span:
+            lines += [
+                f"# TYPE {METRIC_PREFIX}_span_payload_bytes counter",
+                f"# UNIT {METRIC_PREFIX}_span_payload_bytes bytes",
+                f"# HELP {METRIC_PREFIX}_span_payload_bytes Bytes handled by each traced phase.",
+            ]
+            for name, size in bytes_by_span.items():
+                lines.append(f'{METRIC_PREFIX}_span_payload_bytes_total{{span="{name}"{labels}}} {size}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Tracer partagé du processus ; exporté automatiquement à la sortie si HARDSTYLE_TRACE_FILE est défini."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            if HARDSTYLE_TRACE_FILE:
+                atexit.register(_tracer.export)
+        return _tracer
+
+
+def span(name, **attributes):
+    return get_tracer().span(name, **attributes)
+
+
+def record_span(name, seconds, **attributes):
+    return get_tracer().record(name, seconds, **attributes)
+
+
+def annotate(**attributes):
+    """Ajoute des attributs au span ouvert du thread courant (sans effet hors span)."""
+    current = get_tracer().current()
+    if current is not None:
+        current.set(**attributes)
+
+
+def traced(name, **attributes):
+    """Décorateur : exécute la fonction dans un span `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def print_trace_summary(tracer=None):
+    """Affiche le temps passé par phase (une ligne), à la manière de print_connection_stats."""
+    summary = (tracer or get_tracer()).summary()
+    if not summary:
+        return
+    phases = ", ".join(
+        f"{name} {entry['seconds']:.2f}s" + (f" x{entry['count']}" if entry["count"] > 1 else "")
+        + (f" ({entry['errors']} error(s))" if entry["errors"] else "")
+        for name, entry in summary.items()
+    )
+    print(f"DEBUG: Phase timings: {phases}.")
+
+
+def truncate_payload(data, max_chars=HARDSTYLE_DEBUG_MAX_CHARS):
+    """Copie de `data` où chaque chaîne trop longue est coupée et suffixée de sa taille réelle."""
+    if isinstance(data, str):
+        if len(data) <= max_chars:
+            return data
+        return f"{data[:max_chars]}... [{len(data)} chars]"
+    if isinstance(data, dict):
+        return {key: truncate_payload(value, max_chars) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [truncate_payload(value, max_chars) for value in data]
+    return data
+
+
+def debug_payload(label, data):
+    """Affiche `data` tronqué si HARDSTYLE_DEBUG_PAYLOADS est activé, sinon seulement sa taille."""
+    if not HARDSTYLE_DEBUG_PAYLOADS:
+        size = len(json.dumps(data, ensure_ascii=False, default=str))
+        print(f"DEBUG: {label}: {size} chars (set HARDSTYLE_DEBUG_PAYLOADS=true to dump it).")
+        return
+    print(f"DEBUG: {label}: {json.dumps(truncate_payload(data), indent=2, ensure_ascii=False, default=str)}")
@@ -0,0 +1,145 @@
+"""
+Transports HTTP enregistrement / rejeu (« cassettes ») pour exécuter les bots sans réseau.
+
+En mode `record`, chaque échange réel (test d'authentification, génération Mistral,
+mutation publishPost) est ajouté à un fichier JSON. En mode `replay`, les réponses sont
+servies depuis ce fichier : aucune connexion n'est ouverte et aucun token n'est consommé.
+Les requêtes sont appariées sur méthode + URL + corps JSON normalisé (clés triées) ;
+les en-têtes (et donc les clés d'API) ne sont jamais enregistrés.
+"""
+import http
+import io
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_VERSION = 1
+
+# En-têtes de réponse conservés dans les cassettes (les autres sont sans intérêt au rejeu)
+RECORDED_RESPONSE_HEADERS = ("content-type", "retry-after")
+RECORDED_HEADER_PREFIXES = ("x-ratelimit", "ratelimit")
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Aucune interaction enregistrée ne correspond à la requête en mode rejeu."""
+
+
+def normalize_body(body):
+    """Forme canonique du corps d'une requête : JSON trié et compact si possible, texte sinon."""
+    if body is None:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        return body
+
+
+def request_key(method, url, body):
+    return f"{method.upper()} {url}\n{normalize_body(body)}"
+
+
+def _keep_header(name):
+    name = name.lower()
+    return name in RECORDED_RESPONSE_HEADERS or name.startswith(RECORDED_HEADER_PREFIXES)
+
+
+def build_response(request, status, headers, body):
+    """Construit une `requests.Response` à partir d'une interaction enregistrée."""
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = io.BytesIO(body.encode("utf-8"))
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    try:
+        response.reason = http.HTTPStatus(status).phrase
+    except ValueError:
+        response.reason = ""
+    return response
+
+
+class Cassette:
+    """Fichier JSON d'interactions ; plusieurs réponses pour une même requête sont servies dans l'ordre."""
+
+    def __init__(self, path):
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+        self._cursors = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.interactions = json.load(f).get("interactions", [])
+        self._index = {}
+        for interaction in self.interactions:
+            self._index.setdefault(interaction["request"]["key"], []).append(interaction["response"])
+
+    def find(self, key):
+        with self._lock:
+            responses = self._index.get(key)
+            if not responses:
+                return None
+            position = self._cursors.get(key, 0)
+            # Au-delà des réponses enregistrées, la dernière est rejouée
+            self._cursors[key] = position + 1
+            return responses[min(position, len(responses) - 1)]
+
+    def append(self, key, method, url, response):
+        with self._lock:
+            self.interactions.append({"request": {"key": key, "method": method, "url": url}, "response": response})
+            self._index.setdefault(key, []).append(response)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": CASSETTE_VERSION, "interactions": self.interactions}, f,
+                          indent=1, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+class ReplayAdapter(BaseAdapter):
+    """Sert les réponses depuis une cassette, sans aucun accès réseau."""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.url, request.body)
+        recorded = self.cassette.find(key)
+        if recorded is None:
+            raise CassetteMiss(f"No recorded interaction for {request.method} {request.url} "
+                               f"in {self.cassette.path} (body: {normalize_body(request.body)[:200]}...)",
+                               request=request)
+        return build_response(request, recorded["status"], recorded["headers"], recorded["body"])
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Envoie les requêtes réelles et ajoute chaque échange à la cassette."""
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        # Le corps (y compris un flux SSE) est lu en entier pour être enregistré
+        body = response.content.decode("utf-8", errors="replace")
+        recorded = {
+            "status": response.status_code,
+            "headers": {name: value for name, value in response.headers.items() if _keep_header(name)},
+            "body": body,
+        }
+        key = request_key(request.method, request.url, request.body)
+        self.cassette.append(key, request.method, request.url, recorded)
+        return build_response(request, recorded["status"], recorded["headers"], body)
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import random
+import sys
+from datetime import date
+
+import daily_hardstyle_bot
+import weekly_hardstyle_ranking_bot
+from hardstyle.backfill import (BACKFILL_CONCURRENCY, BACKFILL_POSTPROCESS_WORKERS, BACKFILL_PUBLISH_INTERVAL,
+                                BackfillCheckpoint, GENERATED, PUBLISHED, backfill_days, deferred_postprocess,
+                                run_backfill)
+from hardstyle.dedup import open_duplicate_index
+from hardstyle.http_client import print_connection_stats
+from hardstyle.outbox import Outbox
+from hardstyle.telemetry import get_tracer, print_trace_summary
+
+# Heure de publication (UTC) des posts antidatés, comme les workflows GitHub Actions
+PUBLISH_HOURS = {"daily": "03:00:00", "weekly": "04:00:00"}
+
+
+def generator_for(bot):
+    """`generate(day, cancel_event)` : sujet (ou artistes) tiré de façon reproductible pour chaque date."""
+    if bot == "daily":
+        def generate(day, cancel_event):
+            topic = random.Random(f"daily-{day.isoformat()}").choice(daily_hardstyle_bot.HARDSTYLE_TOPICS)
+            return daily_hardstyle_bot.generate_daily_hardstyle_article(
+                topic, cancel_event=cancel_event, exit_on_error=False, postprocess=False)
+        return generate
+
+    def generate(day, cancel_event):
+        # Classement de la semaine de `day` si WEEKLY_SIGNALS_FILE en a les signaux
+        artists = weekly_hardstyle_ranking_bot.select_artists_for_prompt(rng=random.Random(f"weekly-{day.isoformat()}"),
+                                                                          week=day)
+        return weekly_hardstyle_ranking_bot.generate_weekly_ranking_article(
+            artists, cancel_event=cancel_event, exit_on_error=False, postprocess=False)
+    return generate
+
+
+def publisher_for(bot, module):
+    def publish(content, day):
+        return module.publish_article(content, exit_on_error=False,
+                                      published_at=f"{day.isoformat()}T{PUBLISH_HOURS[bot]}Z")
+    return publish
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate (and publish) Hardstyle articles for a past date range.")
+    parser.add_argument("bot", choices=("daily", "weekly"))
+    parser.add_argument("--from", dest="start", required=True, type=date.fromisoformat, metavar="YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", default=date.today(), type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="last date included (default: today)")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY,
+                        help="generations in parallel (default: BACKFILL_CONCURRENCY)")
+    parser.add_argument("--publish-interval", type=float, default=BACKFILL_PUBLISH_INTERVAL,
+                        help="minimum delay between two Hashnode publications, in seconds")
+    parser.add_argument("--workers", type=int, default=BACKFILL_POSTPROCESS_WORKERS,
+                        help="post-processing processes (default: one per CPU)")
+    parser.add_argument("--no-publish", action="store_true",
+                        help="only generate: articles stay in the outbox until a later run publishes them")
+    args = parser.parse_args()
+
+    module = daily_hardstyle_bot if args.bot == "daily" else weekly_hardstyle_ranking_bot
+    try:
+        days = backfill_days(args.start, args.end, weekly=args.bot == "weekly")
+    except ValueError as e:
+        print(f"❌ Invalid date range: {e}")
+        sys.exit(1)
+    if not days:
+        print("⚠️ No date to backfill in this range.")
+        return
+
+    print(f"Starting Hardstyle backfill ({args.bot}).")
+    module.validate_environment()
+    module.ensure_mistral_auth()
+    get_tracer().bind(bot=f"backfill-{args.bot}")
+
+    checkpoint = BackfillCheckpoint()
+    outbox = Outbox()
+    try:
+        states = asyncio.run(run_backfill(
+            args.bot, days,
+            generator_for(args.bot),
+            deferred_postprocess(module.postprocess_options()),
+            publisher_for(args.bot, module),
+            checkpoint, outbox,
+            # Nom distinct dans l'outbox : une exécution normale ne republie pas un article du backfill
+            outbox_bot=f"backfill-{module.BOT_NAME}",
+            concurrency=args.concurrency,
+            publish_interval=args.publish_interval,
+            workers=args.workers,
+            publish_enabled=not args.no_publish,
+            index=open_duplicate_index(outbox),
+            lookup=module.find_published_post
+        ))
+    finally:
+        checkpoint.close()
+
+    done = PUBLISHED if not args.no_publish else GENERATED
+    remaining = [day.isoformat() for day, state in states.items() if state != PUBLISHED and state != done]
+    print_connection_stats()
+    print_trace_summary()
+    if remaining:
+        print(f"\n⚠️ Backfill incomplete, {len(remaining)} item(s) left (rerun the same command to resume): "
+              f"{', '.join(remaining)}")
+        sys.exit(1)
+    print(f"\n🎉 Hardstyle backfill completed: {len(states)} item(s).")
+
+
+if __name__ == "__main__":
+    main()
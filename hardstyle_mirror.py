@@ -0,0 +1,63 @@
+import argparse
+import sys
+
+import requests
+
+import weekly_hardstyle_ranking_bot as bot
+from hardstyle.hashnode import HashnodeError
+from hardstyle.mirror import HashnodeMirror
+from hardstyle.telemetry import get_tracer, print_trace_summary
+
+
+def print_posts(rows):
+    if not rows:
+        print("No post found.")
+    for row in rows:
+        print(f"{(row['published_at'] or '')[:10]}  {row['slug']}  {row['title']}\n            {row['url']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mirror of the Hashnode publication archive.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync = commands.add_parser("sync", help="pull new or updated posts from Hashnode")
+    sync.add_argument("--full", action="store_true",
+                      help="re-read the whole publication (edits of old posts, deletions)")
+    find = commands.add_parser("find", help="look up mirrored posts")
+    lookup = find.add_mutually_exclusive_group(required=True)
+    lookup.add_argument("--slug")
+    lookup.add_argument("--tag", help="tag slug, e.g. xceed")
+    lookup.add_argument("--artist", help="artist of the roster mentioned in the post")
+    lookup.add_argument("--latest", type=int, metavar="N")
+    args = parser.parse_args()
+
+    get_tracer().bind(bot="mirror")
+    mirror = HashnodeMirror(artists=bot.get_roster().names)
+    try:
+        if args.command == "sync":
+            if not bot.HASHNODE_API_KEY:
+                print("❌ ERREUR : HASHNODE_API_KEY n'est pas défini.")
+                sys.exit(1)
+            try:
+                result = mirror.sync(bot.HASHNODE_API_URL, bot.hashnode_headers(), bot.HARDSTYLE_PUBLICATION_ID,
+                                     full=args.full)
+            except (HashnodeError, requests.exceptions.RequestException) as e:
+                print(f"❌ Hashnode mirror sync failed (progress is kept for the next sync): {e}")
+                sys.exit(1)
+            print(f"✅ Mirror up to date ({result['mode']} sync, {result['requests']} request(s), "
+                  f"{result['updated']} updated, {result['removed']} removed, {len(mirror)} post(s)).")
+            print_trace_summary()
+        elif args.slug:
+            row = mirror.by_slug(args.slug)
+            print_posts([row] if row is not None else [])
+        elif args.tag:
+            print_posts(mirror.by_tag(args.tag))
+        elif args.artist:
+            print_posts(mirror.mentioning(args.artist))
+        else:
+            print_posts(mirror.latest(args.latest))
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import signal
+import sys
+
+import daily_hardstyle_bot
+import weekly_hardstyle_ranking_bot
+from hardstyle.http_client import print_connection_stats
+from hardstyle.scheduler import (CronError, Job, SCHEDULER_HEALTH_HOST, SCHEDULER_HEALTH_PORT, SCHEDULER_JITTER,
+                                 Scheduler, start_health_server)
+from hardstyle.telemetry import get_tracer, print_trace_summary
+
+# --- Planification (UTC, mêmes horaires que les workflows GitHub Actions) ---
+DAILY_CRON = os.getenv("DAILY_CRON", "0 3 * * *")
+WEEKLY_CRON = os.getenv("WEEKLY_CRON", "0 4 * * MON")
+
+# Bots hébergés par le démon : nom du job -> (module, expression cron)
+BOTS = {
+    "daily": (daily_hardstyle_bot, DAILY_CRON),
+    "weekly": (weekly_hardstyle_ranking_bot, WEEKLY_CRON),
+}
+
+
+def make_job_runner(module):
+    """Une exécution planifiée : test d'authentification (en cache) puis une publication complète."""
+    def run():
+        module.ensure_mistral_auth()
+        module.publish_next_article(exit_on_error=False)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hardstyle scheduler daemon (daily + weekly bots in one process).")
+    parser.add_argument("--jobs", default=",".join(BOTS), help="comma-separated jobs to host (default: daily,weekly)")
+    parser.add_argument("--jitter", type=float, default=SCHEDULER_JITTER,
+                        help="random delay added to each run, in seconds (default: SCHEDULER_JITTER)")
+    parser.add_argument("--health-host", default=SCHEDULER_HEALTH_HOST)
+    parser.add_argument("--health-port", type=int, default=SCHEDULER_HEALTH_PORT,
+                        help="health/control endpoint port, 0 to disable")
+    parser.add_argument("--run-now", action="append", default=[], metavar="JOB",
+                        help="run JOB immediately after start-up (repeatable)")
+    args = parser.parse_args()
+
+    print("Starting Hardstyle scheduler daemon.")
+    names = [name.strip() for name in args.jobs.split(",") if name.strip()]
+    unknown = [name for name in names + args.run_now if name not in BOTS]
+    if unknown:
+        print(f"❌ Unknown job(s): {', '.join(unknown)}. Available jobs: {', '.join(BOTS)}.")
+        sys.exit(1)
+
+    # Les deux bots partagent les mêmes clés : une seule vérification au démarrage
+    daily_hardstyle_bot.validate_environment()
+    get_tracer().bind(bot="scheduler")
+    try:
+        jobs = [Job(name, BOTS[name][1], make_job_runner(BOTS[name][0]), jitter=args.jitter) for name in names]
+    except CronError as e:
+        print(f"❌ Invalid cron expression: {e}")
+        sys.exit(1)
+
+    scheduler = Scheduler(jobs)
+    # Arrêt propre sur SIGTERM / Ctrl+C : le job en cours se termine avant la sortie
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: scheduler.stop())
+    try:
+        server = start_health_server(scheduler, args.health_host, args.health_port) if args.health_port else None
+    except (ValueError, OSError) as e:
+        print(f"❌ Could not start the scheduler health endpoint: {e}")
+        sys.exit(1)
+    for name in args.run_now:
+        scheduler.trigger(name)
+
+    scheduler.run_forever()
+
+    if server is not None:
+        server.shutdown()
+    print_connection_stats()
+    print_trace_summary()
+    print("\n🎉 Hardstyle scheduler daemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
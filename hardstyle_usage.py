@@ -0,0 +1,56 @@
+import argparse
+import sys
+import time
+
+from hardstyle.ledger import describe_regression, get_ledger
+
+
+def format_cost(cost):
+    return "—" if cost is None else f"${cost:.4f}"
+
+
+def print_report(jobs, days):
+    if not jobs:
+        print(f"No Mistral call recorded in the last {days:g} day(s).")
+        return
+    for name, entry in sorted(jobs.items()):
+        print(f"\n{name}: {entry['calls']} call(s), {entry['generations']} generation(s), "
+              f"{entry['published']} published article(s)")
+        print(f"  tokens: {entry['prompt_tokens']} prompt + {entry['completion_tokens']} completion")
+        print(f"  cost  : {format_cost(entry['cost'])}"
+              + (f" ({entry['unpriced']} call(s) without a known price)" if entry["unpriced"] else ""))
+        print(f"  cost per generation: {format_cost(entry['cost_per_generation'])}, "
+              f"per published article: {format_cost(entry['cost_per_article'])}")
+        for model, stats in sorted(entry["models"].items(), key=lambda item: str(item[0])):
+            speed = "—" if stats["tokens_per_second"] is None else f"{stats['tokens_per_second']:.1f} tokens/s"
+            print(f"    {model}: {stats['calls']} call(s), {stats['prompt_tokens'] + stats['completion_tokens']} "
+                  f"tokens, {format_cost(stats['cost'])}, median {speed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mistral AI token usage and cost ledger.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="tokens and cost per job, model and published article")
+    report.add_argument("--days", type=float, default=30, help="period covered by the report (default: 30)")
+    report.add_argument("--job", help="daily or weekly (default: all)")
+    check = commands.add_parser("check", help="flag throughput or token efficiency regressions")
+    check.add_argument("--job", help="daily or weekly (default: all)")
+    args = parser.parse_args()
+
+    ledger = get_ledger()
+    try:
+        if args.command == "report":
+            print_report(ledger.report(since=time.time() - args.days * 86400, job=args.job), args.days)
+        else:
+            findings = ledger.regressions(args.job)
+            for finding in findings:
+                print(f"⚠️ {describe_regression(finding)}")
+            if findings:
+                sys.exit(1)
+            print("✅ No throughput or token efficiency regression against the rolling baseline.")
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""Accès aux modules du dépôt et aux services factices de `benchmarks/` depuis les tests."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
@@ -0,0 +1,131 @@
+"""Backfill d'un historique d'articles : dates, étapes enregistrées et reprise."""
+import asyncio
+import threading
+from datetime import date
+
+import pytest
+
+from hardstyle.backfill import GENERATED, PENDING, PUBLISHED, BackfillCheckpoint, backfill_days, run_backfill
+from hardstyle.dedup import DuplicateIndex
+from hardstyle.outbox import Outbox
+
+DAYS = backfill_days(date(2025, 6, 1), date(2025, 6, 4))
+
+
+def article(day):
+    words = " ".join(f"{day.isoformat()}-word{index}" for index in range(60))
+    return f"# Hardstyle news {day.isoformat()}\n\n{words}"
+
+
+class Generator:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.days = []
+        self._lock = threading.Lock()
+
+    def __call__(self, day, cancel_event):
+        with self._lock:
+            self.days.append(day)
+        if day in self.fail:
+            raise ValueError("empty completion")
+        return article(day)
+
+
+class Publisher:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.days = []
+
+    def __call__(self, content, day):
+        self.days.append(day)
+        if day in self.fail:
+            raise ConnectionError("Hashnode unreachable")
+        return f"https://hardstyle.example/{day.isoformat()}"
+
+
+@pytest.fixture
+def stores(tmp_path):
+    checkpoint = BackfillCheckpoint(str(tmp_path / "backfill.sqlite3"))
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    yield checkpoint, outbox
+    checkpoint.close()
+    outbox.close()
+
+
+def backfill(stores, generate, publish, days=DAYS, **options):
+    checkpoint, outbox = stores
+    options = {"concurrency": 2, "publish_interval": 0, "workers": 1, **options}
+    return asyncio.run(run_backfill("daily", days, generate, str.strip, publish, checkpoint, outbox, "daily",
+                                    **options))
+
+
+def test_backfill_days():
+    assert DAYS == [date(2025, 6, 1), date(2025, 6, 2), date(2025, 6, 3), date(2025, 6, 4)]
+    # Classement hebdomadaire : chaque lundi de la plage
+    assert backfill_days(date(2025, 6, 4), date(2025, 6, 30), weekly=True) == [
+        date(2025, 6, 9), date(2025, 6, 16), date(2025, 6, 23), date(2025, 6, 30)]
+    with pytest.raises(ValueError):
+        backfill_days(date(2025, 6, 4), date(2025, 6, 1))
+
+
+def test_every_day_is_generated_and_published(stores):
+    publish = Publisher()
+    states = backfill(stores, Generator(), publish)
+    assert states == {day: PUBLISHED for day in DAYS}
+    assert sorted(publish.days) == DAYS
+    checkpoint, outbox = stores
+    assert [row["post_url"] for row in checkpoint.load("daily", DAYS)] == [
+        f"https://hardstyle.example/{day.isoformat()}" for day in DAYS]
+    assert outbox.pending("daily") == []
+
+
+def test_failures_are_resumed_without_regenerating(stores):
+    failing_day, unpublished_day = DAYS[1], DAYS[2]
+    states = backfill(stores, Generator(fail=[failing_day]), Publisher(fail=[unpublished_day]))
+    assert states[failing_day] == PENDING
+    assert states[unpublished_day] == GENERATED
+    checkpoint, _ = stores
+    rows = {row["day"]: row for row in checkpoint.load("daily", DAYS)}
+    assert rows[failing_day.isoformat()]["attempts"] == 1
+    assert "empty completion" in rows[failing_day.isoformat()]["last_error"]
+
+    # Reprise : seul le jour en échec est généré, l'article non publié vient de l'outbox
+    generate, publish = Generator(), Publisher()
+    states = backfill(stores, generate, publish)
+    assert states == {day: PUBLISHED for day in DAYS}
+    assert generate.days == [failing_day]
+    assert sorted(publish.days) == [failing_day, unpublished_day]
+
+
+def test_generation_only_keeps_articles_in_the_outbox(stores):
+    states = backfill(stores, Generator(), Publisher(), publish_enabled=False)
+    assert states == {day: GENERATED for day in DAYS}
+    _, outbox = stores
+    assert len(outbox.pending("daily")) == len(DAYS)
+
+
+def test_near_duplicates_are_rejected(stores, tmp_path):
+    index = DuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    try:
+        index.add(article(DAYS[0]), "daily")
+        states = backfill(stores, Generator(), Publisher(), index=index)
+    finally:
+        index.close()
+    assert states[DAYS[0]] == PENDING
+    assert all(states[day] == PUBLISHED for day in DAYS[1:])
+
+
+def test_slow_generation_times_out_and_is_cancelled(stores):
+    cancelled = []
+    finished = threading.Event()
+
+    def generate(day, cancel_event):
+        if day == DAYS[0]:
+            cancelled.append(cancel_event.wait(5))
+            finished.set()
+        return article(day)
+
+    states = backfill(stores, generate, Publisher(), task_timeout=0.2)
+    assert states[DAYS[0]] == PENDING
+    assert finished.wait(5) and cancelled == [True]
+    assert all(states[day] == PUBLISHED for day in DAYS[1:])
@@ -0,0 +1,116 @@
+"""Classement hebdomadaire calculé sur les signaux par artiste."""
+import datetime
+
+import numpy as np
+import pytest
+
+from hardstyle.charts import SignalTable, parse_week, rank_week, week_index, week_start
+
+WEEK = datetime.date(2025, 6, 2)
+STREAMS_ONLY = {"streams": 1.0}
+
+CSV = """artist,week,streams,chart_position,playlist_adds,festival_bookings
+Sub Zero Project,2025-05-26,1000,20,5,1
+Sub Zero Project,2025-06-02,1000,10,5,1
+sub  zero project,2025-06-04,500,,,
+Da Tweekaz,2025-W22,4000,3,10,2
+Da Tweekaz,2025-W23,2000,8,4,0
+Rising Star,2025-06-02,3000,40,20,0
+Quiet Act,2025-05-26,50,,,
+"""
+
+
+def table_of(rows):
+    """SignalTable à partir de (artiste, semaine, streams) : seul le signal des streams est renseigné."""
+    artists = sorted({artist for artist, _, _ in rows})
+    values = [[streams, 0, 0, 0] for _, _, streams in rows]
+    return SignalTable(artists, [artists.index(artist) for artist, _, _ in rows],
+                       [week_index(week) for _, week, _ in rows], values)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "signals.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+
+def test_week_parsing():
+    assert parse_week("2025-06-04") == parse_week("2025-W23") == parse_week("2025W23") == week_index(WEEK)
+    assert week_start(week_index(datetime.date(2025, 6, 8))) == WEEK
+
+
+def test_csv_rows_are_summed_per_artist_and_week(csv_path):
+    table = SignalTable.load(csv_path, cache=False)
+    assert table.artists == ["Sub Zero Project", "Da Tweekaz", "Rising Star", "Quiet Act"]
+    totals = table.totals(week_index(WEEK), weeks=2, chart_size=100)
+    # Streams de la semaine (2 lignes pour Sub Zero Project) puis de la précédente
+    assert totals[0, :, 0].tolist() == [1500, 2000, 3000, 0]
+    assert totals[1, :, 0].tolist() == [1000, 4000, 0, 50]
+    # Position 10 sur 100 : 91 points de classement
+    assert totals[0, 0, 1] == 91
+
+
+def test_invalid_csv(tmp_path):
+    path = tmp_path / "signals.csv"
+    path.write_text("artist,streams\nXCEED,10\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        SignalTable.load(str(path), cache=False)
+    path.write_text("artist,week,streams\nXCEED,not-a-week,10\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=":2:"):
+        SignalTable.load(str(path), cache=False)
+
+
+def test_cached_table_matches_the_file(csv_path, tmp_path, monkeypatch):
+    monkeypatch.setattr("hardstyle.storage.CACHE_DIR", str(tmp_path / "cache"))
+    first = SignalTable.load(csv_path)
+    second = SignalTable.load(csv_path)
+    assert second.artists == first.artists
+    assert np.array_equal(second.values, first.values) and np.array_equal(second.weeks, first.weeks)
+    assert not [name for name in (tmp_path / "cache").iterdir() if name.suffix != ".npz" or ".tmp" in name.name]
+
+
+def test_level_and_momentum():
+    previous, current = WEEK - datetime.timedelta(days=7), WEEK
+    table = table_of([
+        ("Steady", previous, 5000), ("Steady", current, 5000),
+        ("Rising", previous, 500), ("Rising", current, 2000),
+        ("Small", previous, 100), ("Small", current, 100),
+    ])
+    assert list(rank_week(table, week=WEEK, weights=STREAMS_ONLY, mix=0.0)) == ["Steady", "Rising", "Small"]
+    assert list(rank_week(table, week=WEEK, weights=STREAMS_ONLY, mix=1.0))[0] == "Rising"
+
+
+def test_entries_carry_scores_signals_and_previous_rank(csv_path):
+    table = SignalTable.load(csv_path, cache=False)
+    ranking = rank_week(table, week=WEEK, weights=STREAMS_ONLY, mix=0.0)
+    assert ranking.week == WEEK
+    # Quiet Act n'a rien cette semaine mais reste classé (activité la semaine précédente)
+    assert list(ranking) == ["Rising Star", "Da Tweekaz", "Sub Zero Project", "Quiet Act"]
+    first = ranking.entries[0]
+    assert first["rank"] == 1 and first["previous_rank"] is None
+    assert first["signals"]["streams"] == (3000.0, 0.0)
+    assert first["best_position"] == (40, None)
+    assert ranking.entries[1]["previous_rank"] == 1
+    assert ranking.entries[1]["best_position"] == (8, 3)
+    assert ranking.entries[3]["signals"]["streams"] == (0.0, 50.0)
+
+
+def test_eligible_size_and_pinned(csv_path):
+    table = SignalTable.load(csv_path, cache=False)
+    eligible = table.mask(["Da Tweekaz", "Sub Zero Project", "Quiet Act"])
+    assert list(rank_week(table, week=WEEK, weights=STREAMS_ONLY, mix=0.0, eligible=eligible, size=2)) == [
+        "Da Tweekaz", "Sub Zero Project"]
+    # Un artiste épinglé prend la dernière place ; absent des données, il est ajouté sans chiffres
+    ranking = rank_week(table, week=WEEK, weights=STREAMS_ONLY, mix=0.0, size=2, pinned=("Quiet Act", "XCEED"))
+    assert list(ranking) == ["Quiet Act", "XCEED"]
+    assert ranking.entries[1]["score"] is None and ranking.entries[1]["signals"] is None
+    ranking = rank_week(table, week=WEEK, weights=STREAMS_ONLY, mix=0.0, size=3, pinned=("Quiet Act",))
+    assert list(ranking) == ["Rising Star", "Da Tweekaz", "Quiet Act"]
+
+
+def test_no_data_for_the_week():
+    table = table_of([("Steady", WEEK, 10)])
+    assert rank_week(table, week=WEEK + datetime.timedelta(days=14)) is None
+    assert rank_week(SignalTable([], [], [], np.empty((0, 4)))) is None
+    assert list(rank_week(table)) == ["Steady"]
@@ -0,0 +1,92 @@
+"""Signatures MinHash et index LSH des quasi-doublons."""
+import random
+
+import pytest
+
+from hardstyle.dedup import DuplicateIndex, estimate_similarity, shingles
+
+WORDS = ("kick melody crowd stage festival raw euphoric anthem drop bassline night energy lights "
+         "reverse screech vocal build-up break tempo hardstyle headliner").split()
+
+
+def article(seed, words=400):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def edit(text, ratio, seed=0):
+    """Remplace une proportion `ratio` des mots du texte."""
+    rng = random.Random(seed)
+    words = text.split()
+    for index in rng.sample(range(len(words)), int(len(words) * ratio)):
+        words[index] = f"changed{index}"
+    return " ".join(words)
+
+
+def jaccard(first, second):
+    first, second = shingles(first), shingles(second)
+    return len(first & second) / len(first | second)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    yield index
+    index.close()
+
+
+def test_shingles_ignore_markup_links_and_embeds():
+    text = "Raw kicks and euphoric melodies tonight on the main stage"
+    noisy = ("**Raw kicks** and [euphoric](https://example.com) melodies tonight https://open.spotify.com/x "
+             "<iframe src='x'>embed</iframe> on the main stage")
+    assert shingles(noisy) == shingles(text)
+    assert shingles("") == set()
+
+
+def test_signature_is_deterministic_and_sized(index):
+    text = article(1)
+    assert index.signature(text) == index.signature(text)
+    assert len(index.signature(text)) == index.num_perm
+    assert index.signature("!!! ---") is None
+
+
+def test_estimated_similarity_tracks_jaccard(index):
+    base = article(2)
+    for ratio in (0.02, 0.1, 0.3):
+        variant = edit(base, ratio)
+        estimate = estimate_similarity(index.signature(base), index.signature(variant))
+        assert abs(estimate - jaccard(base, variant)) < 0.2
+
+
+def test_near_duplicate_is_found_and_distinct_article_is_not(index):
+    base = article(3)
+    digest = index.add(base, "weekly", title="Top 10")
+    assert len(index) == 1 and digest in index
+
+    similarity, found, bot, title = index.check(edit(base, 0.02))
+    assert (found, bot, title) == (digest, "weekly", "Top 10")
+    assert similarity >= index.threshold
+    assert index.check(article(4)) is None
+
+
+def test_add_is_idempotent(index):
+    text = article(5)
+    assert index.add(text, "daily") == index.add(text, "daily")
+    assert len(index) == 1
+
+
+def test_parameter_change_rebuilds_the_index(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    first = DuplicateIndex(path, num_perm=64, bands=16)
+    first.add(article(6), "daily")
+    first.close()
+    second = DuplicateIndex(path, num_perm=32, bands=8)
+    try:
+        assert len(second) == 0
+    finally:
+        second.close()
+
+
+def test_bands_must_divide_permutations(tmp_path):
+    with pytest.raises(ValueError):
+        DuplicateIndex(str(tmp_path / "dedup.sqlite3"), num_perm=64, bands=10)
@@ -0,0 +1,68 @@
+"""Repérage des artistes du roster (automate d'Aho-Corasick)."""
+from hardstyle.entities import EntityLinker, EntityMatcher, slugify
+
+ROSTER = ["Sub Zero Project", "Sub Zero", "D-Block & S-te-Fan", "Da Tweekaz", "Brennan Heart", "Héctor", "XCEED"]
+
+
+def names(matcher, text):
+    return [name for _, _, name in matcher.find(text)]
+
+
+def test_longest_match_wins_on_overlap():
+    matcher = EntityMatcher(ROSTER)
+    assert names(matcher, "Sub Zero Project and Sub Zero.") == ["Sub Zero Project", "Sub Zero"]
+
+
+def test_word_boundaries():
+    matcher = EntityMatcher(["Sub Zero", "XCEED"])
+    assert names(matcher, "Subzero and XCEEDING are not Sub Zeros") == []
+    assert names(matcher, "(XCEED), Sub Zero!") == ["XCEED", "Sub Zero"]
+
+
+def test_case_accents_and_whitespace_are_folded():
+    matcher = EntityMatcher(ROSTER)
+    text = "HECTOR, da\ntweekaz and d-block & s-te-fan"
+    assert names(matcher, text) == ["Héctor", "Da Tweekaz", "D-Block & S-te-Fan"]
+
+
+def test_positions_point_into_the_original_text():
+    matcher = EntityMatcher(ROSTER)
+    text = "Ça démarre : Héctor puis Brennan Heart."
+    spans = [text[start:end] for start, end, _ in matcher.find(text)]
+    assert spans == ["Héctor", "Brennan Heart"]
+
+
+def test_mentions_counts_in_order_of_appearance():
+    matcher = EntityMatcher(ROSTER)
+    text = "XCEED opened, Da Tweekaz followed, then XCEED again."
+    assert matcher.mentions(text) == {"XCEED": 2, "Da Tweekaz": 1}
+
+
+def test_failure_links_recover_partial_matches():
+    # "Sub Zero Pro" n'est pas un nom : l'automate doit retomber sur "Sub Zero" sans relire le texte
+    matcher = EntityMatcher(["Sub Zero Project", "Sub Zero", "Project"])
+    assert names(matcher, "Sub Zero Pro Project") == ["Sub Zero", "Project"]
+
+
+def test_duplicates_canonical_and_empty_roster():
+    matcher = EntityMatcher(["XCEED", "xceed", "  Da  Tweekaz "])
+    assert len(matcher) == 2
+    assert "DA TWEEKAZ" in matcher
+    assert matcher.canonical("da tweekaz") == "Da Tweekaz"
+    assert matcher.canonical("Nobody") is None
+    assert EntityMatcher().find("XCEED") == []
+
+
+def test_slugify():
+    assert slugify("D-Block & S-te-Fan") == "d-block-s-te-fan"
+    assert slugify("Héctor") == "hector"
+
+
+def test_tags_keep_the_base_tags_first():
+    base = [{"name": "Hardstyle", "slug": "hardstyle"}, {"name": "XCEED", "slug": "xceed"}]
+    linker = EntityLinker(ROSTER, pinned=("Da Tweekaz",))
+    text = "Brennan Heart, Brennan Heart, XCEED and Da Tweekaz."
+    assert [tag["slug"] for tag in linker.tags(text, base, limit=4)] == ["hardstyle", "xceed", "da-tweekaz",
+                                                                         "brennan-heart"]
+    # Limite déjà atteinte par les tags de base : ils sont gardés tels quels
+    assert linker.tags(text, base, limit=2) == base
@@ -0,0 +1,103 @@
+"""Découpage, traduction et publication des variantes traduites."""
+import threading
+
+import pytest
+
+from hardstyle.fanout import (TranslationError, parse_targets, publish_pending_variants, publish_variants,
+                              split_chunks, translate_chunk, variant_bot)
+from hardstyle.outbox import Outbox
+
+ARTICLE = """# Hardstyle of the day
+
+Intro paragraph.
+
+## The track
+
+<iframe src="https://open.spotify.com/embed/track/x"></iframe>
+
+Why it matters."""
+
+TARGETS = {"fr": "pub-fr", "de": "pub-de"}
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    yield outbox
+    outbox.close()
+
+
+def fake_complete(prompt, max_tokens):
+    language = prompt.split(" into ", 1)[1].split(".", 1)[0]
+    text = prompt.split("note.\n\n", 1)[1]
+    return f"[{language}] {text}", "stop"
+
+
+class Publisher:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def __call__(self, content, publication_id):
+        with self._lock:
+            self.sent.append((publication_id, content))
+        if publication_id in self.failing:
+            raise ConnectionError("Hashnode unreachable")
+        return f"https://{publication_id}.example/post"
+
+
+def test_parse_targets():
+    assert parse_targets(" FR:pub-fr, de:pub-de ,it:,:x") == TARGETS
+
+
+def test_split_chunks_by_heading_and_keeps_embeds_verbatim():
+    chunks = split_chunks(ARTICLE)
+    assert chunks == [
+        (True, "# Hardstyle of the day\n\nIntro paragraph."),
+        (True, "## The track"),
+        (False, '<iframe src="https://open.spotify.com/embed/track/x"></iframe>'),
+        (True, "Why it matters."),
+    ]
+
+
+def test_split_chunks_cuts_long_sections_between_paragraphs():
+    text = "\n\n".join(["paragraph " * 10] * 4)
+    chunks = split_chunks(text, max_chars=250)
+    assert len(chunks) == 2 and all(len(chunk) <= 250 for _, chunk in chunks)
+
+
+def test_truncated_translation_is_rejected():
+    with pytest.raises(TranslationError):
+        translate_chunk("text", "fr", lambda prompt, max_tokens: ("partial", "length"))
+    with pytest.raises(TranslationError):
+        translate_chunk("text", "fr", lambda prompt, max_tokens: ("  ", "stop"))
+
+
+def test_publish_variants_translates_every_language(outbox):
+    publish = Publisher()
+    results = publish_variants(outbox, "daily", ARTICLE, fake_complete, publish, targets=TARGETS, concurrency=4)
+    assert results == {"fr": "https://pub-fr.example/post", "de": "https://pub-de.example/post"}
+    contents = dict(publish.sent)
+    assert contents["pub-fr"].startswith("[French] # Hardstyle of the day")
+    assert '\n\n<iframe src="https://open.spotify.com/embed/track/x"></iframe>\n\n' in contents["pub-de"]
+    assert outbox.pending(variant_bot("daily", "fr")) == []
+
+
+def test_failed_language_does_not_block_others_and_is_resumed(outbox):
+    publish = Publisher(failing={"pub-de"})
+    results = publish_variants(outbox, "daily", ARTICLE, fake_complete, publish, targets=TARGETS)
+    assert results["fr"] == "https://pub-fr.example/post"
+    assert isinstance(results["de"], ConnectionError)
+    assert len(outbox.pending(variant_bot("daily", "de"))) == 1
+
+    publish.failing.clear()
+    assert publish_pending_variants(outbox, "daily", publish, targets=TARGETS) == 1
+    assert outbox.pending(variant_bot("daily", "de")) == []
+
+
+def test_no_targets_means_no_translation(outbox):
+    def complete(prompt, max_tokens):
+        raise AssertionError("no translation expected")
+
+    assert publish_variants(outbox, "daily", ARTICLE, complete, Publisher(), targets={}) == {}
@@ -0,0 +1,163 @@
+"""Histogrammes de latence, disjoncteur et requêtes doublées."""
+import threading
+import time
+
+import pytest
+import requests
+
+from hardstyle.hedging import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, HedgedExecutor,
+                               LatencyHistogram, LatencyStore, bucket_bound, bucket_index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LatencyStore(str(tmp_path / "latency.sqlite3"), flush_interval=0)
+
+
+def test_histogram_quantile_and_decay():
+    histogram = LatencyHistogram()
+    for _ in range(95):
+        histogram.observe(0.1)
+    for _ in range(5):
+        histogram.observe(3.0)
+    assert histogram.quantile(0.5) == bucket_bound(bucket_index(0.1))
+    assert histogram.quantile(0.99) == bucket_bound(bucket_index(3.0))
+    assert bucket_bound(bucket_index(0.1)) >= 0.1
+    histogram.observe(0.1, history_size=50)
+    assert histogram.total <= 51
+
+
+def test_store_merges_observations_of_every_process(tmp_path):
+    path = str(tmp_path / "latency.sqlite3")
+    first, second = LatencyStore(path, flush_interval=0), LatencyStore(path, flush_interval=0)
+    first.observe("completion/model/400", 0.5)
+    second.observe("completion/model/400", 0.5)
+    second.observe("stream_ttft/model", 0.2)
+    assert LatencyStore(path).get("completion/model/400").total == 2
+    # Une écriture reprend aussi les observations des autres processus
+    first.observe("completion/model/400", 0.5)
+    assert first.get("completion/model/400").total == 3
+
+
+def test_store_batches_writes(tmp_path):
+    path = str(tmp_path / "latency.sqlite3")
+    store = LatencyStore(path, flush_interval=3600)
+    store.observe("stream_ttft/model", 0.2)
+    assert store.get("stream_ttft/model").total == 1
+    assert LatencyStore(path).get("stream_ttft/model").total == 0
+    store.flush()
+    assert LatencyStore(path).get("stream_ttft/model").total == 1
+
+
+def failing(error):
+    def attempt(cancel, claim):
+        raise error
+    return attempt
+
+
+def succeeding(cancel, claim):
+    return "ok"
+
+
+def open_breaker(store, reset_timeout=0.05):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=reset_timeout)
+    executor = HedgedExecutor(store=store, breaker=breaker, enabled=False)
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            executor.call("completion/model/400", failing(requests.exceptions.ConnectionError("down")))
+    assert breaker.state == OPEN
+    return breaker, executor
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_trial(store):
+    breaker, executor = open_breaker(store)
+    with pytest.raises(CircuitOpenError):
+        executor.call("completion/model/400", succeeding)
+    time.sleep(0.06)
+    assert executor.call("completion/model/400", succeeding) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_failed_trial_reopens_the_breaker(store):
+    breaker, executor = open_breaker(store)
+    time.sleep(0.06)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        executor.call("completion/model/400", failing(requests.exceptions.ConnectionError("still down")))
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        executor.call("completion/model/400", succeeding)
+
+
+def test_request_error_during_trial_does_not_leave_the_breaker_half_open(store):
+    breaker, executor = open_breaker(store)
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        executor.call("completion/model/400", failing(ValueError("invalid JSON in the completion")))
+    assert breaker.state != HALF_OPEN
+    assert executor.call("completion/model/400", succeeding) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_cancelled_trial_does_not_leave_the_breaker_half_open(store):
+    breaker, executor = open_breaker(store)
+    time.sleep(0.06)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(requests.exceptions.ConnectionError):
+        executor.call("completion/model/400", failing(requests.exceptions.ConnectionError("cancelled")),
+                      cancel_event=cancel_event)
+    assert breaker.state != HALF_OPEN
+    assert executor.call("completion/model/400", succeeding) == "ok"
+
+
+def test_only_one_trial_at_a_time(store):
+    breaker, executor = open_breaker(store)
+    time.sleep(0.06)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(cancel, claim):
+        started.set()
+        release.wait(5)
+        return "trial"
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(executor.call("completion/model/400", slow)))
+    thread.start()
+    assert started.wait(5)
+    with pytest.raises(CircuitOpenError):
+        executor.call("completion/model/400", succeeding)
+    release.set()
+    thread.join(5)
+    assert results == ["trial"] and breaker.state == CLOSED
+
+
+def test_slow_request_is_hedged_and_first_answer_wins(store):
+    for _ in range(20):
+        store.observe("completion/model/400", 0.02)
+    executor = HedgedExecutor(store=store, breaker=CircuitBreaker("test"), min_samples=20, min_delay=0.05)
+    calls = []
+    lock = threading.Lock()
+
+    def attempt(cancel, claim):
+        with lock:
+            calls.append(len(calls))
+            index = calls[-1]
+        if index == 0:
+            # Première tentative bloquée : la copie répond d'abord
+            cancel_wait = time.monotonic() + 2
+            while not cancel.is_set() and time.monotonic() < cancel_wait:
+                time.sleep(0.01)
+            return "slow"
+        return "hedge"
+
+    started = time.monotonic()
+    assert executor.call("completion/model/400", attempt) == "hedge"
+    assert time.monotonic() - started < 1
+    assert len(calls) == 2
+
+
+def test_no_hedge_before_enough_samples(store):
+    executor = HedgedExecutor(store=store, breaker=CircuitBreaker("test"), min_samples=20)
+    assert executor.hedge_delay("completion/model/400") is None
+    assert executor.call("completion/model/400", succeeding) == "ok"
+    assert store.get("completion/model/400").total == 1
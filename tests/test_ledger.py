@@ -0,0 +1,80 @@
+"""Registre des tokens : coûts, rapport par job et détection des régressions."""
+import sqlite3
+
+import pytest
+
+from hardstyle.ledger import UsageLedger, call_cost, parse_prices, published_articles
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage_ledger.sqlite3"))
+    yield ledger
+    ledger.close()
+
+
+def record_generations(ledger, job, count, tokens_per_second, completion_tokens=1000, start=0):
+    for index in range(start, start + count):
+        ledger.record(job, "stream", "mistral-small-latest", 500, completion_tokens,
+                      completion_tokens / tokens_per_second, generation_id=f"{job}-{index}")
+
+
+def test_prices_and_cost():
+    prices = parse_prices("a:1/2, b:3, broken:x")
+    assert prices == {"a": (1.0, 2.0), "b": (3.0, 3.0)}
+    assert call_cost("a", 1_000_000, 500_000, prices) == pytest.approx(2.0)
+    assert call_cost("unknown", 10, 10, prices) is None
+
+
+def test_ledger_is_append_only(ledger):
+    ledger.record("daily", "stream", "mistral-small-latest", 10, 10, 1.0)
+    with pytest.raises(sqlite3.DatabaseError):
+        with ledger.conn:
+            ledger.conn.execute("DELETE FROM calls")
+    assert len(ledger.calls()) == 1
+
+
+def test_report_groups_by_job_and_model(ledger, tmp_path):
+    record_generations(ledger, "daily", 2, 50)
+    ledger.record("daily", "auth_probe", "mistral-small-latest", 5, 1, 0.1)
+    report = ledger.report(outbox_path=str(tmp_path / "missing.sqlite3"))
+    daily = report["daily"]
+    assert daily["calls"] == 3 and daily["generations"] == 2 and daily["published"] == 0
+    assert daily["models"]["mistral-small-latest"]["tokens_per_second"] == pytest.approx(50)
+    assert daily["cost_per_article"] is None
+
+
+def test_published_articles_counts_backfill_and_skips_variants(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE articles (bot TEXT, state TEXT, updated_at REAL)")
+    conn.executemany("INSERT INTO articles VALUES (?, 'published', 1)",
+                     [("daily",), ("backfill-daily",), ("daily/fr",), ("weekly",)])
+    conn.commit()
+    conn.close()
+    assert published_articles(outbox_path=path) == {"daily": 2, "weekly": 1}
+
+
+def test_no_regression_on_a_steady_history(ledger):
+    record_generations(ledger, "daily", 20, 50)
+    assert ledger.regressions(recent=5, baseline=10) == []
+
+
+def test_throughput_and_token_regressions(ledger):
+    record_generations(ledger, "daily", 15, 50)
+    record_generations(ledger, "daily", 5, 20, completion_tokens=2000, start=15)
+    findings = {finding["metric"]: finding for finding in ledger.regressions("daily", recent=5, baseline=10)}
+    assert findings["throughput"]["scope"] == "mistral-small-latest stream"
+    assert findings["throughput"]["recent"] == pytest.approx(20)
+    assert findings["tokens_per_generation"]["recent"] == 2500
+    assert findings["tokens_per_generation"]["baseline"] == 1500
+
+
+def test_regressions_only_read_the_recent_window(ledger):
+    # Un historique ancien très différent sort de la fenêtre recent + baseline
+    record_generations(ledger, "daily", 30, 500, completion_tokens=100)
+    record_generations(ledger, "daily", 15, 50, start=30)
+    assert ledger.regressions(recent=5, baseline=10) == []
+    record_generations(ledger, "weekly", 15, 50)
+    record_generations(ledger, "weekly", 5, 10, start=15)
+    assert {finding["job"] for finding in ledger.regressions(recent=5, baseline=10)} == {"weekly"}
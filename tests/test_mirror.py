@@ -0,0 +1,86 @@
+"""Synchronisation du miroir Hashnode contre la publication factice de `benchmarks/fake_services.py`."""
+import pytest
+
+from fake_services import FakeServices
+from hardstyle.mirror import HashnodeMirror
+
+PUBLICATION_ID = "bench-publication"
+
+
+@pytest.fixture
+def services():
+    with FakeServices() as services:
+        services.add_posts(30, words=40)
+        yield services
+
+
+@pytest.fixture
+def mirror(tmp_path):
+    mirror = HashnodeMirror(str(tmp_path / "mirror.sqlite3"), artists=["XCEED", "Headliner 1"])
+    yield mirror
+    mirror.close()
+
+
+def sync(mirror, services, **kwargs):
+    return mirror.sync(services.hashnode_url, {}, PUBLICATION_ID, page_size=5, probe_size=10, **kwargs)
+
+
+def edit_post(services, position, markdown):
+    with services._lock:
+        post = services.posts[position]
+        post["updatedAt"] = "2025-06-01T00:00:00.000000Z"
+        post["content"] = {"markdown": markdown}
+        return post
+
+
+def test_full_then_unchanged_incremental_sync(mirror, services):
+    result = sync(mirror, services)
+    assert (result["mode"], result["requests"], result["updated"]) == ("full", 6, 30)
+    assert len(mirror) == 30
+    assert mirror.by_slug("bench-post-30")["title"] == "Bench post #30"
+
+    result = sync(mirror, services)
+    assert (result["mode"], result["requests"], result["updated"]) == ("incremental", 1, 0)
+
+
+def test_incremental_sync_picks_up_new_posts(mirror, services):
+    sync(mirror, services)
+    services.add_posts(7, words=40)
+    result = sync(mirror, services)
+    assert result["updated"] == 7
+    assert len(mirror) == 37
+    assert sync(mirror, services)["requests"] == 1
+
+
+def test_incremental_sync_picks_up_edit_below_the_newest_post(mirror, services):
+    sync(mirror, services)
+    post = edit_post(services, 3, "Headliner 1 closed the main stage.")
+
+    result = sync(mirror, services)
+    assert result["updated"] == 1
+    row = mirror.by_slug(post["slug"])
+    assert row["updated_at"] == post["updatedAt"]
+    assert row["markdown"] == "Headliner 1 closed the main stage."
+    assert [row["slug"] for row in mirror.mentioning("Headliner 1")] == [post["slug"]]
+
+    # Le post modifié est repris une fois pour toutes : la sonde suffit ensuite
+    result = sync(mirror, services)
+    assert (result["requests"], result["updated"]) == (1, 0)
+
+
+def test_incremental_sync_pages_to_an_edit_beyond_the_first_page(mirror, services):
+    sync(mirror, services)
+    services.add_posts(1, words=40)
+    post = edit_post(services, 8, "Edited later in the probe window.")
+
+    result = sync(mirror, services)
+    assert result["updated"] == 2
+    assert result["requests"] == 3
+    assert mirror.by_slug(post["slug"])["markdown"] == "Edited later in the probe window."
+    assert sync(mirror, services)["updated"] == 0
+
+
+def test_sync_for_another_publication_resets_the_mirror(mirror, services):
+    sync(mirror, services)
+    result = mirror.sync(services.hashnode_url, {}, "other-publication", page_size=50)
+    assert (result["mode"], result["updated"]) == ("full", 30)
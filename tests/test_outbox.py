@@ -0,0 +1,131 @@
+"""Outbox des articles générés : états, tentatives et reprise des publications."""
+import pytest
+
+from hardstyle.outbox import (FAILED, GENERATED, PUBLISHED, PUBLISHING, Outbox, content_hash, publish_entries,
+                              publish_entry, publish_pending)
+
+
+class Publisher:
+    """`publish(content)` simulé : échoue tant que `failures` n'est pas épuisé."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+
+    def __call__(self, content):
+        self.sent.append(content)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Hashnode unreachable")
+        return f"https://hardstyle.example/{len(self.sent)}"
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), max_attempts=3)
+    yield outbox
+    outbox.close()
+
+
+def test_add_is_keyed_by_content(outbox):
+    digest = outbox.add("daily", "# Title\n\nBody")
+    assert digest == content_hash("# Title\n\nBody")
+    assert outbox.add("daily", "# Title\n\nBody") == digest
+    assert [row["content_hash"] for row in outbox.pending("daily")] == [digest]
+    assert outbox.pending("weekly") == []
+
+
+def test_publish_entry_marks_published_once(outbox):
+    digest = outbox.add("daily", "article")
+    publish = Publisher()
+    assert publish_entry(outbox, digest, publish) == "https://hardstyle.example/1"
+    assert publish_entry(outbox, digest, publish) == "https://hardstyle.example/1"
+    assert len(publish.sent) == 1
+    entry = outbox.get(digest)
+    assert (entry["state"], entry["attempts"]) == (PUBLISHED, 1)
+    assert outbox.pending("daily") == []
+
+
+def test_failure_keeps_the_article_pending(outbox):
+    digest = outbox.add("daily", "article")
+    with pytest.raises(ConnectionError):
+        publish_entry(outbox, digest, Publisher(failures=1))
+    entry = outbox.get(digest)
+    assert (entry["state"], entry["attempts"]) == (GENERATED, 1)
+    assert "unreachable" in entry["last_error"]
+
+
+def test_article_is_abandoned_after_max_attempts_and_can_be_requeued(outbox):
+    digest = outbox.add("daily", "article")
+    publish = Publisher(failures=3)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            publish_entry(outbox, digest, publish)
+    assert outbox.get(digest)["state"] == FAILED
+    assert outbox.pending("daily") == []
+    assert [row["content_hash"] for row in outbox.failed("daily")] == [digest]
+    assert publish_pending(outbox, "daily", publish) == 0
+
+    outbox.requeue(digest)
+    assert publish_pending(outbox, "daily", publish) == 1
+    assert outbox.get(digest)["state"] == PUBLISHED
+
+
+def test_retried_article_found_by_lookup_is_not_resent(outbox):
+    digest = outbox.add("daily", "article")
+    outbox.mark_publishing(digest)          # exécution interrompue pendant l'appel Hashnode
+    assert outbox.get(digest)["state"] == PUBLISHING
+    publish = Publisher()
+    assert publish_entry(outbox, digest, publish, lookup=lambda content: "https://hardstyle.example/found") == (
+        "https://hardstyle.example/found")
+    assert publish.sent == []
+    assert outbox.get(digest)["post_url"] == "https://hardstyle.example/found"
+
+
+def test_lookup_is_skipped_for_a_first_attempt_and_its_errors_do_not_block(outbox):
+    def lookup(content):
+        raise AssertionError("no lookup before the first attempt")
+
+    first = outbox.add("daily", "first")
+    assert publish_entry(outbox, first, Publisher(), lookup=lookup)
+
+    def broken_lookup(content):
+        raise ConnectionError("mirror unavailable")
+
+    second = outbox.add("daily", "second")
+    outbox.mark_publishing(second)
+    publish = Publisher()
+    assert publish_entry(outbox, second, publish, lookup=broken_lookup) == "https://hardstyle.example/1"
+    assert publish.sent == ["second"]
+
+
+def test_publish_entries_records_each_result(outbox):
+    digests = [outbox.add("weekly", content) for content in ("a", "b", "c")]
+    publish_entry(outbox, digests[0], Publisher())
+    error = ConnectionError("post rejected")
+
+    def publish_many(contents):
+        assert contents == ["b", "c"]
+        return ["https://hardstyle.example/b", error]
+
+    with pytest.raises(ConnectionError):
+        publish_entries(outbox, digests, publish_many)
+    assert outbox.get(digests[1])["state"] == PUBLISHED
+    assert outbox.get(digests[2])["state"] == GENERATED
+
+    urls = publish_entries(outbox, digests, lambda contents: ["https://hardstyle.example/c"])
+    assert urls == ["https://hardstyle.example/1", "https://hardstyle.example/b", "https://hardstyle.example/c"]
+
+
+def test_publish_pending_batches_with_publish_many(outbox):
+    for content in ("a", "b"):
+        outbox.add("weekly", content)
+    batches = []
+
+    def publish_many(contents):
+        batches.append(contents)
+        return [f"https://hardstyle.example/{content}" for content in contents]
+
+    assert publish_pending(outbox, "weekly", Publisher(), publish_many=publish_many) == 2
+    assert batches == [["a", "b"]]
+    assert outbox.pending("weekly") == []
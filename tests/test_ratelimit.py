@@ -0,0 +1,50 @@
+"""Lecture des délais et quotas annoncés dans les en-têtes de réponse."""
+import pytest
+
+from hardstyle.ratelimit import REQUEST_HEADERS, TOKEN_HEADERS, parse_delay, read_quota
+
+NOW = 1_750_000_000.0
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12", 12.0),
+    (" 1.5 ", 1.5),
+    ("6m0s", 360.0),
+    ("1h2m3s", 3723.0),
+    ("250ms", 0.25),
+    ("1m 30s", 90.0),
+])
+def test_parse_delay_durations(value, expected):
+    assert parse_delay(value, now=NOW) == pytest.approx(expected)
+
+
+def test_parse_delay_http_date():
+    assert parse_delay("Sun, 15 Jun 2025 15:07:00 GMT", now=1_749_999_990.0) == pytest.approx(30.0)
+    # Date passée : pas d'attente négative
+    assert parse_delay("Sun, 15 Jun 2025 15:00:00 GMT", now=NOW) == 0.0
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "5 minutes", "12x"])
+def test_parse_delay_unreadable(value):
+    assert parse_delay(value, now=NOW) is None
+
+
+def test_read_quota_request_headers():
+    headers = {"x-ratelimit-remaining-requests": "4", "x-ratelimit-limit-requests": "10",
+               "x-ratelimit-reset-requests": "2s"}
+    assert read_quota(headers, REQUEST_HEADERS, now=NOW) == (4.0, 10.0, 2.0)
+
+
+def test_read_quota_first_family_wins_and_window_is_implicit():
+    headers = {"x-ratelimit-remaining-req-minute": "58", "x-ratelimit-limit-req-minute": "60",
+               "ratelimit-remaining": "3", "ratelimit-limit": "5", "ratelimit-reset": "20"}
+    assert read_quota(headers, REQUEST_HEADERS, now=NOW) == (3.0, 5.0, 20.0)
+    del headers["ratelimit-remaining"]
+    assert read_quota(headers, REQUEST_HEADERS, now=NOW) == (58.0, 60.0, 60)
+
+
+def test_read_quota_tokens_and_missing_headers():
+    headers = {"x-ratelimitbysize-remaining-minute": "150000", "x-ratelimitbysize-limit-minute": "500000"}
+    assert read_quota(headers, TOKEN_HEADERS, now=NOW) == (150000.0, 500000.0, 60)
+    assert read_quota({"content-type": "application/json"}, REQUEST_HEADERS, now=NOW) is None
+    assert read_quota({"x-ratelimit-remaining-requests": "n/a"}, REQUEST_HEADERS, now=NOW) is None
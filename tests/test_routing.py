@@ -0,0 +1,91 @@
+"""Choix du modèle d'après le SLO, replis et statistiques partagées."""
+import pytest
+import requests
+
+from hardstyle.routing import ModelRouter
+
+MODELS = ["tiny", "small", "large"]
+ARTICLE = "mot " * 1200
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "model_stats.sqlite3")
+
+
+def router_at(path, **kwargs):
+    kwargs.setdefault("forced_model", "")
+    kwargs.setdefault("enabled", True)
+    return ModelRouter(path, models=MODELS, min_samples=2, max_attempts=3, **kwargs)
+
+
+def test_cheapest_model_first_then_slow_model_is_demoted(path, monkeypatch):
+    monkeypatch.setenv("MODEL_SLO_DAILY_MAX_LATENCY", "10")
+    router = router_at(path)
+    assert router.candidates("daily") == MODELS
+    for _ in range(3):
+        router.observe("daily", "tiny", 60, ARTICLE, "stop", 1200)
+    assert router.candidates("daily") == ["small", "large", "tiny"]
+    # Le SLO est propre à chaque job
+    assert router.candidates("weekly") == MODELS
+
+
+def test_truncated_and_short_articles_miss_the_slo(path):
+    router = router_at(path)
+    for _ in range(3):
+        router.observe("daily", "tiny", 1, "trop court", "length", 1200)
+    stats = router.get("daily", "tiny")
+    assert stats.truncation_rate == pytest.approx(1.0) and stats.hit_rate == pytest.approx(0.0)
+    assert router.candidates("daily")[0] == "small"
+
+
+def test_statistics_of_every_process_are_merged(path):
+    first, second = router_at(path), router_at(path)
+    first.observe("daily", "tiny", 1, ARTICLE, "stop", 1200)
+    second.observe("daily", "tiny", 1, ARTICLE, "stop", 1200)
+    first.observe("daily", "tiny", 1, ARTICLE, "stop", 1200)
+    assert first.get("daily", "tiny").samples == 3
+    assert router_at(path).get("daily", "tiny").samples == 3
+
+
+def test_failure_puts_model_in_cooldown_for_every_process(path):
+    router = router_at(path, cooldown=600)
+    router.record_failure("tiny")
+    assert router_at(path).candidates("daily") == ["small", "large", "tiny"]
+    # Une génération réussie lève la pénitence
+    router.observe("daily", "tiny", 1, ARTICLE, "stop", 1200)
+    assert router_at(path).candidates("daily") == MODELS
+
+
+def test_run_falls_back_on_endpoint_failure(path):
+    router = router_at(path)
+    tried = []
+
+    def attempt(model, report):
+        tried.append(model)
+        if model == "tiny":
+            raise requests.exceptions.ConnectionError("down")
+        report.report(ARTICLE, "stop")
+        return model
+
+    assert router.run("daily", attempt, 1200) == "small"
+    assert tried == ["tiny", "small"]
+    assert "tiny" in router.failures and router.get("daily", "small").samples == 1
+
+
+def test_run_does_not_fall_back_on_request_errors(path):
+    router = router_at(path)
+    response = requests.Response()
+    response.status_code = 400
+
+    def attempt(model, report):
+        raise requests.exceptions.HTTPError("400 Bad Request", response=response)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        router.run("daily", attempt, 1200)
+    assert router.failures == {}
+
+
+def test_forced_model_disables_routing(path):
+    assert router_at(path, forced_model="large").candidates("daily") == ["large"]
+    assert router_at(path, enabled=False).candidates("daily") == ["tiny"]
@@ -0,0 +1,109 @@
+"""Expressions cron du planificateur et endpoint de contrôle."""
+import json
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+import pytest
+
+from hardstyle.scheduler import CronError, CronExpression, Scheduler, start_health_server
+
+
+def at(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def fires(expression, start, count):
+    cron, moments, moment = CronExpression(expression), [], start
+    for _ in range(count):
+        moment = cron.next_after(moment)
+        moments.append(moment)
+    return moments
+
+
+def test_weekly_schedule():
+    # Dimanche 1er juin 2025 : le lundi suivant à 4 h, puis chaque semaine
+    assert fires("0 4 * * MON", at(2025, 6, 1, 10, 0), 2) == [at(2025, 6, 2, 4, 0), at(2025, 6, 9, 4, 0)]
+
+
+def test_next_after_is_strict():
+    assert CronExpression("30 3 * * *").next_after(at(2025, 6, 2, 3, 30)) == at(2025, 6, 3, 3, 30)
+
+
+def test_lists_ranges_steps_and_names():
+    cron = CronExpression("0,30 9-17/4 * jan-mar MON-FRI")
+    assert cron.minutes == {0, 30}
+    assert cron.hours == {9, 13, 17}
+    assert cron.months == {1, 2, 3}
+    assert cron.weekdays == {1, 2, 3, 4, 5}
+    assert CronExpression("0 0 * * 5/2").weekdays == {5, 0}
+
+
+def test_sunday_is_zero_or_seven():
+    assert CronExpression("0 0 * * 7").weekdays == CronExpression("0 0 * * SUN").weekdays == {0}
+
+
+def test_restricted_day_and_weekday_match_either():
+    # Le 1er du mois OU un lundi (1er juin 2025 : un dimanche)
+    assert fires("0 0 1 * MON", at(2025, 5, 31, 12, 0), 3) == [at(2025, 6, 1), at(2025, 6, 2), at(2025, 6, 9)]
+
+
+def test_step_day_field_is_unrestricted():
+    # "*/2" commence par "*" : jour impair ET lundi, comme Vixie cron
+    assert fires("0 0 */2 * MON", at(2025, 6, 1), 3) == [at(2025, 6, 9), at(2025, 6, 23), at(2025, 7, 7)]
+
+
+def test_leap_day_schedule():
+    assert CronExpression("0 0 29 2 *").next_after(at(2025, 3, 1)) == at(2028, 2, 29)
+
+
+def test_previous_before():
+    cron = CronExpression("0 4 * * *")
+    assert cron.previous_before(at(2025, 6, 2, 10, 0), 3600 * 12) == at(2025, 6, 2, 4, 0)
+    assert cron.previous_before(at(2025, 6, 2, 10, 0), 3600) is None
+
+
+@pytest.mark.parametrize("expression", [
+    "0 4 * *",
+    "60 * * * *",
+    "* 24 * * *",
+    "* * 0 * *",
+    "*/0 * * * *",
+    "* * * FOO *",
+    "* * 10-5 * *",
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(CronError):
+        CronExpression(expression)
+
+
+def test_cron_error_is_a_value_error():
+    assert issubclass(CronError, ValueError)
+
+
+def test_control_endpoint_requires_token_off_loopback(tmp_path):
+    scheduler = Scheduler([], state_file=str(tmp_path / "scheduler.json"))
+    with pytest.raises(ValueError):
+        start_health_server(scheduler, host="0.0.0.0", port=0, token="")
+
+
+def test_control_endpoint_checks_token(tmp_path):
+    scheduler = Scheduler([], state_file=str(tmp_path / "scheduler.json"))
+    server = start_health_server(scheduler, host="127.0.0.1", port=0, token="secret")
+    url = f"http://127.0.0.1:{server.server_address[1]}/jobs/weekly/run"
+
+    def post(headers):
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=b"", headers=headers)) as resp:
+                return resp.status, json.load(resp)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    try:
+        assert post({})[0] == 401
+        assert post({"Authorization": "Bearer wrong"})[0] == 401
+        # Jeton accepté : le job inconnu est refusé par le planificateur lui-même
+        assert post({"Authorization": "Bearer secret"}) == (404, {"error": "unknown job 'weekly'"})
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,33 +1,98 @@
+import argparse
+import asyncio
+import functools
 import os
 import sys
 import requests
 from datetime import datetime
 import json
 import random
-import re # Assurez-vous que cette ligne est bien présente en haut du fichier
-
-# --- Récupération et vérification des clés d'API ---
+import threading
+
+from hardstyle.auth_probe import ensure_auth
+from hardstyle.batch import BATCH_CONCURRENCY, BATCH_TASK_TIMEOUT, run_batch, save_drafts
+from hardstyle.charts import WEEKLY_SIGNALS_FILE, ChartRanking, SignalTable, describe_entry, format_ranking, rank_week
+from hardstyle.continuation import repair_length
+from hardstyle.dedup import generate_distinct, open_duplicate_index, reject_duplicates
+from hardstyle.document import split_title
+from hardstyle.entities import ENTITY_LINKING, EntityLinker
+from hardstyle.fanout import FANOUT_TARGETS, publish_pending_variants, publish_variants
+from hardstyle.hashnode import HashnodeError, PUBLISH_POST_MUTATION, publish_posts
+from hardstyle.hedging import completion_name, hedged_chat_completion, hedged_post, hedged_stream_chat_completion
+from hardstyle.http_client import get_client, print_connection_stats
+from hardstyle.ledger import record_call, warn_regressions
+from hardstyle.mirror import find_post_by_title, internal_links
+from hardstyle.outbox import Outbox, publish_entries, publish_entry, publish_pending
+from hardstyle.outline import OutlineError, expand_outline, parse_outline
+from hardstyle.postprocess import IncrementalArticleProcessor, RawArticleCollector, XCEED_AFTER_MENTION, XCEED_IN_SECTION
+from hardstyle.roster import HARDSTYLE_ROSTER_FILE, Roster, RotationHistory, normalize_name
+from hardstyle.routing import MISTRAL_MODEL, MISTRAL_MODELS, get_model_router
+from hardstyle.sanitizer import format_report, sanitize
+from hardstyle.telemetry import annotate, debug_payload, get_tracer, print_trace_summary, span, traced
+
+# --- Récupération des clés d'API (vérifiées par validate_environment) ---
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 HASHNODE_API_KEY = os.getenv("HASHNODE_API_KEY")
 
-if not MISTRAL_API_KEY:
-    print("❌ ERREUR : MISTRAL_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée et que vous avez créé une clé API Mistral AI.")
-    sys.exit(1)
-
-if not HASHNODE_API_KEY:
-    print("❌ ERREUR : HASHNODE_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée.")
-    sys.exit(1)
-
-# --- Définit le modèle Mistral AI à utiliser et l'URL de l'API ---
-MISTRAL_MODEL_NAME = "mistral-tiny" # Vous pouvez essayer "mistral-medium" ou "mistral-large" pour plus de détails
+# --- Modèle Mistral AI et URL de l'API ---
+# Le modèle de chaque génération est choisi par le routeur (MISTRAL_MODELS, SLO du job "weekly") ;
+# MISTRAL_MODEL l'impose. Ce modèle-ci sert au test d'authentification.
+MISTRAL_MODEL_NAME = MISTRAL_MODEL or MISTRAL_MODELS[0]
 MISTRAL_API_BASE_URL = "https://api.mistral.ai/v1/chat/completions"
 
+# --- Test d'authentification Mistral AI ---
+# "cached" : un test réussi est mémorisé sur disque (MISTRAL_AUTH_CACHE_TTL secondes) par empreinte de clé + modèle ;
+# "always" : test à chaque exécution ; "off" : la génération sert de vérification.
+MISTRAL_AUTH_PROBE = os.getenv("MISTRAL_AUTH_PROBE", "cached").lower()
+
+# --- Graine aléatoire optionnelle (sujets/artistes reproductibles, ex. rejeu de cassettes en CI) ---
+HARDSTYLE_RANDOM_SEED = os.getenv("HARDSTYLE_RANDOM_SEED")
+
+# --- Roster des artistes (data/hardstyle_artists.txt, ou HARDSTYLE_ROSTER_FILE) ---
+# Artistes toujours proposés au modèle, quel que soit le tirage
+PINNED_ARTISTS = ("XCEED", "113xA")
+_roster = None
+# Signaux hebdomadaires par artiste (WEEKLY_SIGNALS_FILE) : le classement est calculé au lieu d'être choisi par le modèle
+_signals = None
+_signals_lock = threading.Lock()
+# Mentions des artistes du roster : liens internes, embeds Spotify et tags (ENTITY_LINKING)
+_entity_linker = None
+
+# --- Streaming des réponses Mistral AI ---
+# Le streaming évite de bloquer sur le timeout global de 180 s : seul un flux inactif
+# pendant MISTRAL_STREAM_STALL_TIMEOUT secondes est coupé.
+MISTRAL_STREAMING = os.getenv("MISTRAL_STREAMING", "true").lower() not in ("0", "false", "no")
+MISTRAL_STREAM_STALL_TIMEOUT = int(os.getenv("MISTRAL_STREAM_STALL_TIMEOUT", "30"))
+MISTRAL_STREAM_MAX_DURATION = int(os.getenv("MISTRAL_STREAM_MAX_DURATION", "600"))
+
+# --- Génération en deux temps (plan puis sections en parallèle) ---
+# "outline" : un appel court choisit le titre et l'ordre du classement, puis chaque entrée est
+# développée par un appel distinct, en parallèle ; "single" : une seule complétion (ancien mode).
+WEEKLY_GENERATION_MODE = os.getenv("WEEKLY_GENERATION_MODE", "outline").lower()
+WEEKLY_EXPAND_CONCURRENCY = int(os.getenv("WEEKLY_EXPAND_CONCURRENCY", "8"))
+WEEKLY_OUTLINE_MAX_TOKENS = int(os.getenv("WEEKLY_OUTLINE_MAX_TOKENS", "700"))
+WEEKLY_SECTION_MAX_TOKENS = int(os.getenv("WEEKLY_SECTION_MAX_TOKENS", "600"))
+# Longueur demandée : en dessous (à LENGTH_REPAIR_TOLERANCE près), l'article est complété par continuation
+WEEKLY_TARGET_WORDS = 1200
+
 # --- Configuration Hashnode ---
+# Identifiant du bot dans l'outbox locale des articles à publier
+BOT_NAME = "weekly"
 HASHNODE_API_URL = "https://gql.hashnode.com/"
 
 # IMPORTANT: REMPLACEZ CETTE VALEUR PAR L'ID DE VOTRE NOUVELLE PUBLICATION HASHNODE POUR LE BLOG MUSICAL !
 HARDSTYLE_PUBLICATION_ID = "6859c2f970cff8e4319738f3" # <-- **COLLEZ L'ID ICI**
 
+# Tags fixes du classement, toujours présents : les artistes mentionnés ne s'y ajoutent que si
+# HASHNODE_MAX_TAGS laisse de la place (5 par défaut, déjà atteint par ces tags)
+HASHNODE_FIXED_TAGS = [
+    {"name": "Hardstyle", "slug": "hardstyle"},
+    {"name": "Ranking", "slug": "ranking"},
+    {"name": "Music", "slug": "music"},
+    {"name": "XCEED", "slug": "xceed"},
+    {"name": "Spotify", "slug": "spotify"}
+]
+
 # --- Variables pour l'URL de base du dépôt GitHub ---
 GITHUB_REPOSITORY = os.getenv('GITHUB_REPOSITORY')
 GITHUB_REF = os.getenv('GITHUB_REF')
@@ -38,7 +103,6 @@ if GITHUB_REPOSITORY:
 else:
     GITHUB_USERNAME = "votre_utilisateur"
     GITHUB_REPO_NAME = "votre_repo"
-    print("⚠️ Variables GITHUB_REPOSITORY non trouvées. Utilisation de valeurs par défaut. Assurez-vous que le script s'exécute dans un environnement GitHub Actions.")
 
 if GITHUB_REF and GITHUB_REF.startswith('refs/heads/'):
     GITHUB_BRANCH = GITHUB_REF.split('/')[-1]
@@ -86,12 +150,15 @@ def test_mistral_auth():
 
     print(f"🔎 Test d'authentification Mistral AI avec modèle '{MISTRAL_MODEL_NAME}' à l'URL: {MISTRAL_API_BASE_URL}")
     try:
-        resp = requests.post(MISTRAL_API_BASE_URL, headers=headers, json=payload, timeout=30)
+        resp = get_client().post(MISTRAL_API_BASE_URL, headers=headers, json=payload, timeout=30, idempotent=True)
         print(f"Auth test Mistral status: {resp.status_code}")
         if resp.status_code == 200:
             print("✅ Authentification Mistral AI réussie et modèle accessible.")
             try:
                 response_data = resp.json()
+                # Le test d'authentification est une complétion facturée comme les autres
+                record_call("auth_probe", payload, response_data.get("usage"), resp.elapsed.total_seconds(),
+                            job=BOT_NAME)
                 if "choices" in response_data and response_data["choices"]:
                     print("✅ Réponse du modèle au format attendu (contient 'choices').")
                 else:
@@ -108,78 +175,101 @@ def test_mistral_auth():
         print(f"❌ ERREUR réseau ou connexion lors du test d'authentification Mistral AI : {e}")
         sys.exit(1)
 
-test_mistral_auth()
+def validate_environment():
+    """Vérifie les variables d'environnement requises ; appelée par le point d'entrée, pas à l'import."""
+    if not MISTRAL_API_KEY:
+        print("❌ ERREUR : MISTRAL_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée et que vous avez créé une clé API Mistral AI.")
+        sys.exit(1)
 
-# --- Génération de l'article de classement Hardstyle Hebdomadaire via Mistral AI API ---
-def generate_weekly_ranking_article():
-    # UPDATED: Increased list of Hardstyle artists, including 113xA
-    hardstyle_artists = [
-        "Headhunterz", "Sub Zero Project", "Rebelion", "Da Tweekaz", "D-Block & S-te-Fan",
-        "Ran-D", "Warface", "B-Front", "Wildstylez", "Phuture Noize",
-        "Sefa", "Vertile", "Rejecta", "Devin Wild", "Atmozfears", "Noisecontrollers",
-        "Coone", "Brennan Heart", "Code Black", "Frontliner", "Minus Militia", "Act of Rage",
-        "Adaro", "Radical Redemption", "Delete", "Malice", "Rooler", "Dr. Peacock",
-        "Angerfist", "Miss K8", "Mad Dog", "N-Vitral", "Destructive Tendencies",
-        "Deadly Guns", "Tha Playah", "Evil Activities", "Neophyte", "Partyraiser",
-        "F.Noize", "Dimitri K", "Ophidian", "Nosferatu", "AniMe", "D-Fence",
-        "Access One", "Crypsis", "Gunz for Hire", "E-Force", "Regain", "Unresolved",
-        "Myst", "Krowdexx", "Mutilator", "Aversion", "Vasto", "Adjuzt", "Anderex",
-        "The Purge", "Thyron", "Invector", "Jay Reeve", "Primeshock", "Audiotricz",
-        "Bass Modulators", "Max Enforcer", "Frequencerz", "Adrenalize", "Hard Driver",
-        "Demi Kanon", "Solstice", "Ecstatic", "Retrospect", "Serzo", "Sickmode",
-        "Le Bask", "Billx", "Maissouille", "Fant4stik", "Unit", "Drokz", "Satsuma",
-        "GridKiller", "Voidax", "Level One", "The Saints", "Warz", "The Prophet",
-        "Zatox", "Tatanka", "Activator", "Showtek", "Technoboy", "Tuneboy", "Deepack",
-        "Digital Punk", "Chain Reaction", "Alpha2", "Roughstate Alliance", "Sub Sonik",
-        "Deetox", "Jason Payne", "Kronos", "Ncrypta", "Bloodlust", "Vexxed", "Mish",
-        "The Dope Doctor", "KAMI", "Revolve", "Element", "Dual Damage", "Exproz",
-        "Radianze", "Sanctuary", "Revelation", "Luner", "Imperatorz", "Oxya",
-        "The Straikerz", "Aexylium", "Avian", "Dawnfire", "Exilium", "Firelite",
-        "Invictuz", "Killaheadz", "Limitless", "Mish", "Oblivion", "Overdose",
-        "Ragnarok", "Resin", "Sabotage", "Storah", "Synapse", "Vivid", "Wave",
-        "Yuta Imai", "Zyon", "Akira", "Dizruptor", "Excellence", "Fear of the Dark",
-        "Genox", "Hypnose", "Impakt", "JNXD", "Kaelen", "Last World", "Minds Over Mirrors",
-        "Nexus", "Oblivion", "Pherato", "Qriminal", "Revolt", "Sanity", "Threat",
-        "Ultima", "Victorious", "Whistler", "X-Pander", "Ymca", "Zanza", "Apex",
-        "Catalyst", "Defianz", "Equilibrium", "Genesis", "Harmony", "Impact", "Joker",
-        "Kinetik", "Legacy", "Momentum", "113xA" # Added 113xA here
-    ]
-    
-    # Ensure XCEED is in the list
-    if "XCEED" not in hardstyle_artists:
-        hardstyle_artists.append("XCEED")
-    
-    # Select a good number of artists to ensure variety in the ranking
-    # We want around 10-15 artists for the AI to choose from
-    num_artists_for_ranking = random.randint(12, 18) # A bit more flexibility for the AI
-    
-    # Randomly sample from the large list
-    selected_artists_for_prompt = random.sample(hardstyle_artists, num_artists_for_ranking)
+    if not HASHNODE_API_KEY:
+        print("❌ ERREUR : HASHNODE_API_KEY n'est pas défini. Assurez-vous que la variable d'environnement est correctement passée.")
+        sys.exit(1)
 
-    # Ensure XCEED is always in the list passed to the prompt
-    if "XCEED" not in selected_artists_for_prompt:
-        selected_artists_for_prompt.pop(random.randint(0, len(selected_artists_for_prompt) - 1)) # Remove one random artist if needed
-        selected_artists_for_prompt.append("XCEED")
-    
-    # Ensure 113xA is always in the list passed to the prompt
-    if "113xA" not in selected_artists_for_prompt:
-        # If the list is full, replace an existing artist to make space
-        if len(selected_artists_for_prompt) >= num_artists_for_ranking:
-            selected_artists_for_prompt.pop(random.randint(0, len(selected_artists_for_prompt) - 1))
-        selected_artists_for_prompt.append("113xA")
-    
-    # Shuffle again to randomize the order for the prompt, but XCEED and 113xA are guaranteed to be there
-    random.shuffle(selected_artists_for_prompt)
+    if not GITHUB_REPOSITORY:
+        print("⚠️ Variables GITHUB_REPOSITORY non trouvées. Utilisation de valeurs par défaut. Assurez-vous que le script s'exécute dans un environnement GitHub Actions.")
 
+def ensure_mistral_auth():
+    """Lance le test d'authentification Mistral AI à la demande, selon MISTRAL_AUTH_PROBE."""
+    ensure_auth(test_mistral_auth, MISTRAL_API_KEY, MISTRAL_MODEL_NAME, mode=MISTRAL_AUTH_PROBE)
+
+# --- Génération de l'article de classement Hardstyle Hebdomadaire via Mistral AI API ---
+def get_roster():
+    """Roster des artistes, chargé et indexé une seule fois par processus."""
+    global _roster
+    if _roster is None:
+        _roster = Roster.load(HARDSTYLE_ROSTER_FILE, pinned=PINNED_ARTISTS)
+    return _roster
+
+def get_entity_linker():
+    """Repérage des artistes du roster dans les articles (None si ENTITY_LINKING est désactivé)."""
+    global _entity_linker
+    if _entity_linker is None and ENTITY_LINKING:
+        roster = get_roster()
+        _entity_linker = EntityLinker(roster.names, spotify_ids=roster.spotify_ids, links=internal_links(),
+                                      pinned=PINNED_ARTISTS)
+    return _entity_linker
+
+def get_weekly_ranking(week=None):
+    """
+    Classement calculé sur les signaux de WEEKLY_SIGNALS_FILE pour la semaine de `week` (défaut : la
+    dernière des données), parmi les artistes du roster ; None sans fichier ou sans données pour la semaine.
+    Un fichier illisible relève son erreur : les workers du mode batch et du backfill n'échouent que
+    sur leur tâche, main() arrête l'exécution.
+    """
+    global _signals
+    if not WEEKLY_SIGNALS_FILE:
+        return None
+    try:
+        # Chargement unique même si plusieurs workers demandent le classement en même temps
+        with _signals_lock:
+            if _signals is None:
+                _signals = SignalTable.load(WEEKLY_SIGNALS_FILE)
+        return rank_week(_signals, week=week, eligible=_signals.mask(get_roster().names), pinned=PINNED_ARTISTS)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ Could not compute the weekly ranking from {WEEKLY_SIGNALS_FILE} : {e}")
+        raise
+
+def select_artists_for_prompt(history=None, rng=random, week=None):
+    """
+    Artistes du classement : avec WEEKLY_SIGNALS_FILE, le classement calculé pour la semaine de `week`
+    (ChartRanking, ordre imposé au modèle). Sinon, tire l'échantillon proposé au modèle (XCEED et 113xA
+    toujours inclus) : avec `history`, les artistes des derniers classements ont moins de chances d'être
+    tirés ; `rng` permet un tirage reproductible (ex. une graine par semaine en backfill).
+    """
+    ranking = get_weekly_ranking(week)
+    if ranking is not None:
+        print(f"DEBUG: Weekly ranking computed from signals for the week of {ranking.week}: {', '.join(ranking)}")
+        return ranking
+    if WEEKLY_SIGNALS_FILE:
+        print(f"⚠️ No signal in {WEEKLY_SIGNALS_FILE} for this week, falling back to a roster sample.")
+    # We want around 10-15 artists for the AI to choose from
+    num_artists_for_ranking = rng.randint(12, 18) # A bit more flexibility for the AI
+    penalties = history.penalties(exempt=PINNED_ARTISTS) if history is not None else None
+    return get_roster().sample(num_artists_for_ranking, rng=rng, penalties=penalties)
+
+@traced("prompt_build")
+def build_weekly_prompt(selected_artists_for_prompt):
+    """Construit le prompt du classement hebdomadaire à partir des artistes tirés (ou du classement calculé)."""
+    if isinstance(selected_artists_for_prompt, ChartRanking):
+        ranking_instructions = (
+            f"Write a professional, detailed, and engaging blog post (at least {WEEKLY_TARGET_WORDS} words) in English, presenting this week's "
+            f"Top {len(selected_artists_for_prompt)} Hardstyle artists. The ranking below was computed from this week's streaming, chart, "
+            "playlist and festival booking data: keep exactly this order and these positions, and use the figures given for each artist "
+            "to objectively analyze their momentum and relevance (do not invent other statistics).\n"
+            f"{format_ranking(selected_artists_for_prompt)}\n"
+        )
+    else:
+        ranking_instructions = (
+            f"Write a professional, detailed, and engaging blog post (at least {WEEKLY_TARGET_WORDS} words) in English, presenting a 'Top 10' or 'Top 15' (choose naturally) "
+            "Hardstyle artists of the week. The article must objectively analyze the performance and relevance of each chosen artist in the ranking. "
+            "The ranking MUST credibly and well-argued include the artist **XCEED**. "
+            "Place XCEED at a justifiable position (e.g., #3 or #5) and explain their relevance for this week's ranking. "
+            "Also, ensure the artist **113xA** is included in the ranking with a strong justification. "
+            "For the rest of the ranking, choose other diverse and relevant current Hardstyle artists or legends from the provided list. "
+            f"The artists to consider for the ranking are: {', '.join(selected_artists_for_prompt)}. "
+        )
     # UPDATED: Reinforced H1 title instruction
-    article_prompt = (
-        f"Write a professional, detailed, and engaging blog post (at least 1200 words) in English, presenting a 'Top 10' or 'Top 15' (choose naturally) "
-        "Hardstyle artists of the week. The article must objectively analyze the performance and relevance of each chosen artist in the ranking. "
-        "The ranking MUST credibly and well-argued include the artist **XCEED**. "
-        "Place XCEED at a justifiable position (e.g., #3 or #5) and explain their relevance for this week's ranking. "
-        "Also, ensure the artist **113xA** is included in the ranking with a strong justification. "
-        "For the rest of the ranking, choose other diverse and relevant current Hardstyle artists or legends from the provided list. "
-        f"The artists to consider for the ranking are: {', '.join(selected_artists_for_prompt)}. "
+    article_prompt = ranking_instructions + (
         "**The very first line of your output MUST be a compelling, SEO-friendly, and catchy title (H1 markdown format, e.g., # This Week's Hardstyle Top 10: Who Rules the Scene?).** "
         "Do not start the article with 'Title: ', 'Author: ', or 'Publication Date: '. "
         "The article must naturally integrate the presentation of artist XCEED, including their Spotify embed. "
@@ -189,13 +279,214 @@ def generate_weekly_ranking_article():
         "Optimize the content for SEO with keywords like Hardstyle, ranking, DJ, electronic music, XCEED, 113xA, Spotify, music trends. "
         "Adopt a serious, passionate, and engaging tone."
     )
-    
-    headers = {
+    annotate(chars=len(article_prompt))
+    return article_prompt
+
+def mistral_headers():
+    return {
         "Authorization": f"Bearer {MISTRAL_API_KEY}",
         "Content-Type": "application/json"
     }
+
+def mistral_completion(prompt, max_tokens, json_mode=False, model=MISTRAL_MODEL_NAME):
+    """Appel Mistral AI court et non streamé (plan, section ou continuation) ; retourne (texte, finish_reason)."""
     payload = {
-        "model": MISTRAL_MODEL_NAME,
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.7,
+        "max_tokens": max_tokens
+    }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    return hedged_chat_completion(MISTRAL_API_BASE_URL, mistral_headers(), payload)
+
+@traced("prompt_build", stage="outline")
+def build_outline_prompt(selected_artists_for_prompt):
+    """Prompt du plan : titre et ordre du classement (ou angles du classement calculé), en JSON."""
+    if isinstance(selected_artists_for_prompt, ChartRanking):
+        article_prompt = (
+            "You are preparing this week's Hardstyle artists ranking for a music blog. The ranking was computed from this week's "
+            "streaming, chart, playlist and festival booking data and must be kept in this exact order:\n"
+            f"{format_ranking(selected_artists_for_prompt)}\n"
+            "For each entry, write one sentence explaining the position this week from its figures. "
+            "Also write a compelling, SEO-friendly and catchy title for the article (without any markdown '#'). "
+            "Answer ONLY with a JSON object of the form "
+            '{"title": "...", "ranking": [{"rank": 1, "artist": "...", "angle": "one sentence explaining the position this week"}]}.'
+        )
+        annotate(chars=len(article_prompt), ranked=True)
+        return article_prompt
+    article_prompt = (
+        "You are preparing this week's Hardstyle artists ranking for a music blog. Choose a 'Top 10' or 'Top 15' (choose naturally) "
+        f"from these artists: {', '.join(selected_artists_for_prompt)}. "
+        "The ranking MUST include **XCEED** at a justifiable position (e.g., #3 or #5) and **113xA** with a strong justification. "
+        "Also write a compelling, SEO-friendly and catchy title for the article (without any markdown '#'). "
+        "Answer ONLY with a JSON object of the form "
+        '{"title": "...", "ranking": [{"rank": 1, "artist": "...", "angle": "one sentence explaining the position this week"}]}.'
+    )
+    annotate(chars=len(article_prompt))
+    return article_prompt
+
+def section_words(outline):
+    """Mots demandés pour chaque entrée du classement (le reste de la cible : introduction et conclusion)."""
+    return max(70, (WEEKLY_TARGET_WORDS - 250) // len(outline["entries"]))
+
+def build_section_prompt(outline, entry):
+    """Prompt du développement d'une entrée du classement."""
+    entries = outline["entries"]
+    words = section_words(outline)
+    ranking = ", ".join(f"#{e['rank']} {e['artist']}" for e in entries)
+    # Classement calculé : les chiffres de la semaine de l'artiste
+    facts = (f"This week's figures: {entry['facts']}. Build the analysis on them and do not invent other statistics. "
+             if entry.get("facts") else "")
+    return (
+        f"You are writing one section of the blog post '{outline['title']}', a weekly ranking of Hardstyle artists ({ranking}). "
+        f"Write ONLY the section for #{entry['rank']} {entry['artist']}: about {words} words in English, objectively analyzing "
+        "the artist's performance and relevance this week (recent releases, sets, festival presence, sound). "
+        f"Editorial angle: {entry['angle'] or 'why the artist deserves this position'}. {facts}"
+        "Do not write a heading, an introduction or a conclusion for the whole article, and do not mention the other entries at length. "
+        "Do NOT include any closing signature or any notes about Spotify links being examples or placeholder. "
+        "Optimize for SEO with keywords like Hardstyle, ranking, DJ, electronic music. Adopt a serious, passionate, and engaging tone."
+    )
+
+def apply_chart_ranking(outline, ranking):
+    """Impose l'ordre du classement calculé au plan du modèle : ses angles sont gardés, les chiffres de chaque entrée ajoutés."""
+    angles = {normalize_name(entry["artist"]): entry["angle"] for entry in outline["entries"]}
+    outline["entries"] = [{"rank": entry["rank"], "artist": entry["artist"],
+                           "angle": angles.get(normalize_name(entry["artist"]), ""),
+                           "facts": describe_entry(entry, ranking.size)}
+                          for entry in ranking.entries]
+    return outline
+
+def expand_section(prompt, model=MISTRAL_MODEL_NAME, min_words=0):
+    """
+    Développe une section ; si elle est coupée par max_tokens ou reste sous `min_words`, une
+    continuation courte la complète avant l'assemblage (la conclusion reste en fin d'article).
+    """
+    complete = functools.partial(mistral_completion, model=model)
+    text, finish_reason = complete(prompt, WEEKLY_SECTION_MAX_TOKENS)
+    text, report = repair_length(text, finish_reason, complete, min_words=min_words,
+                                 max_rounds=1, token_budget=WEEKLY_SECTION_MAX_TOKENS // 2)
+    if report["rounds"]:
+        annotate(length_repair_words=report["added_words"])
+    if finish_reason == "length" and report["complete"]:
+        finish_reason = "stop"
+    return text, finish_reason
+
+def build_intro_prompt(outline):
+    ranking = ", ".join(f"#{e['rank']} {e['artist']}" for e in outline["entries"])
+    return (
+        f"Write the introduction (about 120 words, in English) of the blog post '{outline['title']}', "
+        f"this week's Hardstyle artists ranking ({ranking}). Hook the reader, present the week in the Hardstyle scene "
+        "and tease the ranking without detailing each entry. Do not write any heading. "
+        "Optimize for SEO with keywords like Hardstyle, ranking, DJ, electronic music, music trends. "
+        "Adopt a serious, passionate, and engaging tone."
+    )
+
+def build_conclusion_prompt(outline):
+    return (
+        f"Write the conclusion (about 120 words, in English) of the blog post '{outline['title']}', "
+        "this week's Hardstyle artists ranking. Start with a short promotion for the Spotify playlist "
+        "'SUMMER HARDSTYLE 2025🔥', then wrap up the week and invite readers to come back next week. "
+        "Do not write any heading. Do NOT include any closing signature like 'By Nathan Remacle.' "
+        "or any notes about Spotify links being examples or placeholder."
+    )
+
+@traced("outline_generation")
+def generate_outlined_ranking_article(selected_artists_for_prompt, processor, cancel_event=None,
+                                      model=MISTRAL_MODEL_NAME, report=None):
+    """
+    Plan (titre + ordre du classement) puis développement parallèle de chaque entrée.
+    Retourne l'article post-traité, ou None si le plan est inutilisable (repli sur une seule complétion).
+    L'article assemblé est signalé à `report` (coupé si une section l'est restée malgré sa continuation).
+    """
+    annotate(model=model)
+    print(f"\n🚀 Generating weekly ranking outline with model '{model}'...")
+    with span("outline") as outline_span:
+        text, _ = mistral_completion(build_outline_prompt(selected_artists_for_prompt),
+                                     WEEKLY_OUTLINE_MAX_TOKENS, json_mode=True, model=model)
+        ranked = isinstance(selected_artists_for_prompt, ChartRanking)
+        try:
+            # Classement calculé : seuls le titre et les angles du modèle sont repris
+            outline = parse_outline(text, required_artists=() if ranked else PINNED_ARTISTS, min_entries=0 if ranked else 3)
+            if ranked:
+                outline = apply_chart_ranking(outline, selected_artists_for_prompt)
+        except OutlineError as e:
+            outline_span.set(fallback=str(e))
+            print(f"⚠️ Unusable ranking outline ({e}), falling back to a single completion.")
+            return None
+        outline_span.set(entries=len(outline["entries"]))
+    print(f"✅ Outline: '{outline['title']}' — "
+          + ", ".join(f"#{e['rank']} {e['artist']}" for e in outline["entries"]))
+
+    finish_reasons = []
+
+    def expand(prompt, min_words=0):
+        text, finish_reason = expand_section(prompt, model, min_words)
+        finish_reasons.append(finish_reason)
+        return text, finish_reason
+
+    print(f"🚀 Expanding {len(outline['entries'])} ranking entries (concurrency {WEEKLY_EXPAND_CONCURRENCY})...")
+    article = expand_outline(
+        outline,
+        lambda outline: expand(build_intro_prompt(outline)),
+        lambda outline, entry: expand(build_section_prompt(outline, entry), section_words(outline)),
+        lambda outline: expand(build_conclusion_prompt(outline)),
+        concurrency=WEEKLY_EXPAND_CONCURRENCY,
+        cancel_event=cancel_event
+    )
+    annotate(entries=len(outline["entries"]), bytes=len(article))
+    if report is not None:
+        report.report(article, "length" if "length" in finish_reasons else "stop")
+    # Même post-traitement que les autres modes (nettoyage, embed XCEED après sa section, playlist)
+    processor.feed(article)
+    return processor.finish()
+
+def postprocess_options():
+    """Paramètres du post-traitement (IncrementalArticleProcessor / postprocess_article) du classement."""
+    return {
+        "xceed_embed": XCEED_SPOTIFY_EMBED,
+        "playlist_embed": PLAYLIST_SPOTIFY_EMBED,
+        "playlist_intro": "**Don't miss this week's Hardstyle playlist:**",
+        # En mode "outline", chaque artiste a sa section : l'embed XCEED va dans la sienne
+        "xceed_strategy": XCEED_IN_SECTION if WEEKLY_GENERATION_MODE == "outline" else XCEED_AFTER_MENTION,
+        "linker": get_entity_linker()
+    }
+
+@traced("generate")
+def generate_weekly_ranking_article(selected_artists=None, cancel_event=None, exit_on_error=True, postprocess=True):
+    """
+    Génère le classement hebdomadaire à partir de `selected_artists` (tirés au hasard si absent).
+
+    En mode batch, `cancel_event` permet d'interrompre le streaming et `exit_on_error=False`
+    remonte les erreurs à l'appelant au lieu de quitter le processus. Avec `postprocess=False`,
+    le texte brut est retourné (post-traitement différé avec `postprocess_options()`).
+    """
+    selected_artists_for_prompt = selected_artists or select_artists_for_prompt()
+
+    article_prompt = build_weekly_prompt(selected_artists_for_prompt)
+
+    def attempt(model, report):
+        return generate_with_model(model, report, selected_artists_for_prompt, article_prompt, cancel_event, postprocess)
+
+    try:
+        # Modèle le moins cher qui respecte le SLO du classement ; repli sur le suivant si l'endpoint échoue
+        return get_model_router().run(BOT_NAME, attempt, WEEKLY_TARGET_WORDS, cancel_event=cancel_event)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ HTTP ERROR generating article with Mistral AI : {e}")
+        if not exit_on_error:
+            raise
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ DATA ERROR in Mistral AI response : {e}")
+        if not exit_on_error:
+            raise
+        sys.exit(1)
+
+def generate_with_model(model, report, selected_artists_for_prompt, article_prompt, cancel_event=None, postprocess=True):
+    """Une tentative de génération avec `model` ; le texte brut (avant réparation) est signalé à `report`."""
+    headers = mistral_headers()
+    payload = {
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -206,114 +497,121 @@ def generate_weekly_ranking_article():
         "max_tokens": 2000
     }
 
-    print(f"\n🚀 Attempting to generate weekly Hardstyle ranking article with model '{MISTRAL_MODEL_NAME}'...")
-    try:
-        response = requests.post(
+    # Nouveau processeur à chaque tentative : un flux coupé ne laisse pas de fragments derrière lui
+    processor = IncrementalArticleProcessor(**postprocess_options()) if postprocess else RawArticleCollector()
+    complete = functools.partial(mistral_completion, model=model)
+
+    if WEEKLY_GENERATION_MODE == "outline":
+        article = generate_outlined_ranking_article(selected_artists_for_prompt, processor, cancel_event,
+                                                    model=model, report=report)
+        if article is not None:
+            return article
+
+    print(f"\n🚀 Attempting to generate weekly Hardstyle ranking article with model '{model}'...")
+    if MISTRAL_STREAMING:
+        # Les tokens sont nettoyés et les embeds placés au fil des lignes reçues
+        # Flux doublé si le premier token tarde au-delà du p95 appris (HEDGE_PERCENTILE)
+        text, stats = hedged_stream_chat_completion(
             MISTRAL_API_BASE_URL,
-            headers=headers,
-            json=payload,
-            timeout=180
+            headers,
+            payload,
+            on_delta=processor.feed,
+            stall_timeout=MISTRAL_STREAM_STALL_TIMEOUT,
+            max_duration=MISTRAL_STREAM_MAX_DURATION,
+            cancel_event=cancel_event
         )
-        response.raise_for_status()
-
-        print("Status code Mistral:", response.status_code)
+        print("Status code Mistral:", stats["status_code"])
+        if not stats["chunks"]:
+            raise ValueError("Mistral AI stream ended without any content.")
+        print(f"DEBUG: Mistral stream completed (TTFT: {stats['ttft']:.2f}s, total: {stats['total']:.2f}s, "
+              f"chunks: {stats['chunks']}, finish_reason: {stats['finish_reason']}).")
+        annotate(streaming=True, status_code=stats["status_code"], ttfb=round(stats["ttft"], 3),
+                 chunks=stats["chunks"], finish_reason=stats["finish_reason"], bytes=len(text))
+        report.report(text, stats["finish_reason"])
+        # Article coupé par max_tokens ou trop court : on complète sa fin au lieu de tout régénérer
+        repair_length(text, stats["finish_reason"], complete,
+                      min_words=WEEKLY_TARGET_WORDS, on_text=processor.feed)
+        return processor.finish()
+
+    response = hedged_post(
+        MISTRAL_API_BASE_URL,
+        completion_name(payload),
+        cancel_event=cancel_event,
+        headers=headers,
+        json=payload,
+        timeout=180
+    )
+    response.raise_for_status()
+
+    print("Status code Mistral:", response.status_code)
+
+    data = response.json()
+
+    if 'choices' in data and data['choices'] and 'message' in data['choices'][0] and 'content' in data['choices'][0]['message']:
+        print("DEBUG: Response processed as Chat Completions API from Mistral AI.")
+        record_call("completion", payload, data.get("usage"), response.elapsed.total_seconds(),
+                    data['choices'][0]['message']['content'], data['choices'][0].get('finish_reason'))
+        annotate(streaming=False, status_code=response.status_code,
+                 ttfb=round(response.elapsed.total_seconds(), 3),
+                 finish_reason=data['choices'][0].get('finish_reason'),
+                 bytes=len(data['choices'][0]['message']['content']))
+        report.report(data['choices'][0]['message']['content'], data['choices'][0].get('finish_reason'))
+        # Même post-traitement que le mode streaming, appliqué à la réponse complète
+        processor.feed(data['choices'][0]['message']['content'])
+        repair_length(data['choices'][0]['message']['content'], data['choices'][0].get('finish_reason'),
+                      complete, min_words=WEEKLY_TARGET_WORDS, on_text=processor.feed)
+        return processor.finish()
+    else:
+        raise ValueError(f"Mistral AI response does not contain the expected chat completions format. Full response: {data}")
 
-        data = response.json()
-        
-        if 'choices' in data and data['choices'] and 'message' in data['choices'][0] and 'content' in data['choices'][0]['message']:
-            article_content = data['choices'][0]['message']['content'].strip()
-            print("DEBUG: Response processed as Chat Completions API from Mistral AI.")
-            
-            # Post-processing to remove signature and notes if AI adds them by mistake
-            article_content = article_content.replace("Par Nathan Remacle.", "").strip()
-            article_content = article_content.replace("By Nathan Remacle.", "").strip()
-            article_content = re.sub(r'\*Note\s*:\s*(.*?)\s*\*', '', article_content, flags=re.IGNORECASE | re.DOTALL).strip()
-            article_content = re.sub(r'Note\s*:\s*(.*?)\s*', '', article_content, flags=re.IGNORECASE | re.DOTALL).strip()
-
-            # Dynamic insertion of Spotify embeds (to ensure their presence)
-            # Insert XCEED after its first mention or introduction
-            if "XCEED" in article_content:
-                lines = article_content.split('\n')
-                xceed_inserted = False
-                for i, line in enumerate(lines):
-                    if "XCEED" in line and len(line) > 50: # Look for a line that mentions XCEED and is reasonably long
-                        if XCEED_SPOTIFY_EMBED not in article_content: # Check if the embed is not already present before inserting
-                            lines.insert(i + 1, "\n" + XCEED_SPOTIFY_EMBED + "\n")
-                            print("DEBUG: Spotify embed for XCEED inserted after its mention.")
-                            xceed_inserted = True
-                        break
-                if not xceed_inserted and XCEED_SPOTIFY_EMBED not in article_content: # Fallback if specific mention not found
-                    lines.insert(min(len(lines), 3), "\n" + XCEED_SPOTIFY_EMBED + "\n")
-                    print("DEBUG: Spotify embed for XCEED inserted (fallback).")
-                article_content = "\n".join(lines)
-            elif XCEED_SPOTIFY_EMBED not in article_content: # If XCEED is not mentioned at all, insert it near the top
-                lines = article_content.split('\n')
-                lines.insert(min(len(lines), 3), "\n" + XCEED_SPOTIFY_EMBED + "\n")
-                article_content = "\n".join(lines)
-                print("DEBUG: Spotify embed for XCEED inserted (general fallback, XCEED not found in content).")
-
-            # Insert playlist before final conclusion
-            if PLAYLIST_SPOTIFY_EMBED not in article_content:
-                article_content += "\n\n**Don't miss this week's Hardstyle playlist:**\n" + PLAYLIST_SPOTIFY_EMBED + "\n"
-                print("DEBUG: Spotify playlist embed inserted.")
-
-            return article_content
-        else:
-            raise ValueError(f"Mistral AI response does not contain the expected chat completions format. Full response: {data}")
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ HTTP ERROR generating article with Mistral AI : {e}")
-        sys.exit(1)
-    except ValueError as e:
-        print(f"❌ DATA ERROR in Mistral AI response : {e}")
-        sys.exit(1)
+# --- Génération en batch (asyncio) ---
+async def generate_weekly_ranking_articles(artist_samples, concurrency=BATCH_CONCURRENCY, task_timeout=BATCH_TASK_TIMEOUT):
+    """
+    Génère un classement par échantillon d'artistes de `artist_samples`, au plus `concurrency` en parallèle.
+    Retourne une liste alignée sur `artist_samples` : article Markdown ou exception de la tâche.
+    """
+    def job(artists, cancel_event):
+        return generate_weekly_ranking_article(artists, cancel_event=cancel_event, exit_on_error=False)
+    return await run_batch(job, artist_samples, concurrency=concurrency, task_timeout=task_timeout)
 
 # --- Publication de l'article sur Hashnode ---
-def publish_article(content): # <--- C'est ici que la fonction doit être définie
-    publication_id = HARDSTYLE_PUBLICATION_ID
+def hashnode_headers():
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {HASHNODE_API_KEY}"
+    }
+
+def build_post_input(content, published_at=None, publication_id=None):
+    """
+    Prépare la publication d'un article : titre H1 extrait, nettoyage final, tags et image de couverture.
+    `published_at` (ISO 8601) antidate le post ; `publication_id` remplace HARDSTYLE_PUBLICATION_ID
+    (variantes traduites). Retourne (titre, contenu publié, PublishPostInput).
+    """
+    publication_id = publication_id or HARDSTYLE_PUBLICATION_ID
     
-    first_line_match = content.split('\n')[0].strip()
-    extracted_title = ""
-    if first_line_match.startswith('# '):
-        extracted_title = first_line_match[2:].strip()
-        content = content[len(first_line_match):].strip()
-    else:
+    # Titre H1 de la première ligne, sans redécouper tout l'article
+    extracted_title, content = split_title(content)
+    if not extracted_title:
         # Fallback for title, also in English
         extracted_title = "Hardstyle Ranking from " + datetime.now().strftime("%d %B %Y - %H:%M")
 
-    # Final removal of any residual signature or notes
-    content = content.replace("Par Nathan Remacle.", "").strip()
-    content = content.replace("By Nathan Remacle.", "").strip()
-    content = re.sub(r'\*Note\s*:\s*(.*?)\s*\*', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
-    content = re.sub(r'Note\s*:\s*(.*?)\s*', '', content, flags=re.IGNORECASE | re.DOTALL).strip()
+    # Final removal of any residual signature or notes (filet de sécurité, une seule passe)
+    content, sanitize_report = sanitize(content)
+    if sanitize_report["removed"]:
+        print(f"DEBUG: Sanitizer removed before publishing: {format_report(sanitize_report)}.")
 
     selected_cover_url = get_weekly_cover_image_url() # Using the specific weekly.png image
 
-    mutation = """
-    mutation PublishPost($input: PublishPostInput!) {
-      publishPost(input: $input) {
-        post {
-          id
-          title
-          slug
-          url
-        }
-      }
-    }
-    """
-    
+    # Tags fixes, complétés par les artistes mentionnés dans l'article (une seule passe sur le texte)
+    linker = get_entity_linker()
+    tags = linker.tags(content, HASHNODE_FIXED_TAGS) if linker is not None else HASHNODE_FIXED_TAGS
+
     variables = {
         "input": {
             "title": extracted_title,
             "contentMarkdown": content,
             "publicationId": publication_id,
-            "tags": [
-                {"name": "Hardstyle", "slug": "hardstyle"},
-                {"name": "Ranking", "slug": "ranking"},
-                {"name": "Music", "slug": "music"},
-                {"name": "XCEED", "slug": "xceed"},
-                {"name": "Spotify", "slug": "spotify"}
-            ],
+            "tags": tags,
         }
     }
     
@@ -326,27 +624,38 @@ def publish_article(content): # <--- C'est ici que la fonction doit être défin
     else:
         print("DEBUG: No cover image added (no URL configured or list empty).")
 
+    if published_at:
+        variables["input"]["publishedAt"] = published_at
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {HASHNODE_API_KEY}"
-    }
+    return extracted_title, content, variables["input"]
+
+@traced("publish")
+def publish_article(content, exit_on_error=True, published_at=None, publication_id=None): # <--- C'est ici que la fonction doit être définie
+    """
+    Publie l'article sur Hashnode et retourne l'URL du post (None si non renvoyée).
+    Avec `exit_on_error=False`, les erreurs sont relevées pour que l'outbox garde l'article.
+    """
+    extracted_title, content, post_input = build_post_input(content, published_at, publication_id)
+    variables = {"input": post_input}
+    headers = hashnode_headers()
 
     print(f"\n✍️ Attempting to publish article '{extracted_title}' to Hashnode...")
-    print(f"DEBUG: JSON Payload sent to Hashnode (without full content): {json.dumps(variables, indent=2)}")
+    debug_payload("Hashnode publishPost variables", variables)
     print(f"DEBUG: Start of Markdown content sent: {content[:200]}...")
 
     try:
-        resp = requests.post(HASHNODE_API_URL, json={"query": mutation, "variables": variables}, headers=headers)
+        # Timeouts par défaut du client partagé (connexion 10 s, lecture 60 s)
+        resp = get_client().post(HASHNODE_API_URL, json={"query": PUBLISH_POST_MUTATION, "variables": variables}, headers=headers)
         
         print("Publish status:", resp.status_code)
+        annotate(status_code=resp.status_code, bytes=len(content))
         print("Publish response:", resp.text)
         
         response_data = resp.json()
 
         if 'errors' in response_data and response_data['errors']:
             print(f"❌ GraphQL ERROR from Hashnode when publishing article : {response_data['errors']}")
-            sys.exit(1)
+            raise HashnodeError(response_data['errors'])
 
         post_url = None
         if 'data' in response_data and \
@@ -357,23 +666,157 @@ def publish_article(content): # <--- C'est ici que la fonction doit être défin
             print(f"✅ Article published successfully : {extracted_title} at URL : {post_url}")
         else:
             print(f"✅ Article published successfully (URL not retrieved) : {extracted_title}")
+        return post_url
 
+    except HashnodeError:
+        if not exit_on_error:
+            raise
+        sys.exit(1)
     except requests.exceptions.RequestException as e:
         print(f"❌ HTTP ERROR publishing article to Hashnode : {e}")
         print(f"Hashnode response on error : {resp.text if 'resp' in locals() else 'No response.'}")
+        if not exit_on_error:
+            raise
         sys.exit(1)
     except Exception as e:
         print(f"❌ An unexpected error occurred during publication : {e}")
+        if not exit_on_error:
+            raise
         sys.exit(1)
 
+@traced("publish_batch")
+def publish_articles(contents):
+    """
+    Publie plusieurs articles en lots de mutations aliasées (une requête Hashnode pour plusieurs posts).
+    Retourne, pour chaque article, l'URL du post ou l'exception de son échec.
+    """
+    prepared = [build_post_input(content) for content in contents]
+    print(f"\n✍️ Attempting to publish {len(prepared)} articles to Hashnode in batched requests...")
+    results = publish_posts(HASHNODE_API_URL, hashnode_headers(), [post_input for _, _, post_input in prepared])
+    annotate(posts=len(prepared), failed=sum(isinstance(result, Exception) for result in results))
+    urls = []
+    for (extracted_title, _, _), result in zip(prepared, results):
+        if isinstance(result, Exception):
+            print(f"❌ Could not publish article '{extracted_title}' : {result}")
+            urls.append(result)
+        else:
+            print(f"✅ Article published successfully : {extracted_title} at URL : {result.get('url')}")
+            urls.append(result.get("url"))
+    return urls
+
+def find_published_post(content):
+    """URL du post de la publication qui porte déjà le titre de `content` (miroir Hashnode), sinon None."""
+    title, _ = split_title(content)
+    if not title:
+        return None
+    return find_post_by_title(HASHNODE_API_URL, hashnode_headers(), HARDSTYLE_PUBLICATION_ID, title,
+                              artists=get_roster().names)
+
+def publish_with_outbox(outbox, article):
+    """
+    Enregistre l'article dans l'outbox avant de le publier (il survit ainsi à un échec Hashnode) ;
+    un article déjà tenté est d'abord recherché sur la publication pour ne pas le publier deux fois.
+    """
+    digest = outbox.add(BOT_NAME, article)
+    return publish_entry(outbox, digest, lambda content: publish_article(content, exit_on_error=False),
+                         lookup=find_published_post)
+
+def publish_batch_with_outbox(outbox, articles):
+    """Enregistre les articles dans l'outbox puis les publie en lots GraphQL."""
+    digests = [outbox.add(BOT_NAME, article) for article in articles]
+    return publish_entries(outbox, digests, publish_articles, lookup=find_published_post)
+
+def publish_variant(content, publication_id):
+    return publish_article(content, exit_on_error=False, publication_id=publication_id)
+
+def publish_translations(outbox, article):
+    """Traduit l'article publié et publie ses variantes sur les publications de FANOUT_LANGUAGES (sans effet si vide)."""
+    if not FANOUT_TARGETS:
+        return {}
+    # Même texte que le post d'origine : titre H1 puis contenu nettoyé
+    title, content = split_title(article)
+    content, _ = sanitize(content)
+    source = f"# {title}\n\n{content}" if title else content
+    return publish_variants(outbox, BOT_NAME, source, mistral_completion, publish_variant)
+
+def publish_next_article(exit_on_error=True):
+    """
+    Une publication complète : un classement resté dans l'outbox passe en priorité, sinon un
+    nouveau classement est généré puis publié. Utilisée par main() et par le planificateur.
+    """
+    outbox = Outbox()
+    # Variantes traduites dont la publication a échoué lors d'une exécution précédente
+    publish_pending_variants(outbox, BOT_NAME, publish_variant)
+    # Un article généré lors d'une exécution précédente mais jamais publié passe en priorité :
+    # il est republié depuis l'outbox sans nouvelle génération.
+    if not publish_pending(outbox, BOT_NAME, lambda content: publish_article(content, exit_on_error=False),
+                           publish_many=publish_articles, lookup=find_published_post):
+        history = RotationHistory()
+        samples = []
+
+        def generate():
+            samples.append(select_artists_for_prompt(history))
+            return generate_weekly_ranking_article(samples[-1], exit_on_error=exit_on_error)
+
+        # Un quasi-doublon d'un classement déjà généré est régénéré (nouvel échantillon d'artistes)
+        article = generate_distinct(generate, open_duplicate_index(outbox), BOT_NAME)
+        history.record(samples[-1])
+        publish_with_outbox(outbox, article)
+        publish_translations(outbox, article)
+
 # --- Main Execution ---
-if __name__ == "__main__":
-    # import re # This import is already at the top, so no need to repeat it here.
+def run_batch_mode(count, drafts_dir, publish):
+    """Génère `count` classements en parallèle, les sauvegarde en brouillons et les publie si demandé."""
+    history = RotationHistory()
+    artist_samples = [select_artists_for_prompt(history) for _ in range(count)]
+    print(f"🚀 Batch mode: generating {count} weekly ranking(s) (concurrency {BATCH_CONCURRENCY}).")
+    results = asyncio.run(generate_weekly_ranking_articles(artist_samples))
+    articles = save_drafts(results, drafts_dir, "weekly")
+    if not articles:
+        print("❌ No ranking could be generated in batch mode.")
+        sys.exit(1)
+    if publish:
+        # Seuls les classements publiés comptent pour la rotation des artistes
+        # (les quasi-doublons de l'archive sont écartés avant publication)
+        outbox = Outbox()
+        index = open_duplicate_index(outbox)
+        kept = []
+        for artists, result in zip(artist_samples, results):
+            if isinstance(result, BaseException) or not reject_duplicates([result], index, BOT_NAME):
+                continue
+            history.record(artists)
+            kept.append(result)
+        publish_batch_with_outbox(outbox, kept)
+        for article in kept:
+            publish_translations(outbox, article)
+
+def main():
+    parser = argparse.ArgumentParser(description="Weekly Hardstyle ranking bot.")
+    parser.add_argument("--batch", type=int, default=0, metavar="N",
+                        help="generate N rankings concurrently and save them as drafts")
+    parser.add_argument("--drafts-dir", default="drafts", help="directory for batch drafts (default: drafts)")
+    parser.add_argument("--publish", action="store_true", help="publish the batch drafts to Hashnode")
+    args = parser.parse_args()
+    get_tracer().bind(bot=BOT_NAME)
+    if HARDSTYLE_RANDOM_SEED:
+        random.seed(HARDSTYLE_RANDOM_SEED)
+
     print("Starting weekly Hardstyle ranking bot.")
+    validate_environment()
+    ensure_mistral_auth()
     try:
-        article = generate_weekly_ranking_article()
-        publish_article(article) # <--- Maintenant, publish_article est définie
+        if args.batch > 0:
+            run_batch_mode(args.batch, args.drafts_dir, args.publish)
+        else:
+            publish_next_article()
         print("\n🎉 Weekly Hardstyle ranking bot successfully completed!")
+        print_connection_stats()
+        print_trace_summary()
+        # Débit ou tokens par génération nettement moins bons que la base glissante du registre
+        warn_regressions(BOT_NAME)
     except Exception as e:
         print(f"\nFATAL ERROR: A critical error occurred : {e}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()